@@ -1,7 +1,24 @@
 from django.contrib import admin
-from .models import Account
+from .models import Account, BalanceEntry, BalanceSnapshot
+from .utils.ledger import enable_ledger
 
 # Register your models here.
 @admin.register(Account)
 class AccountAdmin(admin.ModelAdmin):
-    list_display = ["user","name","type","created_at","updated_at"]
\ No newline at end of file
+    list_display = ["user","name","type","ledger_enabled","created_at","updated_at"]
+    actions = ["enable_balance_ledger"]
+
+    @admin.action(description="Enable the balance ledger")
+    def enable_balance_ledger(self, request, queryset):
+        for account in queryset.filter(ledger_enabled=False):
+            enable_ledger(account.pkid)
+
+
+@admin.register(BalanceSnapshot)
+class BalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ["account","balance","entry_count","created_at"]
+
+
+@admin.register(BalanceEntry)
+class BalanceEntryAdmin(admin.ModelAdmin):
+    list_display = ["account","amount","snapshot","created_at"]
\ No newline at end of file
@@ -6,5 +6,5 @@ class AccountsConfig(AppConfig):
     name = 'apps.accounts'
     verbose_name= _("Accounts")
 
-    # def ready(self) -> None:
-    #     import apps.accounts.signals
+    def ready(self) -> None:
+        import apps.accounts.signals
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_rename_isdefault_account_is_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='ledger_enabled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('pkid', models.BigAutoField(editable=False, primary_key=True, serialize=False)),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='accounts.account')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BalanceEntry',
+            fields=[
+                ('pkid', models.BigAutoField(editable=False, primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_entries', to='accounts.account')),
+                ('snapshot', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='entries', to='accounts.balancesnapshot')),
+            ],
+            options={
+                'verbose_name_plural': 'balance entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='balancesnapshot',
+            index=models.Index(fields=['account', '-pkid'], name='balance_snapshot_account_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='balanceentry',
+            index=models.Index(fields=['account', 'created_at'], name='balance_entry_account_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='balanceentry',
+            index=models.Index(condition=models.Q(('snapshot__isnull', True)), fields=['account'], name='balance_entry_pending_idx'),
+        ),
+    ]
@@ -20,11 +20,82 @@ class Account(models.Model):
     type = models.CharField(max_length=10, choices=AccountTypes.choices)
     balance = models.DecimalField(max_digits=10, decimal_places=2)
     is_default = models.BooleanField(default=False)
+    # Comptes très sollicités : les variations de solde sont ajoutées au
+    # journal (BalanceEntry) au lieu de mettre à jour cette ligne, et
+    # ``balance`` n'est plus qu'une copie rafraîchie à chaque compaction.
+    ledger_enabled = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name} - {self.balance}"
 
+    @property
+    def current_balance(self):
+        """
+        Solde à jour. Pour un compte avec journal : dernier snapshot + entrées
+        non compactées (annotation ``ledger_balance`` si présente, sinon une
+        requête).
+        """
+        if not self.ledger_enabled:
+            return self.balance
+        if "ledger_balance" in self.__dict__:
+            return self.ledger_balance
+        from apps.accounts.utils.ledger import get_current_balance
+        return get_current_balance(self.pkid)
+
+
+class BalanceSnapshot(models.Model):
+    """
+    Solde d'un compte à journal après compaction : solde du snapshot précédent
+    plus les entrées qu'il a absorbées. Le premier snapshot est le solde
+    d'ouverture du journal.
+    """
+
+    pkid = models.BigAutoField(primary_key=True, editable=False)
+    account = models.ForeignKey(Account, related_name="balance_snapshots", on_delete=models.CASCADE)
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    entry_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["account", "-pkid"], name="balance_snapshot_account_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} - {self.balance}"
+
+
+class BalanceEntry(models.Model):
+    """
+    Variation de solde en ajout seul. Pas de clé étrangère vers Transaction :
+    une écriture peut regrouper plusieurs transactions.
+    ``snapshot`` est renseigné quand l'entrée est absorbée par une compaction.
+    """
+
+    pkid = models.BigAutoField(primary_key=True, editable=False)
+    account = models.ForeignKey(Account, related_name="balance_entries", on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    snapshot = models.ForeignKey(
+        BalanceSnapshot, related_name="entries", null=True, blank=True, on_delete=models.PROTECT
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "balance entries"
+        indexes = [
+            models.Index(fields=["account", "created_at"], name="balance_entry_account_idx"),
+            # Entrées en attente de compaction (lecture du solde courant)
+            models.Index(
+                fields=["account"],
+                name="balance_entry_pending_idx",
+                condition=models.Q(snapshot__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} - {self.amount}"
+
 
 
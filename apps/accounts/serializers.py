@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from django.db import transaction
+from django.urls import reverse
+from rest_framework.utils.urls import replace_query_param
 from apps.accounts.models import Account
-from apps.transactions.serializers import TransactionSerializer
+from apps.transactions.pagination import KeysetPagination
+from apps.transactions.serializers import TransactionValuesSerializer
 
 
 User = get_user_model()
@@ -67,7 +70,77 @@ class BaseAccountSerializer(serializers.ModelSerializer):
             "updated_at"
         ]
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.ledger_enabled:
+            # Solde du journal, pas la copie rafraîchie à la compaction
+            data["balance"] = self.fields["balance"].to_representation(instance.current_balance)
+        return data
+
 class AccountWithTransactions(BaseAccountSerializer):
-    transactions = TransactionSerializer(many=True, read_only=True)
+    """
+    Compte avec ses transactions les plus récentes (fenêtre de ``limit``
+    transactions), un lien ``transactions_next`` vers la suite dans la liste
+    des transactions et un résumé calculé par la base.
+    L'objet doit porter les annotations income_total, expense_total et
+    transaction_count (voir GetAccountWithTransaction).
+    """
+
+    transactions_window = 20
+    max_transactions_window = 200
+
+    transactions = serializers.SerializerMethodField()
+    transactions_next = serializers.SerializerMethodField()
+    summary = serializers.SerializerMethodField()
+
     class Meta(BaseAccountSerializer.Meta):
-       fields = BaseAccountSerializer.Meta.fields + ["transactions"]
+       fields = BaseAccountSerializer.Meta.fields + ["transactions", "transactions_next", "summary"]
+
+    def get_window_size(self):
+        request = self.context.get("request")
+        try:
+            size = int(request.query_params["limit"])
+        except (AttributeError, KeyError, ValueError):
+            return self.transactions_window
+        if size <= 0:
+            return self.transactions_window
+        return min(size, self.max_transactions_window)
+
+    def get_window(self, obj):
+        if not hasattr(obj, "_transaction_window"):
+            size = self.get_window_size()
+            pagination = KeysetPagination()
+            # Une seule requête, sur l'index (account, -date, -pkid), avec une
+            # ligne de plus pour savoir s'il reste des transactions
+            queryset = obj.transactions.order_by(*pagination.ordering)
+            rows = list(TransactionValuesSerializer.prepare(queryset)[: size + 1])
+            next_cursor = None
+            if len(rows) > size:
+                rows = rows[:size]
+                pagination.ordering = pagination.get_ordering(queryset)
+                next_cursor = pagination.encode_cursor(pagination.get_position(rows[-1]))
+            obj._transaction_window = (rows, next_cursor)
+        return obj._transaction_window
+
+    def get_transactions(self, obj):
+        rows, _ = self.get_window(obj)
+        return TransactionValuesSerializer(rows, many=True).data
+
+    def get_transactions_next(self, obj):
+        _, next_cursor = self.get_window(obj)
+        if next_cursor is None:
+            return None
+        url = reverse("get-all-transactions")
+        request = self.context.get("request")
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        url = replace_query_param(url, "account", str(obj.id))
+        url = replace_query_param(url, "limit", self.get_window_size())
+        return replace_query_param(url, "cursor", next_cursor)
+
+    def get_summary(self, obj):
+        return {
+            "income": f"{obj.income_total:.2f}",
+            "expense": f"{obj.expense_total:.2f}",
+            "count": obj.transaction_count,
+        }
@@ -1,7 +1,9 @@
 from .models import Account
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
+from config.utils.cache import bump_user_data_version
+
 # @receiver(pre_save, sender=Account)
 # def ensure_at_least_one_default(sender, instance, **kwargs):
 #     # Si ce compte est marqué comme défaut, on n'a rien à faire
@@ -11,4 +13,9 @@ from django.dispatch import receiver
 #     # Vérifier s'il existe déjà un compte par défaut pour cet utilisateur
 #     if not Account.objects.filter(user=instance.user, is_default=True).exists():
 #         # S'il n'y a aucun compte par défaut, forcer ce compte à être par défaut
-#         instance.is_default = True
\ No newline at end of file
+#         instance.is_default = True
+
+
+@receiver([post_save, post_delete], sender=Account)
+def invalidate_account_cache(sender, instance, **kwargs):
+    bump_user_data_version(instance.user_id)
@@ -0,0 +1,27 @@
+import logging
+
+from celery import shared_task
+
+from apps.accounts.models import BalanceEntry
+from apps.accounts.utils.ledger import compact_account_ledger
+
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name="compact_balance_ledgers")
+def compact_balance_ledgers():
+    """
+    Compacte le journal de chaque compte ayant des entrées en attente.
+    """
+    account_pkids = (
+        BalanceEntry.objects.filter(snapshot__isnull=True)
+        .order_by()
+        .values_list("account_id", flat=True)
+        .distinct()
+    )
+    compacted = 0
+    for account_pkid in account_pkids:
+        compacted += compact_account_ledger(account_pkid)
+    logger.info(f"{compacted} balance entries compacted.")
+    return compacted
@@ -0,0 +1,136 @@
+import logging
+
+from django.db import connection, transaction as db_transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.accounts.models import Account, BalanceEntry, BalanceSnapshot
+
+
+logger = logging.getLogger(__name__)
+
+MONEY_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
+def ledger_balance_expression():
+    """
+    Solde courant calculé par la base : dernier snapshot + entrées non
+    compactées pour un compte à journal, ``balance`` sinon.
+    """
+    latest_snapshot = (
+        BalanceSnapshot.objects.filter(account=OuterRef("pkid"))
+        .order_by("-pkid")
+        .values("balance")[:1]
+    )
+    pending_entries = (
+        BalanceEntry.objects.filter(account=OuterRef("pkid"), snapshot__isnull=True)
+        .order_by()
+        .values("account")
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    return Case(
+        When(
+            ledger_enabled=True,
+            then=(
+                Coalesce(Subquery(latest_snapshot), Value(0), output_field=MONEY_FIELD)
+                + Coalesce(Subquery(pending_entries), Value(0), output_field=MONEY_FIELD)
+            ),
+        ),
+        default=F("balance"),
+        output_field=MONEY_FIELD,
+    )
+
+
+def with_current_balance(queryset):
+    """
+    Annote ``ledger_balance``, lu par Account.current_balance.
+    """
+    return queryset.annotate(ledger_balance=ledger_balance_expression())
+
+
+def get_current_balance(account_pkid):
+    return (
+        with_current_balance(Account.objects.filter(pkid=account_pkid))
+        .values_list("ledger_balance", flat=True)
+        .get()
+    )
+
+
+def get_balance_at(account_pkid, when):
+    """
+    Solde d'un compte à journal à l'instant ``when`` : solde d'ouverture du
+    journal + entrées créées jusqu'à ``when``. Retourne None si ``when`` est
+    antérieur à l'ouverture du journal.
+    """
+    opening = BalanceSnapshot.objects.filter(account_id=account_pkid).order_by("pkid").first()
+    if opening is None or when < opening.created_at:
+        return None
+    total = BalanceEntry.objects.filter(
+        account_id=account_pkid, created_at__lte=when
+    ).aggregate(total=Sum("amount"))["total"]
+    return opening.balance + (total or 0)
+
+
+def enable_ledger(account_pkid):
+    """
+    Passe un compte en mode journal. Le solde actuel devient le snapshot
+    d'ouverture. Le verrou attend les UPDATE de solde en cours ; ceux qui
+    suivent voient ledger_enabled et ajoutent une entrée à la place.
+    Le passage est définitif.
+    """
+    with db_transaction.atomic():
+        account = Account.objects.select_for_update(no_key=True).get(pkid=account_pkid)
+        if account.ledger_enabled:
+            return account
+        BalanceSnapshot.objects.create(account=account, balance=account.balance)
+        account.ledger_enabled = True
+        account.save(update_fields=["ledger_enabled", "updated_at"])
+    logger.info(f"Balance ledger enabled for account {account.id}.")
+    return account
+
+
+def compact_account_ledger(account_pkid):
+    """
+    Absorbe les entrées en attente dans un nouveau snapshot et rafraîchit la
+    copie ``Account.balance``. Le verrou NO KEY UPDATE sérialise les
+    compactions d'un même compte sans bloquer les écritures d'entrées
+    (qui ne prennent qu'un KEY SHARE via la clé étrangère).
+    Retourne le nombre d'entrées absorbées.
+    """
+    with db_transaction.atomic():
+        try:
+            account = Account.objects.select_for_update(no_key=True).get(
+                pkid=account_pkid, ledger_enabled=True
+            )
+        except Account.DoesNotExist:
+            return 0
+        if not BalanceEntry.objects.filter(account=account, snapshot__isnull=True).exists():
+            return 0
+
+        previous = BalanceSnapshot.objects.filter(account=account).order_by("-pkid").first()
+        snapshot = BalanceSnapshot.objects.create(account=account, balance=previous.balance)
+
+        # Seules les entrées déjà validées sont absorbées ; celles en cours
+        # d'écriture le seront à la prochaine compaction.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH folded AS (
+                    UPDATE {BalanceEntry._meta.db_table}
+                    SET snapshot_id = %s
+                    WHERE account_id = %s AND snapshot_id IS NULL
+                    RETURNING amount
+                )
+                SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM folded
+                """,
+                [snapshot.pkid, account.pkid],
+            )
+            total, count = cursor.fetchone()
+
+        snapshot.balance += total
+        snapshot.entry_count = count
+        snapshot.save(update_fields=["balance", "entry_count"])
+        Account.objects.filter(pkid=account.pkid).update(balance=snapshot.balance, updated_at=timezone.now())
+    return count
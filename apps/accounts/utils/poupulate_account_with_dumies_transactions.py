@@ -2,11 +2,15 @@ from rest_framework.views import APIView
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from datetime import timedelta
+from django.db import transaction as db_transaction
 from django.utils import timezone
 import random
 from decimal import Decimal
 from ..models import Account
 from apps.transactions.models import Transaction
+from apps.transactions.utils.balances import apply_balance_delta
+from apps.transactions.utils.rollups import rebuild_rollups
+from config.utils.cache import bump_user_data_version
 
 class SeedTransactionsView(APIView):
     http_method_names = ["post"]
@@ -83,17 +87,19 @@ class SeedTransactionsView(APIView):
             # account, created = Account.objects.get_or_create(id=ACCOUNT_ID, defaults={'balance': total_balance})
             account, created = Account.objects.get_or_create(id=ACCOUNT_ID)
 
-            # Clear existing transactions
-            Transaction.objects.filter(account=account).delete()
+            with db_transaction.atomic():
+                # Clear existing transactions
+                Transaction.objects.filter(account=account).delete()
 
-            # Insert new transactions
-            Transaction.objects.bulk_create([
-                Transaction(**transaction, account=account) for transaction in transactions
-            ])
+                # Insert new transactions
+                Transaction.objects.bulk_create([
+                    Transaction(**transaction, account=account) for transaction in transactions
+                ])
 
-            # Update account balance
-            account.balance = total_balance
-            account.save()
+                # Update account balance (delta, so ledger accounts get an entry)
+                apply_balance_delta(account.pkid, total_balance - account.current_balance)
+                rebuild_rollups(account_id=account.pkid)
+                bump_user_data_version(request.user.pkid)
 
             return Response({
                 'success': True,
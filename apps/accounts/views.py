@@ -1,12 +1,20 @@
 import logging
 
+from decimal import Decimal
 from uuid import UUID
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
-from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from .models import Account
+from .utils.ledger import with_current_balance
+from apps.transactions.models import Transaction, TransactionMonthlyRollup
 from .serializers import AccountSerializer, AccountWithTransactions, BaseAccountSerializer
+from config.utils.cache import UserCachedResponseMixin
 from config.utils.renderers import GenericJSONRenderer
 from rest_framework.response import Response
 
@@ -25,8 +33,9 @@ class AccountCreateApiView(generics.CreateAPIView):
         serializer.save()
 
 
-class MyAccountsListApiView(generics.ListAPIView):
+class MyAccountsListApiView(UserCachedResponseMixin, generics.ListAPIView):
     queryset = Account.objects.all()
+    cache_scope = "accounts"
     serializer_class = BaseAccountSerializer
     permission_classes = [permissions.IsAuthenticated]
     renderer_classes = [GenericJSONRenderer]
@@ -34,7 +43,7 @@ class MyAccountsListApiView(generics.ListAPIView):
 
     def get_queryset(self):
        user = self.request.user
-       return Account.objects.filter(user=user)
+       return with_current_balance(Account.objects.filter(user=user))
    
 
 class UpdateDefaultAccount(APIView):
@@ -74,9 +83,40 @@ class UpdateDefaultAccount(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
-class GetAccountWithTransaction(generics.RetrieveAPIView):
-    queryset = Account.objects.all()
+class GetAccountWithTransaction(UserCachedResponseMixin, generics.RetrieveAPIView):
     permission_classes= [permissions.IsAuthenticated]
     serializer_class = AccountWithTransactions
     lookup_field = "id"
+    cache_scope = "account"
+
+    def get_queryset(self):
+        # Résumé calculé par la base dans la même requête que le compte, à
+        # partir des rollups mensuels : ils comptent aussi les transactions
+        # archivées hors de Postgres.
+        zero = Value(Decimal("0"), output_field=DecimalField(max_digits=14, decimal_places=2))
 
+        def rollup_total(field, **filters):
+            rollups = (
+                TransactionMonthlyRollup.objects.filter(account=OuterRef("pkid"), **filters)
+                .order_by()
+                .values("account")
+                .annotate(total=Sum(field))
+                .values("total")
+            )
+            return Coalesce(Subquery(rollups), zero if field == "total" else Value(0))
+
+        return (
+            with_current_balance(Account.objects.filter(user=self.request.user))
+            .select_related("user")
+            .annotate(
+                income_total=rollup_total("total", type=Transaction.Type.INCOME),
+                expense_total=rollup_total("total", type=Transaction.Type.EXPENSE),
+                transaction_count=rollup_total("count"),
+            )
+        )
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except DjangoValidationError:
+            raise NotFound("Account not found")
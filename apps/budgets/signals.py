@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.budgets.models import Budget
+from config.utils.cache import bump_user_data_version
+
+
+@receiver([post_save, post_delete], sender=Budget)
+def invalidate_budget_cache(sender, instance, **kwargs):
+    bump_user_data_version(instance.user_id)
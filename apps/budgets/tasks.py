@@ -3,7 +3,7 @@ from django.utils import timezone
 from config.utils.emails import send_budget_alert
 from .models import Budget
 from apps.transactions.models import Transaction
-from django.db import models
+from apps.transactions.utils.rollups import get_month_total, month_start
 
 
 
@@ -19,19 +19,13 @@ def check_budget_alerts():
         if not default_account:
             continue  # Passer si aucun compte par défaut n'existe
 
-        # Calculer le début du mois en cours
-        start_date = timezone.now().replace(
-            day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        # Calculer le total des dépenses pour le compte par défaut
-        expenses = Transaction.objects.filter(
+        # Calculer le total des dépenses du mois pour le compte par défaut
+        total_expenses = get_month_total(
+            month_start(timezone.now()),
+            Transaction.Type.EXPENSE,
             user=budget.user,
             account=default_account,
-            type=Transaction.Type.EXPENSE,
-            date__gte=start_date
-        ).aggregate(total_amount=models.Sum('amount'))
-
-        total_expenses = expenses['total_amount'] or 0
+        )
         budget_amount = budget.amount
         percentage_used = (total_expenses / budget_amount) * 100
 
@@ -2,7 +2,6 @@ from django.utils import timezone
 import logging
 
 from uuid import UUID
-from django.db.models import Sum
 from rest_framework import permissions, status
 from rest_framework.views import APIView
 from rest_framework.exceptions import PermissionDenied, ValidationError
@@ -10,15 +9,22 @@ from rest_framework.exceptions import PermissionDenied, ValidationError
 from .models import Budget
 from apps.accounts.models import Account    
 from apps.transactions.models import Transaction
+from apps.transactions.utils.rollups import get_month_total, month_start
+from config.utils.cache import UserCachedResponseMixin
 from config.utils.renderers import GenericJSONRenderer
 from rest_framework.response import Response
 
 logger = logging.getLogger(__name__)
 
-class GetCurrentBudgetView(APIView):
+class GetCurrentBudgetView(UserCachedResponseMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
     renderer_classes = [GenericJSONRenderer]
     object_label = "budget"
+    cache_scope = "budget"
+
+    def get_cache_key(self, request):
+        # Les dépenses sont celles du mois en cours
+        return f"{super().get_cache_key(request)}:{timezone.now():%Y-%m}"
 
     def get_default_account(self):
         user = self.request.user
@@ -32,6 +38,9 @@ class GetCurrentBudgetView(APIView):
         
 
     def get(self, request):
+        return self.cached_get(request, self.get_current_budget)
+
+    def get_current_budget(self, request):
         user = self.request.user
 
         # Get the user's budget
@@ -40,26 +49,17 @@ class GetCurrentBudgetView(APIView):
         except Budget.DoesNotExist:
             budget = None
         
-        # Calculate current month's expenses
-        today = timezone.now()
-        start_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        end_of_month = start_of_month.replace(month=start_of_month.month + 1) - timezone.timedelta(days=1)
-
-   
         account = self.get_default_account()
         if account is None:
             return Response({"detail":"No default Account found."}, status=status.HTTP_404_NOT_FOUND)
 
-
-        expenses = Transaction.objects.filter(
-            user = user,
-            type = Transaction.Type.EXPENSE,
-            date__gte=start_of_month,
-            date__lte=end_of_month,
+        # Calculate current month's expenses (rollup table, one row per category)
+        current_expenses = get_month_total(
+            month_start(timezone.now()),
+            Transaction.Type.EXPENSE,
+            user=user,
             account=account,
-        ).aggregate(total_expenses=Sum('amount'))
-        
-        current_expenses = expenses['total_expenses'] or 0
+        )
 
         return Response(
             {
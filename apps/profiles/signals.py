@@ -7,6 +7,7 @@ from django.dispatch import receiver
 
 # from config.settings.base import AUTH_USER_MODEL
 from apps.profiles.models import Profile
+from config.utils.cache import bump_user_data_version
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -21,4 +22,9 @@ def create_user_profile(sender: Type[Model], instance:Model, created:bool, **kwa
         logger.info(f"Profile created for {instance.first_name} {instance.last_name}.")
     else:
         # logger.info(f"Profile already exists for {instance.first_name} {instance.last_name}.")
-        pass
\ No newline at end of file
+        pass
+
+
+@receiver(post_save, sender=Profile)
+def invalidate_profile_cache(sender: Type[Model], instance: Model, **kwargs: Any) -> None:
+    bump_user_data_version(instance.user_id)
@@ -10,6 +10,7 @@ from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from config.utils.cache import UserCachedResponseMixin, bump_user_data_version
 from config.utils.renderers import GenericJSONRenderer
 from .serializers import AvatarUploadSerializer, ProfileSerializer, UpdateProfileSerializer
 from .tasks import upload_avatar_to_cloudinary
@@ -25,8 +26,9 @@ class StandardResultsSetPagination(PageNumberPagination):
 
 
 
-class ProfileDetailAPIView(generics.RetrieveAPIView):
+class ProfileDetailAPIView(UserCachedResponseMixin, generics.RetrieveAPIView):
     serializer_class = ProfileSerializer
+    cache_scope = "profile"
     renderer_classes = [GenericJSONRenderer]
     object_label = "profile"
 
@@ -56,6 +58,8 @@ class ProfileUpdateAPIView(generics.RetrieveUpdateAPIView):
         user_data = serializer.validated_data.pop("user",{})
         profile = serializer.save()
         User.objects.filter(id=self.request.user.id).update(**user_data)
+        # update() n'envoie pas post_save : le nom affiché dans le profil change
+        bump_user_data_version(self.request.user.pkid)
         return profile
     
 
@@ -1,8 +1,23 @@
 from django.contrib import admin
-from .models import Transaction
+from .models import MonthlyReportRun, Transaction, TransactionArchive, TransactionJob
 # Register your models here.
 
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ["user","account","type","amount","category","isRecurring"]
+
+
+@admin.register(TransactionJob)
+class TransactionJobAdmin(admin.ModelAdmin):
+    list_display = ["user","kind","status","processed_rows","failed_rows","created_at"]
+
+
+@admin.register(TransactionArchive)
+class TransactionArchiveAdmin(admin.ModelAdmin):
+    list_display = ["user","month","row_count","size","min_date","max_date","created_at"]
+
+
+@admin.register(MonthlyReportRun)
+class MonthlyReportRunAdmin(admin.ModelAdmin):
+    list_display = ["month","status","processed_users","failed_users","total_users","completed_chunks","total_chunks","started_at","finished_at"]
@@ -4,4 +4,7 @@ from django.utils.translation import gettext_lazy as _
 class TransactionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.transactions'
-    verbose_name= _("Transactions")
\ No newline at end of file
+    verbose_name= _("Transactions")
+
+    def ready(self) -> None:
+        import apps.transactions.signals
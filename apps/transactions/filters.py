@@ -0,0 +1,36 @@
+import django_filters
+
+from .models import Transaction
+
+
+class TransactionFilter(django_filters.FilterSet):
+    """
+    Query parameters accepted by the transaction list.
+
+    Every filter is served by one of the indexes declared on ``Transaction``:
+    date range (user, date), type (user, type, date), category
+    (user, category, date), account (account, date), amount range
+    (user, amount) and recurring flag (partial index on isRecurring).
+    """
+
+    start_date = django_filters.DateTimeFilter(field_name="date", lookup_expr="gte")
+    end_date = django_filters.DateTimeFilter(field_name="date", lookup_expr="lte")
+    type = django_filters.ChoiceFilter(choices=Transaction.Type.choices)
+    category = django_filters.CharFilter(field_name="category")
+    account = django_filters.UUIDFilter(field_name="account__id")
+    min_amount = django_filters.NumberFilter(field_name="amount", lookup_expr="gte")
+    max_amount = django_filters.NumberFilter(field_name="amount", lookup_expr="lte")
+    is_recurring = django_filters.BooleanFilter(field_name="isRecurring")
+
+    class Meta:
+        model = Transaction
+        fields = [
+            "start_date",
+            "end_date",
+            "type",
+            "category",
+            "account",
+            "min_amount",
+            "max_amount",
+            "is_recurring",
+        ]
@@ -0,0 +1,56 @@
+import random
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.transactions.management.commands.benchmark_transaction_frame import timed
+from apps.transactions.models import Transaction
+from apps.transactions.utils.recurrence import due_occurrences, next_occurrence
+
+
+class Command(BaseCommand):
+    help = "Measure recurrence catch-up throughput on synthetic overdue templates."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--templates", type=int, default=1000, help="Number of synthetic templates.")
+        parser.add_argument("--days-late", type=int, default=90, help="How far behind the templates are.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per measure (best time is kept).")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options["seed"])
+        now = timezone.now()
+        intervals, anchors, pending = [], [], []
+        for _ in range(options["templates"]):
+            interval = rnd.choice(Transaction.RecurringIntervale.values)
+            anchor = now - timedelta(days=rnd.randint(365, 3 * 365), seconds=rnd.randint(0, 86399))
+            intervals.append(interval)
+            anchors.append(anchor)
+            pending.append(next_occurrence(interval, anchor, now - timedelta(days=options["days_late"])))
+
+        def loop():
+            # Une occurrence à la fois, comme un rattrapage par exécution
+            occurrences = []
+            for interval, anchor, first in zip(intervals, anchors, pending):
+                occurrences.append(first)
+                while (first := next_occurrence(interval, anchor, first)) <= now:
+                    occurrences.append(first)
+            return occurrences
+
+        def vectorized():
+            return due_occurrences(intervals, anchors, pending, now)[1]
+
+        repeat = options["repeat"]
+        loop_time, expected = timed(loop, repeat)
+        vectorized_time, occurrences = timed(vectorized, repeat)
+        if sorted(expected) != sorted(occurrences):
+            self.stderr.write("Occurrences differ between the loop and the vectorized expansion.")
+
+        self.stdout.write(
+            f"{len(intervals)} templates, {len(occurrences)} occurrences, best of {repeat} runs"
+        )
+        for name, elapsed in [("loop", loop_time), ("vectorized", vectorized_time)]:
+            self.stdout.write(
+                f"{name:<12}{elapsed * 1000:>10.1f} ms{len(occurrences) / elapsed:>14,.0f} occurrences/s"
+            )
@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db import transaction as db_transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.accounts.models import Account
+from apps.transactions.management.commands.benchmark_transaction_frame import timed
+from apps.transactions.models import Transaction
+from apps.transactions.utils.recurring import RECURRING_CHUNK_SIZE, due_templates
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the recurring trigger query while non-recurring history grows. "
+        "Synthetic rows are inserted in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="Email of the user who owns the synthetic rows.")
+        parser.add_argument("--history", default="0,100000,1000000",
+                            help="Comma separated history sizes (non-recurring rows) to measure.")
+        parser.add_argument("--templates", type=int, default=200, help="Due recurring templates to add.")
+        parser.add_argument("--idle-templates", type=int, default=20000,
+                            help="Recurring templates to add that are not due yet.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per measure (best time is kept).")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+        account = Account.objects.filter(user=user).order_by("-is_default", "pkid").first()
+        if account is None:
+            raise CommandError(f"User {options['user']} has no account.")
+        sizes = sorted(int(size) for size in options["history"].split(","))
+        repeat = options["repeat"]
+
+        def due():
+            return list(due_templates(timezone.now()).order_by("due_at")[:RECURRING_CHUNK_SIZE])
+
+        def full_scan():
+            # Condition du déclencheur avant l'index partiel
+            return list(
+                Transaction.objects.filter(isRecurring=True, status=Transaction.Status.COMPLETED)
+                .filter(Q(lastProcessed__isnull=True) | Q(nextRecurringDate__lte=timezone.now()))
+                .order_by("pkid")[:RECURRING_CHUNK_SIZE]
+            )
+
+        self.stdout.write(
+            f"best of {repeat} runs (ms), {options['templates']} due templates, "
+            f"{options['idle_templates']} templates not due"
+        )
+        self.stdout.write(f"{'history rows':>14}{'due queue':>12}{'old filter':>12}  plan")
+        with db_transaction.atomic():
+            self.insert_rows(user, account, options["templates"], recurring=True)
+            self.insert_rows(user, account, options["idle_templates"], recurring=True, due=False)
+            inserted = 0
+            for size in sizes:
+                self.insert_rows(user, account, size - inserted, recurring=False)
+                inserted = size
+                with connection.cursor() as cursor:
+                    cursor.execute(f"ANALYZE {Transaction._meta.db_table}")
+                plan = due_templates(timezone.now()).order_by("due_at")[:RECURRING_CHUNK_SIZE].explain()
+                uses_index = "due_idx" in plan
+                self.stdout.write(
+                    f"{size:>14,}{timed(due, repeat)[0] * 1000:>12.1f}"
+                    f"{timed(full_scan, repeat)[0] * 1000:>12.1f}  {'due index' if uses_index else 'no index'}"
+                )
+            db_transaction.set_rollback(True)
+
+    def insert_rows(self, user, account, count, recurring, due=True):
+        if count <= 0:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Transaction._meta.db_table}
+                    (id, user_id, account_id, type, amount, description, date, category,
+                     "isRecurring", "recurringInterval", "nextRecurringDate", "lastProcessed",
+                     status, created_at, updated_at)
+                SELECT gen_random_uuid(), %(user)s, %(account)s, 'expense', (g %% 10000) / 100.0,
+                       'benchmark', now() - (g %% 1000) * interval '1 day', 'benchmark',
+                       %(recurring)s, CASE WHEN %(recurring)s THEN 'monthly' END,
+                       CASE WHEN %(recurring)s THEN now() + %(next_in)s * interval '1 day' END,
+                       CASE WHEN %(recurring)s THEN now() - interval '1 month' END,
+                       'completed', now(), now()
+                FROM generate_series(1, %(count)s) AS g
+                """,
+                {
+                    "user": user.pkid,
+                    "account": account.pkid,
+                    "recurring": recurring,
+                    "next_in": -1 if due else 15,
+                    "count": count,
+                },
+            )
@@ -0,0 +1,138 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.accounts.models import Account
+from apps.transactions.models import Transaction
+from apps.transactions.utils.analytics import INTERVALS
+from apps.transactions.utils.rollups import day_sql, rollup_ctes
+from apps.transactions.views import TransactionAnalyticsAPIView
+
+
+User = get_user_model()
+
+CATEGORIES = ["food", "rent", "transport", "shopping", "health", "salary"]
+# Durée des périodes mesurées, en mois, selon l'intervalle demandé
+SPAN_MONTHS = {"day": 1, "week": 3, "month": 12, "year": 12}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the analytics endpoint for every interval, over a range of whole months and a range with "
+        "partial edge months. Synthetic rows are inserted in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="Email of the user who owns the synthetic rows.")
+        parser.add_argument("--rows", type=int, default=500000, help="Synthetic transactions over the last year.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per measure (best time is kept).")
+        parser.add_argument("--max-ms", type=float, default=50,
+                            help="Fail if an uncached response takes longer than this many milliseconds.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+        account = Account.objects.filter(user=user).order_by("-is_default", "pkid").first()
+        if account is None:
+            raise CommandError(f"User {options['user']} has no account.")
+        repeat = options["repeat"]
+
+        today = timezone.localdate()
+        self.stdout.write(f"{options['rows']:,} synthetic transactions, best of {repeat} runs (ms)")
+        self.stdout.write(f"{'interval':<10}{'range':<16}{'buckets':>9}{'uncached':>10}{'cached':>10}")
+        slowest = 0
+        with db_transaction.atomic():
+            self.insert_rows(user, account, options["rows"])
+            for interval in INTERVALS:
+                for name, start, end in self.ranges(interval, today):
+                    params = {"interval": interval, "start_date": start.isoformat(), "end_date": end.isoformat()}
+                    # Un paramètre inconnu de la vue change la clé de cache : chaque appel est un miss
+                    uncached, buckets = self.timed(user, repeat, lambda: {**params, "run": uuid.uuid4().hex})
+                    cached, _ = self.timed(user, repeat, lambda: params)
+                    slowest = max(slowest, uncached)
+                    self.stdout.write(
+                        f"{interval:<10}{name:<16}{buckets:>9}{uncached * 1000:>10.1f}{cached * 1000:>10.1f}"
+                    )
+            db_transaction.set_rollback(True)
+
+        if slowest * 1000 > options["max_ms"]:
+            raise CommandError(
+                f"An uncached analytics response took {slowest * 1000:.1f} ms (limit {options['max_ms']:.0f} ms)."
+            )
+        self.stdout.write(self.style.SUCCESS(f"Every uncached response under {options['max_ms']:.0f} ms."))
+
+    def ranges(self, interval, today):
+        """
+        Les SPAN_MONTHS[interval] derniers mois entiers (mois et années lus
+        dans les rollups mensuels), puis une période de même durée qui finit
+        aujourd'hui, aux mois partiels lus dans les rollups journaliers.
+        """
+        end = today.replace(day=1) - timedelta(days=1)
+        month = end.month - SPAN_MONTHS[interval] + 1
+        start = end.replace(year=end.year + (month - 1) // 12, month=(month - 1) % 12 + 1, day=1)
+        return [
+            ("whole months", start, end),
+            ("partial months", today - (end - start), today),
+        ]
+
+    def timed(self, user, repeat, make_params):
+        view = TransactionAnalyticsAPIView.as_view()
+        best, buckets = None, 0
+        for _ in range(repeat):
+            request = APIRequestFactory().get("/", make_params())
+            force_authenticate(request, user=user)
+            started = time.perf_counter()
+            response = view(request)
+            elapsed = time.perf_counter() - started
+            if response.status_code != 200:
+                raise CommandError(f"Analytics failed with status {response.status_code}: {response.data}")
+            best = elapsed if best is None else min(best, elapsed)
+            buckets = len(response.data["results"])
+        return best, buckets
+
+    def insert_rows(self, user, account, count):
+        """
+        Lignes réparties sur les 365 derniers jours, ajoutées aux rollups
+        dans la même requête, comme le fait l'import.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH inserted AS (
+                    INSERT INTO {Transaction._meta.db_table}
+                        (id, user_id, account_id, type, amount, description, date, category,
+                         "isRecurring", status, created_at, updated_at)
+                    SELECT gen_random_uuid(), %(user)s, %(account)s,
+                           CASE WHEN g %% 5 = 0 THEN 'income' ELSE 'expense' END, (g %% 10000) / 100.0,
+                           'benchmark row ' || g, now() - g * (interval '365 days' / %(count)s),
+                           (%(categories)s::text[])[g %% %(category_count)s + 1],
+                           false, 'completed', now(), now()
+                    FROM generate_series(1, %(count)s) AS g
+                    RETURNING user_id, account_id, date, type, category, amount
+                ),
+                changes AS (
+                    SELECT user_id, account_id, {day_sql()} AS day, type, category, amount AS total, 1 AS count
+                    FROM inserted
+                ),
+                {rollup_ctes()}
+                SELECT 1
+                """,
+                {
+                    "user": user.pkid,
+                    "account": account.pkid,
+                    "count": count,
+                    "categories": CATEGORIES,
+                    "category_count": len(CATEGORIES),
+                    "time_zone": settings.TIME_ZONE,
+                },
+            )
@@ -0,0 +1,117 @@
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db import transaction as db_transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.accounts.models import Account
+from apps.transactions.models import Transaction
+from apps.transactions.views import ExportTransactionsAPIView
+
+
+User = get_user_model()
+
+
+def current_rss():
+    """
+    Resident set size of this process, in bytes (Linux).
+    """
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that the memory of a transaction export stays flat while the exported history grows. "
+        "Synthetic rows are inserted in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="Email of the user who owns the synthetic rows.")
+        parser.add_argument("--rows", default="10000,100000,1000000",
+                            help="Comma separated history sizes (synthetic rows) to export.")
+        parser.add_argument("--output", choices=list(ExportTransactionsAPIView.export_formats), default="csv")
+        parser.add_argument("--gzip", action="store_true", help="Export with compress=gzip.")
+        parser.add_argument("--max-growth", type=float, default=32,
+                            help="Fail if the RSS grows by more than this many MB during one export.")
+
+    def handle(self, *args, **options):
+        if not os.path.exists("/proc/self/statm"):
+            raise CommandError("This benchmark reads the RSS from /proc and only runs on Linux.")
+        try:
+            user = User.objects.get(email=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+        account = Account.objects.filter(user=user).order_by("-is_default", "pkid").first()
+        if account is None:
+            raise CommandError(f"User {options['user']} has no account.")
+        sizes = sorted(int(size) for size in options["rows"].split(","))
+        params = {"output": options["output"]}
+        if options["gzip"]:
+            params["compress"] = "gzip"
+
+        self.stdout.write(f"export {options['output']}{' gzip' if options['gzip'] else ''}, RSS in MB")
+        self.stdout.write(f"{'rows':>12}{'MB sent':>10}{'seconds':>10}{'rows/s':>12}{'RSS':>8}{'growth':>8}")
+        growths = []
+        with db_transaction.atomic():
+            inserted = 0
+            for size in sizes:
+                self.insert_rows(user, account, size - inserted)
+                inserted = size
+                rows, sent, elapsed, baseline, growth = self.export(user, params)
+                growths.append(growth)
+                self.stdout.write(
+                    f"{rows:>12,}{sent / 2 ** 20:>10.1f}{elapsed:>10.2f}{rows / elapsed:>12,.0f}"
+                    f"{baseline / 2 ** 20:>8.0f}{growth / 2 ** 20:>8.1f}"
+                )
+            db_transaction.set_rollback(True)
+
+        if max(growths) > options["max_growth"] * 2 ** 20:
+            raise CommandError(
+                f"RSS grew by {max(growths) / 2 ** 20:.1f} MB during an export "
+                f"(limit {options['max_growth']:.0f} MB): the export is not streaming."
+            )
+        self.stdout.write(self.style.SUCCESS(f"RSS flat within {options['max_growth']:.0f} MB."))
+
+    def export(self, user, params):
+        """
+        Consume the export response like a client would. The RSS baseline is
+        taken after the first block, once the cursor and buffers exist.
+        """
+        request = APIRequestFactory().get("/", params)
+        force_authenticate(request, user=user)
+        started = time.perf_counter()
+        response = ExportTransactionsAPIView.as_view()(request)
+        if response.status_code != 200:
+            raise CommandError(f"Export failed with status {response.status_code}.")
+
+        sent, baseline, peak = 0, None, 0
+        for block in response.streaming_content:
+            sent += len(block)
+            rss = current_rss()
+            baseline = rss if baseline is None else baseline
+            peak = max(peak, rss)
+        elapsed = time.perf_counter() - started
+        rows = Transaction.objects.filter(user=user).count()
+        return rows, sent, elapsed, baseline or 0, peak - (baseline or 0)
+
+    def insert_rows(self, user, account, count):
+        if count <= 0:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Transaction._meta.db_table}
+                    (id, user_id, account_id, type, amount, description, date, category,
+                     "isRecurring", status, created_at, updated_at)
+                SELECT gen_random_uuid(), %(user)s, %(account)s,
+                       CASE WHEN g %% 5 = 0 THEN 'income' ELSE 'expense' END, (g %% 10000) / 100.0,
+                       'benchmark row ' || g, now() - g * interval '1 minute', 'benchmark',
+                       false, 'completed', now(), now()
+                FROM generate_series(1, %(count)s) AS g
+                """,
+                {"user": user.pkid, "account": account.pkid, "count": count},
+            )
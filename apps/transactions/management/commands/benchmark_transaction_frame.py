@@ -0,0 +1,96 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from apps.transactions.models import Transaction
+from apps.transactions.utils.columnar import load_frame
+
+
+User = get_user_model()
+
+
+def timed(function, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+class Command(BaseCommand):
+    help = "Compare the columnar transaction frame with the ORM on a user's transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="Email of the user to benchmark.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per measure (best time is kept).")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+        repeat = options["repeat"]
+        transactions = Transaction.objects.filter(user=user)
+        today = timezone.localdate()
+        start = today - timedelta(days=89)
+
+        def orm_instances_group_by():
+            totals = defaultdict(lambda: [Decimal("0"), 0])
+            for transaction in transactions.all():
+                key = (timezone.localtime(transaction.date).date().replace(day=1), transaction.category)
+                totals[key][0] += transaction.amount
+                totals[key][1] += 1
+            return totals
+
+        def orm_aggregate_group_by():
+            return list(
+                transactions.annotate(month=Trunc("date", "month", output_field=DateField()))
+                .values("month", "category")
+                .annotate(total=Sum("amount"), count=Count("pkid"))
+                .order_by()
+            )
+
+        def orm_rolling():
+            daily = defaultdict(Decimal)
+            for transaction in transactions.filter(date__date__gte=start - timedelta(days=29)):
+                signed = -transaction.amount if transaction.type == Transaction.Type.EXPENSE else transaction.amount
+                daily[timezone.localtime(transaction.date).date()] += signed
+            return [
+                sum(daily[day - timedelta(days=offset)] for offset in range(30))
+                for day in (start + timedelta(days=index) for index in range((today - start).days + 1))
+            ]
+
+        def orm_percentiles():
+            amounts = defaultdict(list)
+            for transaction in transactions.all():
+                amounts[transaction.category].append(float(transaction.amount))
+            return {category: np.percentile(values, [50, 90]) for category, values in amounts.items()}
+
+        load_time, frame = timed(lambda: load_frame(user), repeat)
+        measures = [
+            ("load", None, load_time),
+            ("group by month, category", timed(orm_instances_group_by, repeat)[0],
+             timed(lambda: frame.group_by("month", "category"), repeat)[0]),
+            ("group by (SQL aggregate)", timed(orm_aggregate_group_by, repeat)[0], None),
+            ("rolling 30 days", timed(orm_rolling, repeat)[0],
+             timed(lambda: frame.rolling(30, start, today), repeat)[0]),
+            ("percentiles 50/90", timed(orm_percentiles, repeat)[0],
+             timed(lambda: frame.percentiles([50, 90]), repeat)[0]),
+        ]
+
+        self.stdout.write(f"{len(frame)} transactions, best of {repeat} runs (ms)")
+        self.stdout.write(f"{'operation':<28}{'orm':>12}{'frame':>12}")
+        for name, orm_time, frame_time in measures:
+            orm_ms = "-" if orm_time is None else f"{orm_time * 1000:.1f}"
+            frame_ms = "-" if frame_time is None else f"{frame_time * 1000:.1f}"
+            self.stdout.write(f"{name:<28}{orm_ms:>12}{frame_ms:>12}")
@@ -0,0 +1,130 @@
+import csv
+import io
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from apps.accounts.models import Account
+from apps.transactions.models import TransactionJob
+from apps.transactions.utils.importers import (
+    IMPORT_CHUNK_SIZE,
+    PARSERS,
+    chunked,
+    copy_to_staging,
+    create_staging_table,
+    merge_staging,
+    merge_staging_rollups,
+    run_import,
+    validate_batch,
+)
+
+
+User = get_user_model()
+
+CATEGORIES = ["food", "rent", "transport", "shopping", "health", "salary"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the throughput of the statement import, phase by phase (parse and validate, COPY, merge) "
+        "and end to end. Imported rows are inserted in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="Email of the user who imports the synthetic file.")
+        parser.add_argument("--rows", default="10000,100000,1000000",
+                            help="Comma separated file sizes (CSV rows) to import.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+        account = Account.objects.filter(user=user).order_by("-is_default", "pkid").first()
+        if account is None:
+            raise CommandError(f"User {options['user']} has no account.")
+        sizes = sorted(int(size) for size in options["rows"].split(","))
+
+        self.stdout.write(f"rows per second, blocks of {IMPORT_CHUNK_SIZE} rows")
+        self.stdout.write(f"{'rows':>12}{'validate':>12}{'COPY':>12}{'merge':>12}{'run_import':>12}")
+        for size in sizes:
+            source = self.write_statement(size)
+            try:
+                phases = self.time_phases(user, account, source, size)
+                end_to_end = self.time_run_import(user, account, source)
+            finally:
+                if default_storage.exists(source):
+                    default_storage.delete(source)
+            self.stdout.write(
+                f"{size:>12,}" + "".join(f"{size / seconds:>12,.0f}" for seconds in [*phases, end_to_end])
+            )
+
+    def write_statement(self, count):
+        now = timezone.now()
+        with tempfile.TemporaryFile(mode="w+b") as fileobj:
+            text = io.TextIOWrapper(fileobj, encoding="utf-8", newline="")
+            writer = csv.writer(text)
+            writer.writerow(["date", "amount", "description", "category"])
+            for index in range(count):
+                amount = (index % 10000) / 100
+                writer.writerow([
+                    (now - timedelta(minutes=index)).isoformat(),
+                    f"{amount:.2f}" if index % 5 == 0 else f"-{amount:.2f}",
+                    f"Benchmark row {index}",
+                    CATEGORIES[index % len(CATEGORIES)],
+                ])
+            text.detach()
+            fileobj.seek(0)
+            return default_storage.save(f"imports/benchmark-{uuid.uuid4().hex}.csv", File(fileobj))
+
+    def time_phases(self, user, account, source, count):
+        """
+        Same steps as run_import, each timed on its own.
+        """
+        job = TransactionJob(user=user, account=account, kind=TransactionJob.Kind.IMPORT, source=source)
+        validate = copy = 0
+        with db_transaction.atomic(), connection.cursor() as cursor:
+            create_staging_table(cursor)
+            with default_storage.open(source, "rb") as fileobj:
+                records = chunked(PARSERS[".csv"](fileobj), IMPORT_CHUNK_SIZE)
+                while True:
+                    started = time.perf_counter()
+                    batch = next(records, None)
+                    if batch is None:
+                        break
+                    rows, errors = validate_batch(batch, 1)
+                    validate += time.perf_counter() - started
+                    if errors:
+                        raise CommandError(f"Synthetic rows rejected: {errors[:3]}")
+                    started = time.perf_counter()
+                    copy_to_staging(cursor, rows)
+                    copy += time.perf_counter() - started
+
+            started = time.perf_counter()
+            _, imported = merge_staging(cursor, job)
+            merge_staging_rollups(cursor, job)
+            merge = time.perf_counter() - started
+            if imported != count:
+                raise CommandError(f"{imported} rows merged, {count} expected.")
+            db_transaction.set_rollback(True)
+        return validate, copy, merge
+
+    def time_run_import(self, user, account, source):
+        with db_transaction.atomic():
+            job = TransactionJob.objects.create(
+                user=user, account=account, kind=TransactionJob.Kind.IMPORT, source=source
+            )
+            started = time.perf_counter()
+            run_import(job)
+            elapsed = time.perf_counter() - started
+            db_transaction.set_rollback(True)
+        return elapsed
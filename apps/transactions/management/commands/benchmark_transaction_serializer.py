@@ -0,0 +1,112 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db import transaction as db_transaction
+from rest_framework.renderers import JSONRenderer
+
+from apps.accounts.models import Account
+from apps.transactions.models import Transaction
+from apps.transactions.serializers import TransactionSerializer, TransactionValuesSerializer
+
+
+User = get_user_model()
+
+
+def timed(function, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def count_queries(function):
+    count = 0
+
+    def counter(execute, sql, params, many, context):
+        nonlocal count
+        count += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(counter):
+        result = function()
+    return count, result
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare TransactionSerializer with TransactionValuesSerializer on a list of transactions, "
+        "queries and rendering included. Synthetic rows are inserted in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="Email of the user who owns the synthetic rows.")
+        parser.add_argument("--rows", type=int, default=10000, help="Transactions to serialize.")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per measure (best time is kept).")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+        account = Account.objects.filter(user=user).order_by("-is_default", "pkid").first()
+        if account is None:
+            raise CommandError(f"User {options['user']} has no account.")
+        count, repeat = options["rows"], options["repeat"]
+        renderer = JSONRenderer()
+
+        with db_transaction.atomic():
+            self.insert_rows(user, account, count)
+            transactions = Transaction.objects.filter(user=user).order_by("-date", "-pkid")[:count]
+
+            def model_serializer():
+                return renderer.render(TransactionSerializer(transactions.all(), many=True).data)
+
+            def model_serializer_joined():
+                queryset = transactions.select_related("user", "account")
+                return renderer.render(TransactionSerializer(queryset, many=True).data)
+
+            def values_serializer():
+                queryset = TransactionValuesSerializer.prepare(transactions.all())
+                return renderer.render(TransactionValuesSerializer(queryset, many=True).data)
+
+            measures = []
+            for name, function in [
+                ("ModelSerializer", model_serializer),
+                ("ModelSerializer + select_related", model_serializer_joined),
+                ("TransactionValuesSerializer", values_serializer),
+            ]:
+                queries, output = count_queries(function)
+                measures.append((name, queries, timed(function, repeat)[0], output))
+            db_transaction.set_rollback(True)
+
+        reference = measures[0][3]
+        self.stdout.write(f"{count:,} transactions, best of {repeat} runs, JSON rendering included")
+        self.stdout.write(f"{'serializer':<34}{'queries':>9}{'ms':>10}{'speedup':>9}  output")
+        for name, queries, elapsed, output in measures:
+            self.stdout.write(
+                f"{name:<34}{queries:>9}{elapsed * 1000:>10.1f}{measures[0][2] / elapsed:>8.1f}x  "
+                f"{'identical' if output == reference else 'DIFFERENT'}"
+            )
+        if any(output != reference for *_, output in measures):
+            raise CommandError("The serializers do not render the same JSON.")
+
+    def insert_rows(self, user, account, count):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Transaction._meta.db_table}
+                    (id, user_id, account_id, type, amount, description, date, category,
+                     "isRecurring", status, created_at, updated_at)
+                SELECT gen_random_uuid(), %(user)s, %(account)s,
+                       CASE WHEN g %% 5 = 0 THEN 'income' ELSE 'expense' END, (g %% 10000) / 100.0,
+                       'benchmark row ' || g, now() + g * interval '1 second', 'benchmark',
+                       false, 'completed', now(), now()
+                FROM generate_series(1, %(count)s) AS g
+                """,
+                {"user": user.pkid, "account": account.pkid, "count": count},
+            )
@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.transactions.utils.rollups import rebuild_rollups
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly and daily transaction rollups from the transactions table and the archives."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only rebuild the rollups of this user (email).")
+
+    def handle(self, *args, **options):
+        user_id = None
+        if options["user"]:
+            try:
+                user_id = User.objects.get(email=options["user"]).pkid
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist.")
+
+        rows = rebuild_rollups(user_id=user_id)
+        self.stdout.write(self.style.SUCCESS(f"{rows} rollup rows rebuilt."))
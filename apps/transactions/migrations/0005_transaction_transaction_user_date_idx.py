@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_transaction_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-date', '-pkid'], name='transaction_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:29
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('transactions', '0005_transaction_transaction_user_date_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'type', '-date', '-pkid'], name='transaction_user_type_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'category', '-date', '-pkid'], name='transaction_user_cat_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['account', '-date', '-pkid'], name='transaction_account_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'amount', 'pkid'], name='transaction_user_amount_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('isRecurring', True)), fields=['user', '-date', '-pkid'], name='transaction_user_recurring_idx'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:29
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, transaction
+
+
+TABLE = "transactions_transaction"
+BACKFILL_BATCH_SIZE = 10000
+
+SEARCH_VECTOR_TRIGGER = """
+CREATE OR REPLACE FUNCTION transactions_transaction_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.category, '')), 'A') ||
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER transactions_transaction_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF category, description, search_vector ON transactions_transaction
+    FOR EACH ROW EXECUTE FUNCTION transactions_transaction_search_vector_update();
+"""
+
+DROP_SEARCH_VECTOR_TRIGGER = """
+DROP TRIGGER IF EXISTS transactions_transaction_search_vector_trigger ON transactions_transaction;
+DROP FUNCTION IF EXISTS transactions_transaction_search_vector_update();
+"""
+
+
+def backfill_search_vector(apps, schema_editor):
+    """
+    Remplit search_vector des lignes existantes par tranches de pkid, chacune
+    dans sa transaction : les verrous de ligne restent courts. Le trigger
+    calcule la valeur (UPDATE OF search_vector) ; les lignes écrites pendant
+    la migration passent déjà par lui.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"SELECT COALESCE(MIN(pkid), 0), COALESCE(MAX(pkid), 0) FROM {TABLE}")
+        low, high = cursor.fetchone()
+        while low <= high:
+            with transaction.atomic():
+                cursor.execute(
+                    f"""
+                    UPDATE {TABLE} SET search_vector = NULL
+                    WHERE pkid >= %s AND pkid < %s AND search_vector IS NULL
+                    """,
+                    [low, low + BACKFILL_BATCH_SIZE],
+                )
+            low += BACKFILL_BATCH_SIZE
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('transactions', '0006_transaction_filter_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='transaction',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(SEARCH_VECTOR_TRIGGER, DROP_SEARCH_VECTOR_TRIGGER),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop, elidable=False),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='transaction_search_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['description'], name='transaction_desc_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['category'], name='transaction_cat_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0003_balance_ledger'),
+        ('transactions', '0008_transactionjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionMonthlyRollup',
+            fields=[
+                ('pkid', models.BigAutoField(editable=False, primary_key=True, serialize=False)),
+                ('month', models.DateField()),
+                ('type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=10)),
+                ('category', models.CharField(max_length=50)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transaction_rollups', to='accounts.account')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transaction_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'month'], name='transaction_rollup_month_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='transactionmonthlyrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'account', 'month', 'type', 'category'), name='transaction_rollup_key'),
+        ),
+        # Remplissage initial à partir des transactions existantes
+        migrations.RunSQL(
+            sql=[(
+                """
+                INSERT INTO transactions_transactionmonthlyrollup
+                    (user_id, account_id, month, type, category, total, count)
+                SELECT user_id, account_id,
+                       date_trunc('month', date AT TIME ZONE %s)::date,
+                       type, category, SUM(amount), COUNT(*)
+                FROM transactions_transaction
+                GROUP BY 1, 2, 3, 4, 5
+                """,
+                [settings.TIME_ZONE],
+            )],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
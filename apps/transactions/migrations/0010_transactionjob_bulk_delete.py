@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0009_transactionmonthlyrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transactionjob',
+            name='kind',
+            field=models.CharField(choices=[('import', 'Import'), ('bulk_delete', 'Bulk delete')], max_length=20),
+        ),
+    ]
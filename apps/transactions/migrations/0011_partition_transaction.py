@@ -0,0 +1,223 @@
+# Conversion de transactions_transaction en table partitionnée par mois sur
+# ``date``, sans bloquer l'application :
+#
+# 1. création de la table partitionnée (partitions mensuelles + défaut),
+#    avec les mêmes index et clés étrangères ;
+# 2. un trigger recopie chaque écriture faite sur l'ancienne table ;
+# 3. recopie des lignes existantes par lots, chacun dans sa transaction ;
+# 4. échange des deux tables dans une transaction courte.
+#
+# Postgres impose la clé de partition dans toute contrainte d'unicité : la
+# clé primaire devient (pkid, date) et l'unicité de ``id`` devient
+# (id, date). pkid reste alimenté par une séquence unique, id par uuid4.
+
+from datetime import datetime, time
+import re
+import uuid
+
+from django.db import migrations, models, transaction
+from django.utils import timezone
+
+
+TABLE = "transactions_transaction"
+NEW_TABLE = "transactions_transaction_partitioned"
+NEW_SEQUENCE = f"{NEW_TABLE}_pkid_seq"
+SYNC_FUNCTION = "transactions_transaction_partition_sync"
+
+COPY_BATCH_SIZE = 20000
+MONTHS_AHEAD = 3
+# Les mois plus anciens restent dans la partition par défaut
+MAX_MONTHS_BACK = 120
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def month_bounds(month):
+    start = timezone.make_aware(datetime.combine(month, time.min))
+    end = timezone.make_aware(datetime.combine(add_months(month, 1), time.min))
+    return start, end
+
+
+def create_partitioned_table(cursor):
+    cursor.execute(
+        f"""
+        CREATE TABLE {NEW_TABLE} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY RANGE (date)
+        """
+    )
+    cursor.execute(f"CREATE SEQUENCE {NEW_SEQUENCE} OWNED BY {NEW_TABLE}.pkid")
+    cursor.execute(f"ALTER TABLE {NEW_TABLE} ALTER COLUMN pkid SET DEFAULT nextval('{NEW_SEQUENCE}')")
+    cursor.execute(f"ALTER TABLE {NEW_TABLE} ADD CONSTRAINT {NEW_TABLE}_pkey PRIMARY KEY (pkid, date)")
+    cursor.execute(f"ALTER TABLE {NEW_TABLE} ADD CONSTRAINT transaction_id_date_key UNIQUE (id, date)")
+
+    # Partitions : des mois existants jusqu'à MONTHS_AHEAD mois après le mois courant
+    current = timezone.localdate().replace(day=1)
+    cursor.execute(f"SELECT MIN(date) FROM {TABLE}")
+    oldest = cursor.fetchone()[0]
+    month = timezone.localtime(oldest).date().replace(day=1) if oldest else current
+    month = max(month, add_months(current, -MAX_MONTHS_BACK))
+    while month <= add_months(current, MONTHS_AHEAD):
+        start, end = month_bounds(month)
+        cursor.execute(
+            f"CREATE TABLE {TABLE}_p{month:%Y_%m} PARTITION OF {NEW_TABLE} FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+        month = add_months(month, 1)
+    cursor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {NEW_TABLE} DEFAULT")
+
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+        """,
+        [TABLE],
+    )
+    for name, definition in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {NEW_TABLE} ADD CONSTRAINT {name} {definition}")
+
+    # Index créés avant la recopie : les créer ensuite bloquerait les écritures
+    cursor.execute(
+        """
+        SELECT index_class.relname, pg_get_indexdef(index_class.oid)
+        FROM pg_index
+        JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+        WHERE pg_index.indrelid = %s::regclass
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = pg_index.indexrelid)
+        """,
+        [TABLE],
+    )
+    renames = []
+    for name, definition in cursor.fetchall():
+        temporary = f"{name[:60]}_p"
+        cursor.execute(
+            re.sub(r"INDEX \S+ ON \S+ ", f"INDEX {temporary} ON {NEW_TABLE} ", definition, count=1)
+        )
+        renames.append((temporary, name))
+    return renames
+
+
+def install_sync_trigger(cursor):
+    cursor.execute(
+        f"""
+        CREATE FUNCTION {SYNC_FUNCTION}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {NEW_TABLE} WHERE pkid = OLD.pkid AND date = OLD.date;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {NEW_TABLE} SELECT (NEW).*;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER {SYNC_FUNCTION}_trigger
+            AFTER INSERT OR UPDATE OR DELETE ON {TABLE}
+            FOR EACH ROW EXECUTE FUNCTION {SYNC_FUNCTION}();
+        """
+    )
+
+
+def copy_rows(cursor):
+    """
+    Recopie par tranches de pkid. FOR SHARE attend les UPDATE en cours et
+    lit leur dernière version ; une ligne déjà recopiée par le trigger est
+    ignorée par ON CONFLICT.
+    """
+    cursor.execute(f"SELECT COALESCE(MIN(pkid), 0), COALESCE(MAX(pkid), 0) FROM {TABLE}")
+    low, high = cursor.fetchone()
+    while low <= high:
+        with transaction.atomic():
+            cursor.execute(
+                f"""
+                INSERT INTO {NEW_TABLE}
+                SELECT * FROM (
+                    SELECT * FROM {TABLE} WHERE pkid >= %s AND pkid < %s FOR SHARE
+                ) AS batch
+                ON CONFLICT DO NOTHING
+                """,
+                [low, low + COPY_BATCH_SIZE],
+            )
+        low += COPY_BATCH_SIZE
+
+
+def swap_tables(cursor, renames):
+    with transaction.atomic():
+        cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'pkid')", [TABLE])
+        old_sequence = cursor.fetchone()[0]
+        last_pkid = 0
+        if old_sequence:
+            cursor.execute(f"SELECT last_value FROM {old_sequence}")
+            last_pkid = cursor.fetchone()[0]
+
+        cursor.execute(f"DROP TABLE {TABLE}")
+        cursor.execute(f"DROP FUNCTION {SYNC_FUNCTION}()")
+        cursor.execute(f"ALTER TABLE {NEW_TABLE} RENAME TO {TABLE}")
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME CONSTRAINT {NEW_TABLE}_pkey TO {TABLE}_pkey")
+        cursor.execute(f"ALTER SEQUENCE {NEW_SEQUENCE} RENAME TO {TABLE}_pkid_seq")
+        cursor.execute(
+            f"SELECT setval('{TABLE}_pkid_seq', GREATEST(%s, (SELECT COALESCE(MAX(pkid), 0) FROM {TABLE}), 1))",
+            [last_pkid],
+        )
+        for temporary, name in renames:
+            cursor.execute(f"ALTER INDEX {temporary} RENAME TO {name}")
+
+        # Trigger de recherche de 0007, supprimé avec l'ancienne table
+        cursor.execute(
+            f"""
+            CREATE TRIGGER transactions_transaction_search_vector_trigger
+                BEFORE INSERT OR UPDATE OF category, description, search_vector ON {TABLE}
+                FOR EACH ROW EXECUTE FUNCTION transactions_transaction_search_vector_update();
+            """
+        )
+
+
+def partition_transaction_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE])
+        if cursor.fetchone():
+            return
+        with transaction.atomic():
+            renames = create_partitioned_table(cursor)
+            install_sync_trigger(cursor)
+        copy_rows(cursor)
+        swap_tables(cursor, renames)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('transactions', '0010_transactionjob_bulk_delete'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(partition_transaction_table, elidable=False),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='transaction',
+                    name='id',
+                    field=models.UUIDField(default=uuid.uuid4, editable=False),
+                ),
+                migrations.AddConstraint(
+                    model_name='transaction',
+                    constraint=models.UniqueConstraint(fields=('id', 'date'), name='transaction_id_date_key'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('transactions', '0011_partition_transaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionArchive',
+            fields=[
+                ('pkid', models.BigAutoField(editable=False, primary_key=True, serialize=False)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('month', models.DateField()),
+                ('path', models.CharField(max_length=255)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('min_date', models.DateTimeField()),
+                ('max_date', models.DateTimeField()),
+                ('min_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('max_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('min_pkid', models.BigIntegerField()),
+                ('max_pkid', models.BigIntegerField()),
+                ('account_ids', models.JSONField(default=list)),
+                ('summary', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transaction_archives', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'min_date', 'max_date'], name='transaction_archive_range_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Index partiel de la file des modèles récurrents (models.RECURRING_QUEUE),
+# par date d'échéance (models.RECURRING_DUE_AT).
+#
+# Postgres ne sait pas créer en CONCURRENTLY un index sur une table
+# partitionnée : l'index est déclaré sur la seule table mère (ON ONLY, donc
+# invalide et instantané), construit en CONCURRENTLY sur chaque partition,
+# puis chaque index de partition lui est rattaché. Il devient valide quand
+# toutes les partitions le sont. Les écritures ne sont jamais bloquées.
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+TABLE = "transactions_transaction"
+INDEX = "transaction_recurring_due_idx"
+COLUMNS = """(COALESCE("nextRecurringDate", '-infinity'::timestamptz))"""
+CONDITION = """("isRecurring" AND "status" = 'completed' AND ("nextRecurringDate" IS NOT NULL OR "lastProcessed" IS NULL))"""
+
+
+def create_due_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = %s::regclass
+            ORDER BY child.relname
+            """,
+            [TABLE],
+        )
+        partitions = [name for (name,) in cursor.fetchall()]
+        if not partitions:
+            cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX} ON {TABLE} {COLUMNS} WHERE {CONDITION}")
+            return
+
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {INDEX} ON ONLY {TABLE} {COLUMNS} WHERE {CONDITION}")
+        for partition in partitions:
+            partition_index = f"{partition}_due_idx"
+            cursor.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} ON {partition} {COLUMNS} WHERE {CONDITION}"
+            )
+            cursor.execute(f"ALTER INDEX {INDEX} ATTACH PARTITION {partition_index}")
+
+
+def drop_due_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP INDEX IF EXISTS {INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('transactions', '0012_transactionarchive'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_due_index, drop_due_index, elidable=False),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='transaction',
+                    index=models.Index(django.db.models.functions.comparison.Coalesce('nextRecurringDate', django.db.models.functions.comparison.Cast(models.Value('-infinity'), models.DateTimeField())), condition=models.Q(('isRecurring', True), ('status', 'completed'), models.Q(('nextRecurringDate__isnull', False), ('lastProcessed__isnull', True), _connector='OR')), name='transaction_recurring_due_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0013_transaction_recurring_due_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyReportRun',
+            fields=[
+                ('pkid', models.BigAutoField(editable=False, primary_key=True, serialize=False)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('month', models.DateField(unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('chunk_size', models.PositiveIntegerField()),
+                ('total_users', models.PositiveIntegerField(default=0)),
+                ('processed_users', models.PositiveIntegerField(default=0)),
+                ('failed_users', models.PositiveIntegerField(default=0)),
+                ('total_chunks', models.PositiveIntegerField(default=0)),
+                ('completed_chunks', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthlyReportChunk',
+            fields=[
+                ('pkid', models.BigAutoField(editable=False, primary_key=True, serialize=False)),
+                ('start_pkid', models.BigIntegerField()),
+                ('end_pkid', models.BigIntegerField()),
+                ('user_count', models.PositiveIntegerField()),
+                ('last_user_pkid', models.BigIntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('processed_users', models.PositiveIntegerField(default=0)),
+                ('failed_users', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='transactions.monthlyreportrun')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyreportchunk',
+            constraint=models.UniqueConstraint(fields=('run', 'start_pkid'), name='monthly_report_chunk_start_key'),
+        ),
+    ]
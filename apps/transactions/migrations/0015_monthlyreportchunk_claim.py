@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0014_monthlyreportrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthlyreportchunk',
+            name='claim_token',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='monthlyreportchunk',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
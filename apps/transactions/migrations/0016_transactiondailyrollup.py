@@ -0,0 +1,53 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_balance_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('transactions', '0015_monthlyreportchunk_claim'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionDailyRollup',
+            fields=[
+                ('pkid', models.BigAutoField(editable=False, primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=10)),
+                ('category', models.CharField(max_length=50)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transaction_daily_rollups', to='accounts.account')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transaction_daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'day'], name='transaction_daily_rollup_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='transactiondailyrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'account', 'day', 'type', 'category'), name='transaction_daily_rollup_key'),
+        ),
+        # Remplissage initial à partir des transactions en base ; les jours
+        # archivés sont ajoutés par la commande rebuild_transaction_rollups
+        migrations.RunSQL(
+            sql=[(
+                """
+                INSERT INTO transactions_transactiondailyrollup
+                    (user_id, account_id, day, type, category, total, count)
+                SELECT user_id, account_id, (date AT TIME ZONE %s)::date,
+                       type, category, SUM(amount), COUNT(*)
+                FROM transactions_transaction
+                GROUP BY 1, 2, 3, 4, 5
+                """,
+                [settings.TIME_ZONE],
+            )],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,6 +1,9 @@
 import uuid
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Cast, Coalesce
 from django.utils.translation import gettext_lazy as _
 
 from apps.accounts.models import Account
@@ -8,6 +11,13 @@ from apps.accounts.models import Account
 
 User = get_user_model()
 
+# File des modèles récurrents : modèles actifs, échus à RECURRING_DUE_AT.
+# Un modèle jamais traité et sans prochaine date est échu tout de suite.
+RECURRING_QUEUE = models.Q(isRecurring=True, status="completed") & (
+    models.Q(nextRecurringDate__isnull=False) | models.Q(lastProcessed__isnull=True)
+)
+RECURRING_DUE_AT = Coalesce("nextRecurringDate", Cast(models.Value("-infinity"), models.DateTimeField()))
+
 class Transaction(models.Model):
 
     class Type(models.TextChoices):
@@ -25,8 +35,10 @@ class Transaction(models.Model):
         COMPLETED = ("completed",_("Completed"))
         Failed = ("failed",_("Failed"))
 
+    # La table est partitionnée par mois sur ``date`` (migration 0011) : en
+    # base, la clé primaire est (pkid, date) et l'unicité de id porte sur (id, date).
     pkid = models.BigAutoField(primary_key=True, editable=False)
-    id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    id = models.UUIDField(default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, related_name="transactions", on_delete=models.CASCADE)
     account = models.ForeignKey(Account,related_name="transactions", on_delete=models.CASCADE)
     type = models.CharField(verbose_name=_("Type"),max_length=10, choices=Type.choices, default=Type.EXPENSE)
@@ -42,9 +54,239 @@ class Transaction(models.Model):
     status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Maintenu par un trigger Postgres à partir de category et description
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["id", "date"], name="transaction_id_date_key"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-date", "-pkid"], name="transaction_user_date_idx"),
+            models.Index(fields=["user", "type", "-date", "-pkid"], name="transaction_user_type_date_idx"),
+            models.Index(fields=["user", "category", "-date", "-pkid"], name="transaction_user_cat_date_idx"),
+            models.Index(fields=["account", "-date", "-pkid"], name="transaction_account_date_idx"),
+            models.Index(fields=["user", "amount", "pkid"], name="transaction_user_amount_idx"),
+            models.Index(
+                fields=["user", "-date", "-pkid"],
+                name="transaction_user_recurring_idx",
+                condition=models.Q(isRecurring=True),
+            ),
+            # Ne contient que la file des modèles récurrents : sa taille ne
+            # dépend pas de l'historique
+            models.Index(RECURRING_DUE_AT, name="transaction_recurring_due_idx", condition=RECURRING_QUEUE),
+            GinIndex(fields=["search_vector"], name="transaction_search_idx"),
+            GinIndex(fields=["description"], name="transaction_desc_trgm_idx", opclasses=["gin_trgm_ops"]),
+            GinIndex(fields=["category"], name="transaction_cat_trgm_idx", opclasses=["gin_trgm_ops"]),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.amount}"
 
 
 
+
+
+class TransactionMonthlyRollup(models.Model):
+    """
+    Somme et nombre de transactions par (utilisateur, compte, mois, type,
+    catégorie), tenus à jour dans la même transaction que chaque écriture
+    (voir apps/transactions/utils/rollups.py). ``month`` est le premier jour
+    du mois dans le fuseau TIME_ZONE.
+    """
+
+    pkid = models.BigAutoField(primary_key=True, editable=False)
+    user = models.ForeignKey(User, related_name="transaction_rollups", on_delete=models.CASCADE)
+    account = models.ForeignKey(Account, related_name="transaction_rollups", on_delete=models.CASCADE)
+    month = models.DateField()
+    type = models.CharField(max_length=10, choices=Transaction.Type.choices)
+    category = models.CharField(max_length=50)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "account", "month", "type", "category"],
+                name="transaction_rollup_key",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "month"], name="transaction_rollup_month_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.type} {self.category} - {self.total}"
+
+
+class TransactionDailyRollup(models.Model):
+    """
+    Même agrégat que TransactionMonthlyRollup, par jour : sert les
+    intervalles jour / semaine et les mois partiels des analyses. ``day`` est
+    la date locale (fuseau TIME_ZONE) des transactions.
+    """
+
+    pkid = models.BigAutoField(primary_key=True, editable=False)
+    user = models.ForeignKey(User, related_name="transaction_daily_rollups", on_delete=models.CASCADE)
+    account = models.ForeignKey(Account, related_name="transaction_daily_rollups", on_delete=models.CASCADE)
+    day = models.DateField()
+    type = models.CharField(max_length=10, choices=Transaction.Type.choices)
+    category = models.CharField(max_length=50)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "account", "day", "type", "category"],
+                name="transaction_daily_rollup_key",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "day"], name="transaction_daily_rollup_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.day:%Y-%m-%d} {self.type} {self.category} - {self.total}"
+
+
+class TransactionArchive(models.Model):
+    """
+    Fichier d'archive des transactions d'un utilisateur pour un mois,
+    déplacées hors de Postgres (voir apps/transactions/utils/archives.py).
+    Les bornes min / max permettent de n'ouvrir que les fichiers qui
+    recoupent la période lue ; ``summary`` garde les totaux du fichier par
+    (compte, type, catégorie).
+    """
+
+    pkid = models.BigAutoField(primary_key=True, editable=False)
+    id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    user = models.ForeignKey(User, related_name="transaction_archives", on_delete=models.CASCADE)
+    month = models.DateField()
+    path = models.CharField(max_length=255)
+    size = models.PositiveIntegerField(default=0)
+    row_count = models.PositiveIntegerField(default=0)
+    min_date = models.DateTimeField()
+    max_date = models.DateTimeField()
+    min_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    max_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    min_pkid = models.BigIntegerField()
+    max_pkid = models.BigIntegerField()
+    account_ids = models.JSONField(default=list)
+    summary = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "min_date", "max_date"], name="transaction_archive_range_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.month:%Y-%m} ({self.row_count})"
+
+
+class TransactionJob(models.Model):
+    """
+    Traitement de masse exécuté en arrière-plan (import de relevés, ...)
+    avec sa progression.
+    """
+
+    class Kind(models.TextChoices):
+        IMPORT = ("import", _("Import"))
+        BULK_DELETE = ("bulk_delete", _("Bulk delete"))
+
+    class Status(models.TextChoices):
+        PENDING = ("pending", _("Pending"))
+        RUNNING = ("running", _("Running"))
+        COMPLETED = ("completed", _("Completed"))
+        FAILED = ("failed", _("Failed"))
+
+    pkid = models.BigAutoField(primary_key=True, editable=False)
+    id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    user = models.ForeignKey(User, related_name="transaction_jobs", on_delete=models.CASCADE)
+    account = models.ForeignKey(Account, related_name="transaction_jobs", on_delete=models.CASCADE, blank=True, null=True)
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    source = models.CharField(max_length=255, blank=True)
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    failed_rows = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} - {self.status}"
+
+
+class MonthlyReportRun(models.Model):
+    """
+    Génération des rapports mensuels d'un mois, découpée en tranches
+    d'utilisateurs (MonthlyReportChunk) traitées en parallèle. Une seule
+    exécution par mois : relancer la tâche reprend celle-ci là où elle
+    s'est arrêtée.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = ("pending", _("Pending"))
+        RUNNING = ("running", _("Running"))
+        COMPLETED = ("completed", _("Completed"))
+        FAILED = ("failed", _("Failed"))
+
+    pkid = models.BigAutoField(primary_key=True, editable=False)
+    id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    month = models.DateField(unique=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    chunk_size = models.PositiveIntegerField()
+    total_users = models.PositiveIntegerField(default=0)
+    processed_users = models.PositiveIntegerField(default=0)
+    failed_users = models.PositiveIntegerField(default=0)
+    total_chunks = models.PositiveIntegerField(default=0)
+    completed_chunks = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def duration(self):
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} - {self.status} ({self.processed_users}/{self.total_users})"
+
+
+class MonthlyReportChunk(models.Model):
+    """
+    Tranche d'utilisateurs d'un MonthlyReportRun : les pkid de start_pkid à
+    end_pkid inclus. ``last_user_pkid`` avance après chaque rapport envoyé :
+    une tranche interrompue reprend après le dernier utilisateur traité.
+    Un seul worker à la fois traite la tranche : celui qui détient
+    ``claim_token``, tant que ``heartbeat_at`` est récent.
+    """
+
+    pkid = models.BigAutoField(primary_key=True, editable=False)
+    run = models.ForeignKey(MonthlyReportRun, related_name="chunks", on_delete=models.CASCADE)
+    start_pkid = models.BigIntegerField()
+    end_pkid = models.BigIntegerField()
+    user_count = models.PositiveIntegerField()
+    last_user_pkid = models.BigIntegerField(blank=True, null=True)
+    status = models.CharField(max_length=10, choices=MonthlyReportRun.Status.choices, default=MonthlyReportRun.Status.PENDING)
+    processed_users = models.PositiveIntegerField(default=0)
+    failed_users = models.PositiveIntegerField(default=0)
+    claim_token = models.UUIDField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["run", "start_pkid"], name="monthly_report_chunk_start_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.run.month:%Y-%m} [{self.start_pkid}-{self.end_pkid}] - {self.status}"
@@ -0,0 +1,206 @@
+import base64
+import binascii
+import functools
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from uuid import UUID
+
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def _encode_value(value):
+    # isoformat() garde les microsecondes, que DjangoJSONEncoder tronque :
+    # le keyset sauterait ou répéterait des lignes
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor.")
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination par curseur opaque sur un tri stable, ``(-date, -pkid)`` par
+    défaut.
+
+    Chaque page est lue avec un prédicat ``(date, pkid) < (last_date,
+    last_pkid)`` au lieu d'un OFFSET : la page N coûte le même parcours
+    d'index que la page 1. La pagination ne s'applique que si le client
+    envoie ``cursor`` ou ``limit`` ; sinon la vue renvoie toute la liste,
+    comme avant.
+    """
+
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = "limit"
+    cursor_query_param = "cursor"
+    ordering = ("-date", "-pkid")
+    tiebreaker = "pkid"
+    invalid_cursor_message = _("Invalid cursor")
+
+    def paginate_queryset(self, queryset, request, view=None, extra_rows=None):
+        """
+        ``extra_rows`` lit des lignes absentes du queryset (les transactions
+        archivées, par exemple). Elle est appelée comme ``extra_rows(ordering,
+        key, after, before, limit)`` et renvoie, déjà filtrées et triées selon
+        ``key``, les lignes strictement après la ligne ``after`` et jusqu'à la
+        ligne ``before`` ; au plus ``page_size + 1`` d'entre elles sont lues.
+        """
+        if not self.should_paginate(request):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        after = None
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+            after = self.to_row(queryset.model, position)
+
+        # Une ligne de plus indique s'il existe une page suivante, sans COUNT
+        results = list(queryset[: self.page_size + 1])
+        if extra_rows is not None:
+            # Au-delà de la dernière ligne d'une page pleine, aucune ligne
+            # supplémentaire ne peut entrer dans la page
+            before = results[-1] if len(results) > self.page_size else None
+            extra = islice(extra_rows(self.ordering, self.sort_key, after, before, self.page_size + 1), self.page_size + 1)
+            results = self.merge_rows(results, extra)[: self.page_size + 1]
+        self.has_next = len(results) > self.page_size
+        results = results[: self.page_size]
+        self.next_position = self.get_position(results[-1]) if self.has_next else None
+        return results
+
+    def should_paginate(self, request):
+        return (
+            self.cursor_query_param in request.query_params
+            or self.page_size_query_param in request.query_params
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """
+        Reprend le tri déjà appliqué au queryset (par un filtre de tri, par
+        exemple) et y ajoute le départage pour que chaque position soit unique.
+        """
+        ordering = list(queryset.query.order_by)
+        if not ordering or not all(isinstance(field, str) for field in ordering):
+            ordering = list(self.ordering)
+        if all(field.lstrip("-") != self.tiebreaker for field in ordering):
+            direction = "-" if ordering[-1].startswith("-") else ""
+            ordering.append(f"{direction}{self.tiebreaker}")
+        return tuple(ordering)
+
+    def compare(self, a, b):
+        """
+        Compare deux lignes (dicts) selon le tri de la pagination.
+        """
+        for field in self.ordering:
+            name = field.lstrip("-")
+            if a[name] != b[name]:
+                result = -1 if a[name] < b[name] else 1
+                return -result if field.startswith("-") else result
+        return 0
+
+    @property
+    def sort_key(self):
+        return functools.cmp_to_key(self.compare)
+
+    def merge_rows(self, rows, extra_rows):
+        return sorted([*rows, *extra_rows], key=self.sort_key)
+
+    def to_row(self, model, position):
+        # Les valeurs du curseur sont des chaînes JSON : on les compare dans
+        # les types Python du modèle
+        return {
+            field.lstrip("-"): model._meta.get_field(field.lstrip("-")).to_python(value)
+            for field, value in zip(self.ordering, position)
+        }
+
+    def get_keyset_filter(self, position):
+        """
+        Construit ``(f1, f2, ...) < (v1, v2, ...)`` comme un OR d'égalités de
+        préfixes, borné par la première colonne pour que le planificateur
+        puisse parcourir une plage d'index.
+        """
+        keyset = Q()
+        for index, field in enumerate(self.ordering):
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition = Q(**{f"{field.lstrip('-')}__{lookup}": position[index]})
+            for previous_field, previous_value in zip(self.ordering[:index], position[:index]):
+                condition &= Q(**{previous_field.lstrip("-"): previous_value})
+            keyset |= condition
+
+        leading = self.ordering[0]
+        bound_lookup = "lte" if leading.startswith("-") else "gte"
+        return Q(**{f"{leading.lstrip('-')}__{bound_lookup}": position[0]}) & keyset
+
+    def get_position(self, item):
+        fields = [field.lstrip("-") for field in self.ordering]
+        if isinstance(item, dict):
+            return [item[field] for field in fields]
+        return [getattr(item, field) for field in fields]
+
+    def encode_cursor(self, position):
+        payload = json.dumps(
+            {"o": list(self.ordering), "p": position},
+            default=_encode_value,
+            separators=(",", ":"),
+        )
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            ordering, position = payload["o"], payload["p"]
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        # Un curseur n'est valable que pour le tri qui l'a émis
+        if tuple(ordering) != self.ordering or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+
+class SearchPagination(KeysetPagination):
+    """
+    Les résultats de recherche sont toujours paginés, meilleur résultat en
+    premier.
+    """
+
+    page_size = 20
+    ordering = ("-rank", "-pkid")
+
+    def should_paginate(self, request):
+        return True
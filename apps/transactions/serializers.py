@@ -1,9 +1,13 @@
+from calendar import monthrange
 from uuid import UUID
 from rest_framework import serializers
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 
 from apps.accounts.models import Account
-from .models import Transaction
+from .models import Transaction, TransactionJob
+from .utils.analytics import INTERVALS, bucket_count
+from .utils.forecasts import MAX_FORECAST_MONTHS
 
 
 class TransactionSerializer(serializers.ModelSerializer):
@@ -28,9 +32,97 @@ class TransactionSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         ]
-        
+        # (id, date) n'est unique que pour le partitionnement ; id est généré
+        # par le serveur, pas de validateur unique_together à appliquer.
+        validators = []
+
+
+class UpdateTransactionSerializer(TransactionSerializer):
+    """
+    Validation d'une mise à jour (PUT ou PATCH avec partial=True), sans
+    instance : les colonnes fournies sont écrites directement par
+    update_transaction. ``account_id`` déplace la transaction vers un autre
+    compte de l'utilisateur.
+    """
+    account_id = serializers.UUIDField(required=False, write_only=True)
+
+    class Meta(TransactionSerializer.Meta):
+        fields = TransactionSerializer.Meta.fields + ["account_id"]
+
+
+class TransactionValuesSerializer:
+    """
+    Lecture seule, même sortie que TransactionSerializer(many=True), mais à
+    partir de lignes ``.values()`` : pas d'instance de modèle et pas de
+    requête par ligne pour ``user`` et ``account`` (une seule jointure).
+    """
+
+    lookups = [
+        "pkid",
+        "id",
+        "user__email",
+        "account__id",
+        "type",
+        "amount",
+        "description",
+        "date",
+        "category",
+        "receiptUrl",
+        "isRecurring",
+        "recurringInterval",
+        "nextRecurringDate",
+        "lastProcessed",
+        "created_at",
+        "updated_at",
+    ]
+
+    def __init__(self, instance=None, many=False, context=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @classmethod
+    def prepare(cls, queryset):
+        # Les annotations (ex. le rang de recherche) restent disponibles pour la pagination
+        return queryset.values(*cls.lookups, *queryset.query.annotations)
+
+    @property
+    def data(self):
+        tz = timezone.get_current_timezone()
+
+        def datetime_repr(value):
+            # Même rendu que serializers.DateTimeField (ISO 8601, fuseau courant)
+            if not value:
+                return None
+            value = value.astimezone(tz).isoformat()
+            if value.endswith("+00:00"):
+                value = value[:-6] + "Z"
+            return value
+
+        def to_representation(row):
+            return {
+                "id": str(row["id"]),
+                "user": row["user__email"],
+                "account": row["account__id"],
+                "type": row["type"],
+                "amount": "{:f}".format(row["amount"]),
+                "description": row["description"],
+                "date": datetime_repr(row["date"]),
+                "category": row["category"],
+                "receiptUrl": row["receiptUrl"],
+                "isRecurring": row["isRecurring"],
+                "recurringInterval": row["recurringInterval"],
+                "nextRecurringDate": datetime_repr(row["nextRecurringDate"]),
+                "lastProcessed": datetime_repr(row["lastProcessed"]),
+                "created_at": datetime_repr(row["created_at"]),
+                "updated_at": datetime_repr(row["updated_at"]),
+            }
+
+        if self.many:
+            return [to_representation(row) for row in self.instance]
+        return to_representation(self.instance)
+
 
-    
 class CreateTransactionSerializer(serializers.ModelSerializer):
     account_id = serializers.UUIDField()
     class Meta:
@@ -51,8 +143,68 @@ class CreateTransactionSerializer(serializers.ModelSerializer):
     def validate(self, data):
         if "receiptUrl" not in data:
             data["receiptUrl"] = ""
+        data.setdefault("isRecurring", False)
         if data["isRecurring"] == False:
             data["recurringInterval"] = ""
         return data 
 
 
+
+
+class TransactionJobSerializer(serializers.ModelSerializer):
+    account = serializers.UUIDField(source="account.id", read_only=True, allow_null=True)
+    class Meta:
+        model = TransactionJob
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "account",
+            "total_rows",
+            "processed_rows",
+            "failed_rows",
+            "errors",
+            "started_at",
+            "finished_at",
+            "created_at",
+        ]
+
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    """
+    Paramètres de l'endpoint analytics : par défaut, les 12 derniers mois
+    entiers (mois en cours compris), lus dans les rollups mensuels.
+    """
+
+    max_buckets = 1000
+
+    interval = serializers.ChoiceField(choices=INTERVALS, default="month")
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    account = serializers.UUIDField(required=False)
+
+    def validate(self, data):
+        today = timezone.localdate()
+        end = data.setdefault("end_date", today.replace(day=monthrange(today.year, today.month)[1]))
+        if "start_date" not in data:
+            month = end.month - 11
+            data["start_date"] = end.replace(
+                year=end.year + (month - 1) // 12, month=(month - 1) % 12 + 1, day=1
+            )
+        if data["start_date"] > end:
+            raise serializers.ValidationError("start_date must be before end_date.")
+        if bucket_count(data["interval"], data["start_date"], end) > self.max_buckets:
+            raise serializers.ValidationError(
+                f"Range too large for a {data['interval']} interval (max {self.max_buckets} buckets)."
+            )
+        return data
+
+
+class ForecastQuerySerializer(serializers.Serializer):
+    """
+    Paramètres de l'endpoint forecast : horizon en mois et, en option, un
+    seul compte.
+    """
+
+    months = serializers.IntegerField(min_value=1, max_value=MAX_FORECAST_MONTHS, default=3)
+    account = serializers.UUIDField(required=False)
@@ -0,0 +1,19 @@
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.transactions.models import Transaction, TransactionArchive
+from config.utils.cache import bump_user_data_version
+
+
+# Pas de post_delete ici : il désactiverait le fast delete de Django sur les
+# suppressions en masse. Les chemins de suppression invalident explicitement.
+@receiver(post_save, sender=Transaction)
+def invalidate_transaction_cache(sender, instance, **kwargs):
+    bump_user_data_version(instance.user_id)
+
+
+@receiver(post_delete, sender=TransactionArchive)
+def delete_archive_file(sender, instance, **kwargs):
+    transaction.on_commit(lambda: default_storage.delete(instance.path))
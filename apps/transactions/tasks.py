@@ -1,23 +1,44 @@
-import json
 import logging 
 
+from datetime import date
 
-from datetime import datetime
-from celery import shared_task
-from django.core.cache import cache
+from celery import chord, group, shared_task
 from django.utils import timezone
-from django.db.models import Q
 from django.db import transaction as db_transaction
 
+from apps.transactions.utils.archives import archive_old_transactions
+from apps.transactions.utils.balances import apply_balance_delta, signed_amount
+from apps.transactions.utils.deletions import run_bulk_delete
+from apps.transactions.utils.importers import run_import
+from apps.transactions.utils.partitions import ensure_partitions
+from apps.transactions.utils.ratelimits import GEMINI_LIMITER, RECURRING_LIMITER
+from apps.transactions.utils.recurring import (
+    RECURRING_CHUNK_SIZE,
+    RECURRING_WORKERS,
+    due_templates,
+    process_due_templates,
+)
+from apps.transactions.utils.reports import (
+    REPORT_CHUNK_SIZE,
+    ChunkBusy,
+    ReportQuotaExceeded,
+    fail_chunk,
+    finish_run,
+    generate_financial_insights,
+    pending_chunks,
+    previous_month,
+    process_chunk,
+    run_summary,
+    start_run,
+    users_monthly_stats,
+)
+from apps.transactions.utils.rollups import apply_rollup_deltas, transaction_rollup_item
 from apps.transactions.utils.utilities_functions import calculate_next_recurring_date, is_transaction_due
-from .models import Transaction
-
-from google.generativeai import GenerativeModel
-from google.api_core.exceptions import GoogleAPIError
-from django.db.models import Sum
+from .models import MonthlyReportRun, Transaction, TransactionJob
 
 from django.contrib.auth import get_user_model
 from config.utils.emails import send_monthly_report_email
+from config.utils.ratelimit import limit_task, retry_countdown
 
 
 logger = logging.getLogger(__name__)
@@ -27,41 +48,39 @@ User = get_user_model()
 @shared_task(name="trigger_recurring_transactions")
 def trigger_recurring_transactions():
     """
-    Tâche pour déclencher les transactions récurrentes.
+    Tâche pour déclencher les transactions récurrentes : quelques workers
+    traitent les modèles dus par blocs, en parallèle, au lieu d'une tâche
+    par modèle.
     """
+    if not due_templates(timezone.now()).exists():
+        return
+    group(process_recurring_batch.s() for _ in range(RECURRING_WORKERS)).apply_async()
 
-    # Récupérer les transactions récurrentes à traiter
-    recurring_transactions = Transaction.objects.filter(
-        isRecurring=True,
-        status=Transaction.Status.COMPLETED,
-    ).filter(Q(lastProcessed__isnull=True) | Q(nextRecurringDate__lte=datetime.now()))
 
-    # Envoyer chaque transaction récurrente à la tâche de traitement
-    for transaction in recurring_transactions:
-        process_recurring_transaction.delay(transaction.id)
+@shared_task(name="process_recurring_batch", soft_time_limit=60 * 60, time_limit=65 * 60)
+def process_recurring_batch(chunk_size=RECURRING_CHUNK_SIZE):
+    """
+    Tâche pour traiter les transactions récurrentes dues par blocs
+    (SELECT ... FOR UPDATE SKIP LOCKED), jusqu'à épuisement.
+    """
+    return {"processed": process_due_templates(chunk_size)}
 
 
-@shared_task(name="process_recurring_transaction")
-def process_recurring_transaction(transaction_id):
+@shared_task(name="process_recurring_transaction", bind=True, max_retries=None)
+def process_recurring_transaction(self, transaction_id):
     """
     Tâche pour traiter une transaction récurrente.
     """
-    user_id = Transaction.objects.get(id=transaction_id).user.id
-    cache_key= f"throttle_user_{user_id}"
-
-    # Vérifier le nombre de requêtes dans la dernière minute
-    request_count = cache.get(cache_key, 0)
-    if request_count >= 10:  # Limite de 10 requêtes par minute
-        return {"error": "Rate limit exceeded"}
-    
-    # Incrémenter le compteur de requêtes
-    cache.set(cache_key, request_count + 1, timeout=60)
-
     try:
         transaction = Transaction.objects.get(id=transaction_id)
+
         # vérifier si la transaction est due
         if not is_transaction_due(transaction):
             return
+
+        # Limite par utilisateur : au-delà, la tâche est replanifiée avec
+        # backoff au lieu d'être abandonnée
+        limit_task(self, RECURRING_LIMITER, transaction.user_id)
         
         # Créer une nouvelle transaction et mettre à jour le solde du compte
         with db_transaction.atomic():
@@ -78,15 +97,10 @@ def process_recurring_transaction(transaction_id):
                 status=Transaction.Status.PENDING
             )
 
-            # Mettre à jour le solde du compte
-            balance_change = 0
-            if transaction.type == "expense":
-                balance_change -= transaction.amount
-            else:
-                balance_change += transaction.amount
-            
-            transaction.account.balance += balance_change
-            transaction.account.save()
+            apply_rollup_deltas([transaction_rollup_item(new_transaction)])
+
+            # Mettre à jour le solde du compte (UPDATE atomique, sans relecture)
+            apply_balance_delta(transaction.account_id, signed_amount(transaction.type, transaction.amount))
 
             # Mettre à jour la date de dernier traitement et la prochaine date de récurrence
             transaction.lastProcessed = timezone.now()
@@ -96,92 +110,147 @@ def process_recurring_transaction(transaction_id):
         pass
 
 
-@shared_task(name="generate_monthly_reports")
-def generate_monthly_reports():
+@shared_task(name="import_transactions", soft_time_limit=30 * 60, time_limit=35 * 60)
+def import_transactions(job_id):
     """
-    Tâche pour générer des rapports mensuels pour tous les utilisateurs 
+    Tâche pour importer un relevé bancaire (CSV/OFX) en masse.
     """
-    users = User.objects.all()
-    for user in users:
-        generate_user_monthly_report.delay(user.id)
-    
-    return {"Processed": users.count()}
+    try:
+        job = TransactionJob.objects.get(id=job_id, kind=TransactionJob.Kind.IMPORT)
+    except TransactionJob.DoesNotExist:
+        return
 
+    try:
+        return {"imported": run_import(job)}
+    except Exception as e:
+        logger.error(f"Import {job_id} failed: {e}", exc_info=True)
+        job.status = TransactionJob.Status.FAILED
+        job.errors = job.errors + [{"error": str(e)}]
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "errors", "finished_at", "updated_at"])
 
-@shared_task(name="generate_user_monthly_report")
-def generate_user_monthly_report(user_id):
+
+@shared_task(name="bulk_delete_transactions", soft_time_limit=30 * 60, time_limit=35 * 60)
+def bulk_delete_transactions(job_id):
     """
-    Tâche pour générer un rapport mensuel pour un utilisateur spécifique
+    Tâche pour supprimer une très grande liste de transactions par blocs.
     """
     try:
-        user = User.objects.get(id=user_id)
-        last_month = timezone.now() - timezone.timedelta(days=30)
+        job = TransactionJob.objects.get(id=job_id, kind=TransactionJob.Kind.BULK_DELETE)
+    except TransactionJob.DoesNotExist:
+        return
 
-        # récupérer les satistiques mensuelles
-        stats = get_monthly_stats(user, last_month)
-        month_name = last_month.strftime("%B")
-
-        # Générer des insights avec Gemini
-        insights = generate_financial_insights(stats, month_name)
+    try:
+        return {"deleted": run_bulk_delete(job)}
+    except Exception as e:
+        logger.error(f"Bulk delete {job_id} failed: {e}", exc_info=True)
+        job.status = TransactionJob.Status.FAILED
+        job.errors = job.errors + [{"error": str(e)}]
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "errors", "finished_at", "updated_at"])
 
-        # Envoyer un e-mail avec le rapport
-        send_monthly_report_email(user, stats, month_name, insights)
 
-    except User.DoesNotExist:
-        pass
+@shared_task(name="create_transaction_partitions")
+def create_transaction_partitions():
+    """
+    Tâche pour créer à l'avance les partitions mensuelles de Transaction.
+    """
+    created = ensure_partitions()
+    if created:
+        logger.info(f"Transaction partitions created: {', '.join(created)}.")
+    return created
 
 
-def get_monthly_stats(user, month):
+@shared_task(name="archive_transactions", soft_time_limit=60 * 60, time_limit=65 * 60)
+def archive_transactions():
     """
-    Récupérer les statistiques mensuelles pour un utilisateur
+    Tâche pour archiver hors de Postgres les transactions terminées plus anciennes que l'horizon.
     """
-    transactions = Transaction.objects.filter(
-        user = user,
-        date__month = month.month,
-        date__year = month.year
-    )
+    return {"archived": archive_old_transactions()}
 
-    total_income = transactions.filter(type="income").aggregate(Sum("amount"))["amount__sum"] or 0
-    total_expenses = transactions.filter(type="expense").aggregate(Sum("amount"))["ammount__sum"] or 0
-    by_category = transactions.filter(type="expense").values("category").annotate(total=Sum("amount"))
 
-    return {
-        "total_incomes": total_income,
-        "total_expenses": total_expenses,
-        "by_category": {
-            item["category"]: item["total"] for item in by_category
-        },
-    }
+@shared_task(name="generate_monthly_reports")
+def generate_monthly_reports(month=None, chunk_size=REPORT_CHUNK_SIZE):
+    """
+    Tâche pour générer les rapports mensuels de tous les utilisateurs : une
+    tâche par tranche d'utilisateurs, en parallèle, puis
+    finish_monthly_reports quand toutes sont terminées. Relancée pour le
+    même mois (``month`` au format ISO, le mois précédent par défaut), elle
+    reprend les tranches inachevées.
+    """
+    month = date.fromisoformat(month) if month else previous_month()
+    run = start_run(month, chunk_size)
+    if run.status == MonthlyReportRun.Status.COMPLETED:
+        return run_summary(run)
+
+    chunk_ids = list(pending_chunks(run).values_list("pkid", flat=True))
+    if chunk_ids:
+        chord(generate_monthly_report_chunk.s(chunk_id) for chunk_id in chunk_ids)(
+            finish_monthly_reports.si(run.pkid)
+        )
+    else:
+        finish_monthly_reports.delay(run.pkid)
+    return {**run_summary(run), "dispatched_chunks": len(chunk_ids)}
+
+
+@shared_task(
+    name="generate_monthly_report_chunk",
+    bind=True,
+    max_retries=None,
+    acks_late=True,
+    soft_time_limit=60 * 60,
+    time_limit=65 * 60,
+)
+def generate_monthly_report_chunk(self, chunk_id):
+    """
+    Tâche pour envoyer les rapports d'une tranche d'utilisateurs. Confirmée
+    seulement à la fin (acks_late) : si le worker tombe, la tranche est
+    relivrée et reprend après le dernier rapport envoyé, une fois le bail
+    du worker arrêté expiré.
+    """
+    try:
+        chunk = process_chunk(chunk_id)
+    except ReportQuotaExceeded:
+        raise self.retry(countdown=retry_countdown(self.request.retries))
+    except ChunkBusy as e:
+        # Tranche détenue par un autre worker : revenir après son bail
+        raise self.retry(countdown=retry_countdown(0, e.retry_after))
+    except Exception as e:
+        logger.error(f"Monthly report chunk {chunk_id} failed: {e}")
+        fail_chunk(chunk_id)
+        raise
+    return {"chunk": chunk.pkid, "processed": chunk.processed_users, "failed": chunk.failed_users}
 
 
-def generate_financial_insights(stats, month):
+@shared_task(name="finish_monthly_reports")
+def finish_monthly_reports(run_id):
     """
-    Génère des insights financières avec Gemini
+    Tâche de fin des rapports mensuels : clôt l'exécution et sa durée.
     """
-    model = GenerativeModel("gemini-1.5-flash")
-    prompt = f"""
-        Analyze this financial data and provide 3 concise, actionable insights.
-        Focus on spending patterns and practical advice.
-        Keep it friendly and conversational.
+    return run_summary(finish_run(run_id))
 
-        Financial Data for {month}:
-        - Total Income: ${stats["total_income"]}
-        - Total Expenses: ${stats["total_expenses"]}
-        - Net Income: ${stats["total_income"] - stats["total_expenses"]}
-        - Expense Categories: {", ".join([f"{k}: ${v}" for k, v in stats["by_category"].items()])}
-        
-        Format the response as a JSON array of strings, like this:
-        ["insight 1", "insight 2", "insight 2"]
+
+@shared_task(name="generate_user_monthly_report", bind=True, max_retries=None)
+def generate_user_monthly_report(self, user_id):
+    """
+    Tâche pour générer un rapport mensuel pour un utilisateur spécifique
     """
     try:
-        response = model.generate_content(prompt)
-        text = response.text.replace("```json","").replace("```","").strip()
-        return json.loads(text)
-    except Exception as e:
-        logger.error(f"Error generating insights: {e}")
-        return [
-            "Your highest expense category this month might need attention.",
-            "Consider setting up a budget for better financial management.",
-            "Track your recurring expenses to identify potential savings.",
-        ]
+        user = User.objects.get(id=user_id)
+        # Quota Gemini partagé avec le scanner de reçus
+        limit_task(self, GEMINI_LIMITER)
+        month = previous_month()
+
+        # récupérer les satistiques mensuelles
+        stats = users_monthly_stats(user.pkid, user.pkid, month)[user.pkid]
+        month_name = month.strftime("%B")
+
+        # Générer des insights avec Gemini
+        insights = generate_financial_insights(stats, month_name)
+
+        # Envoyer un e-mail avec le rapport
+        send_monthly_report_email(user, stats, month_name, insights)
+
+    except User.DoesNotExist:
+        pass
     
@@ -1,3 +1,994 @@
-from django.test import TestCase
+import io
+import json
+import math
+import random
+import re
+import threading
+from calendar import isleap, monthrange
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from time import monotonic, sleep
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+import numpy as np
+import redis
+from celery.exceptions import Retry
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db import transaction as db_transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from apps.accounts.models import Account
+from apps.accounts.utils.ledger import enable_ledger, get_current_balance
+from apps.budgets.models import Budget
+from apps.transactions.models import (
+    Transaction,
+    TransactionArchive,
+    TransactionDailyRollup,
+    TransactionJob,
+    TransactionMonthlyRollup,
+)
+from apps.transactions.tasks import process_recurring_transaction
+from apps.transactions.utils.analytics import spending_buckets
+from apps.transactions.utils import archives, deletions, importers, partitions
+from apps.transactions.utils.balances import apply_balance_delta
+from apps.transactions.utils.ratelimits import GEMINI_LIMITER, RECURRING_LIMITER
+from apps.transactions.utils.recurrence import due_occurrences, expand_occurrences, next_occurrence
+from apps.transactions.utils.rollups import rebuild_rollups
+from config.utils.cache import bump_user_data_version, get_cache_metrics, get_or_compute, get_user_data_version
+from config.utils.ratelimit import LocalBackend, SlidingWindow, TokenBucket, acquire, retry_countdown, set_backend
+
+
+User = get_user_model()
+
+TRANSACTION_CONTROL = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE SAVEPOINT")
+
+
+def create_user(email="user@example.com"):
+    return User.objects.create_user(email, "password", first_name="Test", last_name="User")
+
+
+class APITestMixin:
+    def setUp(self):
+        super().setUp()
+        # Limiteurs en mémoire : les tests ne dépendent pas de Redis
+        set_backend(LocalBackend())
+        cache.clear()
+        self.user = create_user()
+        self.account = Account.objects.create(
+            user=self.user, name="Main", type="current", balance=Decimal("100.00"), is_default=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @contextmanager
+    def assertNumStatements(self, count):
+        """
+        assertNumQueries sans les ordres de contrôle de transaction (BEGIN,
+        COMMIT, SAVEPOINT...), que Django journalise aussi.
+        """
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        statements = [
+            query["sql"] for query in context.captured_queries
+            if not query["sql"].startswith(TRANSACTION_CONTROL)
+        ]
+        self.assertEqual(len(statements), count, "\n".join(statements))
+
+
+class ConcurrentBalanceDeltaTests(TransactionTestCase):
+    """
+    Variations de solde concurrentes sur un même compte : chaque thread a sa
+    propre connexion, aucune mise à jour ne doit être perdue.
+    """
+
+    threads = 16
+    deltas_per_thread = 25
+
+    def setUp(self):
+        self.user = create_user()
+
+    def run_concurrently(self, account):
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def worker(index):
+            try:
+                barrier.wait()
+                for step in range(self.deltas_per_thread):
+                    # Crédits et débits mêlés, de montants différents par thread
+                    apply_balance_delta(account.pkid, self.delta(index, step))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(index,)) for index in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def delta(self, index, step):
+        return Decimal(f"{index + 1}.25") if step % 2 == 0 else -Decimal(f"{index}.50")
+
+    def expected_balance(self, initial):
+        return initial + sum(
+            self.delta(index, step) for index in range(self.threads) for step in range(self.deltas_per_thread)
+        )
+
+    def test_no_lost_update_on_account_row(self):
+        account = Account.objects.create(user=self.user, name="Shared", type="current", balance=Decimal("100.00"))
+        self.run_concurrently(account)
+        account.refresh_from_db()
+        self.assertEqual(account.balance, self.expected_balance(Decimal("100.00")))
+
+    def test_no_lost_update_on_ledger_account(self):
+        account = Account.objects.create(user=self.user, name="Hot", type="current", balance=Decimal("100.00"))
+        enable_ledger(account.pkid)
+        self.run_concurrently(account)
+        self.assertEqual(get_current_balance(account.pkid), self.expected_balance(Decimal("100.00")))
+
+
+class MonthPartitionTests(TransactionTestCase):
+    """
+    Création d'une partition mensuelle quand la partition par défaut contient
+    déjà des lignes du mois, et attente d'une requête qui la verrouille.
+    """
+
+    def setUp(self):
+        self.user = create_user()
+        self.account = Account.objects.create(user=self.user, name="Main", type="current", balance=Decimal("0.00"))
+
+    def create_rows(self, month, count=3):
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, account=self.account, type=Transaction.Type.EXPENSE, amount=Decimal("1.00"),
+                description=f"Expense {index}", date=timezone.make_aware(datetime.combine(month, time(12))),
+                category="food",
+            )
+            for index in range(count)
+        ])
+
+    def count_rows(self, table, month):
+        start, end = partitions.partition_bounds(month)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {table} WHERE date >= %s AND date < %s", [start, end])
+            return cursor.fetchone()[0]
+
+    def test_rows_of_the_month_are_moved_out_of_the_default_partition(self):
+        month = date(2099, 1, 1)
+        self.create_rows(month)
+        self.assertEqual(self.count_rows(partitions.DEFAULT_PARTITION, month), 3)
+
+        with connection.cursor() as cursor:
+            name = partitions.create_month_partition(cursor, month)
+            self.assertIn(name, partitions.existing_partitions(cursor))
+        self.assertEqual(self.count_rows(name, month), 3)
+        self.assertEqual(self.count_rows(partitions.DEFAULT_PARTITION, month), 0)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 3)
+
+    @mock.patch.object(partitions, "PARTITION_RETRY_DELAY", 0.2)
+    @mock.patch.object(partitions, "PARTITION_LOCK_TIMEOUT", "100ms")
+    def test_busy_default_partition_is_retried(self):
+        month = date(2099, 2, 1)
+        self.create_rows(month)
+        # Une lecture en cours sur la partition par défaut, terminée un peu plus tard
+        reader = connection.copy()
+        reader.connect()
+        reader.connection.autocommit = False
+        reader.connection.cursor().execute(f"SELECT count(*) FROM {partitions.DEFAULT_PARTITION}")
+        release = threading.Timer(0.5, reader.connection.rollback)
+        release.start()
+        try:
+            with self.assertLogs(partitions.logger, "WARNING") as logs, connection.cursor() as cursor:
+                name = partitions.create_month_partition(cursor, month)
+        finally:
+            release.join()
+            reader.close()
+        self.assertIn("retrying", logs.output[0])
+        self.assertEqual(self.count_rows(name, month), 3)
+
+
+class BatchInvalidationTests(APITestMixin, TestCase):
+
+    def test_zero_net_batch_bumps_user_data_version(self):
+        version = get_user_data_version(self.user.pkid)
+        payload = [
+            {"account_id": str(self.account.id), "type": Transaction.Type.INCOME, "amount": "50.00",
+             "description": "Refund", "date": timezone.now().isoformat(), "category": "other-income"},
+            {"account_id": str(self.account.id), "type": Transaction.Type.EXPENSE, "amount": "50.00",
+             "description": "Dinner", "date": timezone.now().isoformat(), "category": "food"},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("create-transactions"), payload, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("100.00"))
+        self.assertNotEqual(get_user_data_version(self.user.pkid), version)
+
+
+class ResponseCacheTests(TestCase):
+    """
+    Cache versionné par utilisateur de config/utils/cache.py : compteurs,
+    single-flight et invalidation au commit seulement.
+    """
+
+    threads = 8
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.account = Account.objects.create(user=self.user, name="Main", type="current", balance=Decimal("0.00"))
+
+    def compute_concurrently(self, compute):
+        barrier = threading.Barrier(self.threads)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(get_or_compute("test:key", compute, scope="test"))
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return results
+
+    def test_hits_and_misses_are_counted(self):
+        self.assertEqual(get_or_compute("test:key", lambda: {"value": 1}, scope="test"), {"value": 1})
+        self.assertEqual(get_or_compute("test:key", lambda: {"value": 2}, scope="test"), {"value": 1})
+        self.assertEqual(get_cache_metrics("test"), {"hits": 1, "misses": 1, "not_modified": 0})
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            sleep(0.2)
+            return {"value": len(calls)}
+
+        self.assertEqual(self.compute_concurrently(compute), [{"value": 1}] * self.threads)
+        self.assertEqual(len(calls), 1)
+
+    def test_uncacheable_result_releases_waiters(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            sleep(0.2)
+
+        started = monotonic()
+        self.assertEqual(self.compute_concurrently(compute), [None] * self.threads)
+        # Chacun calcule lui-même dès la fin du premier calcul, sans attendre
+        # la fin de RECOMPUTE_WAIT_ATTEMPTS
+        self.assertLess(monotonic() - started, 1)
+        self.assertEqual(len(calls), self.threads)
+
+    def test_version_is_bumped_on_commit_only(self):
+        version = get_user_data_version(self.user.pkid)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            bump_user_data_version(self.user.pkid, self.user.pkid)
+            self.assertEqual(get_user_data_version(self.user.pkid), version)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(get_user_data_version(self.user.pkid), version + 1)
+
+    def test_rolled_back_write_does_not_invalidate(self):
+        version = get_user_data_version(self.user.pkid)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), db_transaction.atomic():
+                Transaction.objects.create(
+                    user=self.user, account=self.account, type=Transaction.Type.EXPENSE, amount=Decimal("5.00"),
+                    description="Coffee", date=timezone.now(), category="food",
+                )
+                raise RuntimeError("rollback")
+        self.assertEqual(callbacks, [])
+        self.assertEqual(get_user_data_version(self.user.pkid), version)
+
+
+class ConditionalGetTestMixin(APITestMixin):
+    """
+    ETag et If-None-Match d'une vue servie par UserCachedResponseMixin. Les
+    sous-classes donnent l'URL de la vue et une écriture qui change sa réponse.
+    """
+
+    def get_url(self):
+        raise NotImplementedError
+
+    def write(self):
+        raise NotImplementedError
+
+    def get(self, **headers):
+        response = self.client.get(self.get_url(), **headers)
+        self.assertIn(response.status_code, (200, 304))
+        return response
+
+    def create_transaction(self):
+        Transaction.objects.create(
+            user=self.user, account=self.account, type=Transaction.Type.EXPENSE, amount=Decimal("5.00"),
+            description="Coffee", date=timezone.now(), category="food",
+        )
+
+    def test_etag_is_emitted(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["ETag"])
+
+    def test_matching_if_none_match_returns_304(self):
+        etag = self.get()["ETag"]
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_write_changes_etag(self):
+        etag = self.get()["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.write()
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_varies_by_accept(self):
+        etag = self.get(HTTP_ACCEPT="application/json")["ETag"]
+        response = self.get(HTTP_ACCEPT="application/json; indent=4", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class TransactionListConditionalGetTests(ConditionalGetTestMixin, TestCase):
+
+    def get_url(self):
+        return reverse("get-all-transactions")
+
+    def write(self):
+        self.create_transaction()
+
+
+class AccountListConditionalGetTests(ConditionalGetTestMixin, TestCase):
+
+    def get_url(self):
+        return "/api/v1/account/my-accounts/"
+
+    def write(self):
+        self.account.name = "Renamed"
+        self.account.save()
+
+
+class AccountDetailConditionalGetTests(ConditionalGetTestMixin, TestCase):
+
+    def get_url(self):
+        return f"/api/v1/account/{self.account.id}/"
+
+    def write(self):
+        self.create_transaction()
+
+
+class CurrentBudgetConditionalGetTests(ConditionalGetTestMixin, TestCase):
+
+    def get_url(self):
+        return reverse("get_current_budget")
+
+    def write(self):
+        Budget.objects.create(user=self.user, amount=Decimal("500.00"))
+
+
+class DailyRollupTests(APITestMixin, TestCase):
+    """
+    Les rollups journaliers tenus par chaque écriture sont identiques à un
+    recalcul complet, jour local compris.
+    """
+
+    def rollup_rows(self):
+        return {
+            "monthly": sorted(TransactionMonthlyRollup.objects.filter(user=self.user, count__gt=0).values_list(
+                "account_id", "month", "type", "category", "total", "count"
+            )),
+            "daily": sorted(TransactionDailyRollup.objects.filter(user=self.user, count__gt=0).values_list(
+                "account_id", "day", "type", "category", "total", "count"
+            )),
+        }
+
+    def test_writes_match_rebuild(self):
+        # 00:30 le 1er avril à Berlin : encore le 31 mars en UTC
+        dates = [
+            timezone.make_aware(datetime(2024, 3, 31, 12, 0)),
+            timezone.make_aware(datetime(2024, 4, 1, 0, 30)),
+            timezone.make_aware(datetime(2024, 4, 2, 23, 45)),
+            timezone.make_aware(datetime(2024, 4, 2, 9, 0)),
+        ]
+        payload = [
+            {"account_id": str(self.account.id), "type": Transaction.Type.EXPENSE, "amount": f"{index + 10}.50",
+             "description": f"Expense {index}", "date": value.isoformat(), "category": "food"}
+            for index, value in enumerate(dates)
+        ]
+        response = self.client.post(reverse("create-transactions"), payload, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        first, second, third, _ = Transaction.objects.filter(user=self.user).order_by("date")
+        moved = timezone.make_aware(datetime(2024, 5, 1, 0, 15))
+        response = self.client.patch(
+            reverse("update-transaction", args=[second.id]),
+            {"amount": "99.00", "date": moved.isoformat(), "category": "travel"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.delete(
+            reverse("delete-transactions"), {"transaction_ids": [str(first.id)]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        maintained = self.rollup_rows()
+        self.assertIn((self.account.pkid, date(2024, 5, 1), Transaction.Type.EXPENSE, "travel", Decimal("99.00"), 1),
+                      maintained["daily"])
+        rebuild_rollups(user_id=self.user.pkid)
+        self.assertEqual(self.rollup_rows(), maintained)
+
+    def test_buckets_are_read_from_daily_rollups(self):
+        now = timezone.make_aware(datetime(2024, 6, 10, 12, 0))
+        transactions = Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, account=self.account, type=Transaction.Type.EXPENSE, amount=Decimal("5.00"),
+                description=f"Expense {index}", date=now - timedelta(days=index), category="food",
+            )
+            for index in range(20)
+        ])
+        rebuild_rollups(user_id=self.user.pkid)
+        # Tout est lu dans les rollups : les supprimer de Transaction ne change rien
+        Transaction.objects.filter(pkid__in=[transaction.pkid for transaction in transactions]).delete()
+
+        with self.assertNumQueries(1):
+            weeks = spending_buckets(self.user, "week", date(2024, 5, 22), date(2024, 6, 10))
+        self.assertEqual([bucket["period"] for bucket in weeks], ["2024-05-20", "2024-05-27", "2024-06-03", "2024-06-10"])
+        self.assertEqual(sum(Decimal(bucket["expense"]) for bucket in weeks), Decimal("100.00"))
+
+        # Mois entiers dans les rollups mensuels, mois partiel dans les journaliers
+        with self.assertNumQueries(2):
+            months = spending_buckets(self.user, "month", date(2024, 5, 22), date(2024, 7, 31))
+        self.assertEqual([(bucket["period"], bucket["expense"]) for bucket in months],
+                         [("2024-05-01", "50.00"), ("2024-06-01", "50.00")])
+
+
+class BulkDeleteResumeTests(APITestMixin, TestCase):
+    """
+    Un job de suppression interrompu reprend après le dernier bloc
+    enregistré, sans compter deux fois les lignes déjà traitées.
+    """
+
+    def test_rerun_resumes_from_processed_rows(self):
+        transactions = Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, account=self.account, type=Transaction.Type.EXPENSE, amount=Decimal("2.00"),
+                description=f"Expense {index}", date=timezone.now(), category="food",
+            )
+            for index in range(5)
+        ])
+        Account.objects.filter(pkid=self.account.pkid).update(balance=Decimal("90.00"))
+        job = deletions.create_bulk_delete_job(self.user, [transaction.id for transaction in transactions])
+
+        delete_transactions = deletions.delete_transactions
+        calls = []
+
+        def interrupted(user_id, transaction_ids):
+            calls.append(transaction_ids)
+            if len(calls) == 2:
+                raise RuntimeError("worker lost")
+            return delete_transactions(user_id, transaction_ids)
+
+        with mock.patch.object(deletions, "DELETE_CHUNK_SIZE", 2), \
+                mock.patch.object(deletions, "delete_transactions", interrupted):
+            with self.assertRaises(RuntimeError):
+                deletions.run_bulk_delete(job)
+        job.refresh_from_db()
+        self.assertEqual((job.processed_rows, job.failed_rows), (2, 0))
+
+        with mock.patch.object(deletions, "DELETE_CHUNK_SIZE", 2):
+            self.assertEqual(deletions.run_bulk_delete(job), 5)
+        job.refresh_from_db()
+        self.assertEqual(job.status, TransactionJob.Status.COMPLETED)
+        self.assertEqual((job.processed_rows, job.failed_rows), (5, 0))
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("100.00"))
+
+
+class ImportErrorTests(APITestMixin, TestCase):
+
+    def test_reported_errors_are_capped(self):
+        lines = ["date,amount,description,category"]
+        lines += [f"2024-01-{day:02d},-12.50,Lunch,food" for day in range(1, 4)]
+        lines += [f"not a date,-1.00,Broken {index},food" for index in range(2 * importers.MAX_REPORTED_ERRORS + 20)]
+        source = default_storage.save("imports/test.csv", ContentFile("\n".join(lines).encode("utf-8")))
+        job = TransactionJob.objects.create(
+            user=self.user, account=self.account, kind=TransactionJob.Kind.IMPORT, source=source
+        )
+
+        with mock.patch.object(importers, "IMPORT_CHUNK_SIZE", 40):
+            self.assertEqual(importers.run_import(job), 3)
+        job.refresh_from_db()
+        # Toutes les lignes rejetées sont comptées, seules les premières sont détaillées
+        self.assertEqual(job.failed_rows, 2 * importers.MAX_REPORTED_ERRORS + 20)
+        self.assertEqual(len(job.errors), importers.MAX_REPORTED_ERRORS)
+        self.assertEqual(job.errors[0], {"row": 4, "error": "Invalid date."})
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("62.50"))
+
+
+class ArchiveStatusTests(APITestMixin, TestCase):
+    """
+    Seules les transactions terminées partent dans les archives : une
+    transaction en attente ou échouée peut encore changer.
+    """
+
+    def test_only_completed_transactions_are_archived(self):
+        old = timezone.make_aware(datetime(2023, 1, 15, 12, 0))
+        for status in Transaction.Status.values:
+            Transaction.objects.create(
+                user=self.user, account=self.account, type=Transaction.Type.EXPENSE, amount=Decimal("10.00"),
+                description=f"Old {status}", date=old, category="food", status=status,
+            )
+
+        self.assertEqual(archives.archive_old_transactions(user_id=self.user.pkid), 1)
+        archive = TransactionArchive.objects.get(user=self.user)
+        self.addCleanup(default_storage.delete, archive.path)
+        self.assertEqual(archive.row_count, 1)
+        self.assertEqual(
+            sorted(Transaction.objects.filter(user=self.user).values_list("status", flat=True)),
+            [Transaction.Status.Failed, Transaction.Status.PENDING],
+        )
+        # Les transactions restantes ne sont pas reprises au passage suivant
+        self.assertIsNone(archives.archive_month(self.user.pkid, date(2023, 1, 1)))
+
+
+class KeysetPaginationTests(APITestMixin, TestCase):
+    page_size = 10
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, account=self.account, type=Transaction.Type.EXPENSE, amount=Decimal(index + 1),
+                description=f"Expense {index}", date=now - timedelta(hours=index // 2), category="food",
+            )
+            for index in range(35)
+        ])
+        self.url = reverse("get-all-transactions")
+
+    def get_page(self, cursor=None):
+        params = {"limit": self.page_size}
+        if cursor:
+            params["cursor"] = cursor
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def cursor_of(self, page):
+        return parse_qs(urlsplit(page["next"]).query)["cursor"][0]
+
+    def test_every_page_costs_the_same_queries(self):
+        # Une requête pour la page, une pour les manifestes d'archive
+        with self.assertNumQueries(2):
+            page = self.get_page()
+        seen = [row["id"] for row in page["results"]]
+        while page["next"]:
+            with self.assertNumQueries(2):
+                page = self.get_page(self.cursor_of(page))
+            seen += [row["id"] for row in page["results"]]
+
+        expected = Transaction.objects.filter(user=self.user).order_by("-date", "-pkid").values_list("id", flat=True)
+        self.assertEqual(seen, [str(id) for id in expected])
+
+    def test_pages_use_the_keyset_index(self):
+        with connection.cursor() as cursor:
+            # Sur une table de test presque vide, le planificateur préférerait un parcours séquentiel
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(
+                "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = %s::regclass",
+                ["transaction_user_date_idx"],
+            )
+            indexes = {"transaction_user_date_idx", *(name for (name,) in cursor.fetchall())}
+
+        first_page = self.get_page()
+        last_row = Transaction.objects.get(id=first_page["results"][-1]["id"])
+        queryset = Transaction.objects.filter(user=self.user).order_by("-date", "-pkid")
+        paginated = queryset.filter(date__lte=last_row.date).exclude(date=last_row.date, pkid__gte=last_row.pkid)
+        for plan in (queryset[: self.page_size + 1].explain(), paginated[: self.page_size + 1].explain()):
+            used = set(re.findall(r"Index Scan using (\S+) on", plan))
+            self.assertTrue(used, plan)
+            self.assertTrue(used <= indexes, plan)
+            # L'ordre vient de l'index : pas de tri
+            self.assertNotRegex(plan, r"(?m)^\s*(->\s*)?Sort\s+\(")
+
+
+class UpdateTransactionQueryTests(APITestMixin, TestCase):
+    """
+    Une mise à jour coûte deux requêtes quelle que soit la charge utile.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.savings = Account.objects.create(
+            user=self.user, name="Savings", type="saving", balance=Decimal("0.00")
+        )
+        self.transaction = Transaction.objects.create(
+            user=self.user, account=self.account, type=Transaction.Type.EXPENSE, amount=Decimal("40.00"),
+            description="Groceries", date=timezone.now(), category="food",
+        )
+        # Solde cohérent avec la transaction existante
+        Account.objects.filter(pkid=self.account.pkid).update(balance=Decimal("60.00"))
+        self.url = reverse("update-transaction", args=[self.transaction.id])
+
+    def assert_balances(self, account, savings):
+        self.account.refresh_from_db()
+        self.savings.refresh_from_db()
+        self.assertEqual((self.account.balance, self.savings.balance), (account, savings))
+
+    def test_put_runs_two_queries(self):
+        payload = {
+            "type": Transaction.Type.INCOME, "amount": "25.00", "description": "Refund",
+            "date": timezone.now().isoformat(), "category": "other-income",
+            "isRecurring": False, "recurringInterval": "",
+        }
+        with self.assertNumStatements(2):
+            response = self.client.put(self.url, payload, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        self.transaction.refresh_from_db()
+        self.assertEqual((self.transaction.type, self.transaction.amount), (Transaction.Type.INCOME, Decimal("25.00")))
+        self.assert_balances(Decimal("125.00"), Decimal("0.00"))
+
+    def test_patch_runs_two_queries(self):
+        with self.assertNumStatements(2):
+            response = self.client.patch(self.url, {"amount": "50.00"}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        self.transaction.refresh_from_db()
+        self.assertEqual((self.transaction.description, self.transaction.amount), ("Groceries", Decimal("50.00")))
+        self.assert_balances(Decimal("50.00"), Decimal("0.00"))
+
+    def test_account_move_runs_two_queries(self):
+        payload = {"account_id": str(self.savings.id), "amount": "30.00"}
+        with self.assertNumStatements(2):
+            response = self.client.patch(self.url, payload, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.account_id, self.savings.pkid)
+        # L'ancien compte récupère la dépense, le nouveau la supporte
+        self.assert_balances(Decimal("100.00"), Decimal("-30.00"))
+
+    def test_move_to_another_users_account_is_not_found(self):
+        other = Account.objects.create(
+            user=create_user("other@example.com"), name="Other", type="current", balance=Decimal("0.00")
+        )
+        with self.assertNumStatements(1):
+            response = self.client.patch(self.url, {"account_id": str(other.id)}, format="json")
+        self.assertEqual(response.status_code, 404)
+        self.assert_balances(Decimal("60.00"), Decimal("0.00"))
+
+
+class RecurrencePropertyTests(SimpleTestCase):
+    """
+    Propriétés du calendrier de récurrence, vérifiées sur des séries tirées
+    au hasard (graine fixe) contre une implémentation de référence qui
+    avance d'une occurrence à la fois.
+    """
+
+    cases = 300
+    intervals = list(Transaction.RecurringIntervale.values)
+    step_days = {"daily": 1, "weekly": 7}
+    step_months = {"monthly": 1, "yearly": 12}
+
+    def setUp(self):
+        self.random = random.Random(20240229)
+
+    def random_date(self, start=date(2019, 1, 1), days=6 * 365):
+        value = start + timedelta(days=self.random.randrange(days))
+        # Fins de mois et 29 février surreprésentés
+        if self.random.random() < 0.5:
+            value = value.replace(day=monthrange(value.year, value.month)[1] - self.random.randrange(4))
+        if self.random.random() < 0.1:
+            value = date(self.random.choice([2020, 2024]), 2, 29)
+        return value
+
+    def random_moment(self, value):
+        # Heures hors du créneau 2h-3h, qui n'existe pas au passage à l'heure d'été
+        hour = self.random.choice([0, 1, 8, 12, 18, 23])
+        moment = datetime.combine(value, time(hour, self.random.randrange(60)))
+        return timezone.make_aware(moment)
+
+    def reference_occurrence(self, interval, first, rank):
+        if interval in self.step_days:
+            return first + timedelta(days=self.step_days[interval] * rank)
+        index = first.year * 12 + first.month - 1 + self.step_months[interval] * rank
+        year, month = divmod(index, 12)
+        return date(year, month + 1, min(first.day, monthrange(year, month + 1)[1]))
+
+    def reference_series(self, interval, first, start, end):
+        occurrences, rank = [], 0
+        while (occurrence := self.reference_occurrence(interval, first, rank)) <= end:
+            if occurrence >= start:
+                occurrences.append(occurrence)
+            rank += 1
+        return occurrences
+
+    def test_expansion_matches_reference(self):
+        intervals = [self.random.choice(self.intervals) for _ in range(self.cases)]
+        firsts = [self.random_date() for _ in range(self.cases)]
+        starts = [first + timedelta(days=self.random.randrange(-30, 400)) for first in firsts]
+        end = date(2026, 6, 30)
+
+        series, dates = expand_occurrences(intervals, firsts, end, start=starts)
+        expanded = [[] for _ in intervals]
+        for index, value in zip(series, dates.astype(object)):
+            expanded[index].append(value)
+        for index, interval in enumerate(intervals):
+            with self.subTest(interval=interval, first=firsts[index], start=starts[index]):
+                self.assertEqual(
+                    sorted(expanded[index]), self.reference_series(interval, firsts[index], starts[index], end)
+                )
+
+    def test_month_end_and_leap_day_clamping(self):
+        for _ in range(self.cases):
+            interval = self.random.choice(list(self.step_months))
+            first = self.random_date()
+            _, dates = expand_occurrences([interval], [first], date(2032, 12, 31))
+            with self.subTest(interval=interval, first=first):
+                for value in dates.astype(object):
+                    last_day = monthrange(value.year, value.month)[1]
+                    # Jour d'ancrage, ramené au dernier jour des mois plus courts
+                    self.assertEqual(value.day, min(first.day, last_day))
+                    if first.month == 2 and first.day == 29 and interval == "yearly":
+                        self.assertEqual(value.day, 29 if isleap(value.year) else 28)
+                months = [value.year * 12 + value.month for value in dates.astype(object)]
+                # Aucune période sautée ni répétée
+                self.assertTrue(all(step == self.step_months[interval] for step in np.diff(months)))
+
+    def test_next_occurrence_is_monotonic_and_on_the_calendar(self):
+        for _ in range(self.cases):
+            interval = self.random.choice(self.intervals)
+            anchor = self.random_moment(self.random_date())
+            after = anchor + timedelta(days=self.random.randrange(-10, 1500), minutes=self.random.randrange(1440))
+            later = after + timedelta(days=self.random.randrange(0, 90), minutes=self.random.randrange(1440))
+            first, second = next_occurrence(interval, anchor, after), next_occurrence(interval, anchor, later)
+            with self.subTest(interval=interval, anchor=anchor, after=after, later=later):
+                self.assertGreater(first, after)
+                self.assertLessEqual(first, second)
+                # Sur le calendrier de la série, à l'heure locale de l'ancre
+                local_anchor, local_first = timezone.localtime(anchor), timezone.localtime(first)
+                self.assertEqual(local_first.time(), local_anchor.time())
+                self.assertIn(local_first.date(), self.reference_series(
+                    interval, local_anchor.date(), local_first.date(), local_first.date()
+                ))
+                # Aucune occurrence du calendrier entre ``after`` et la suivante
+                self.assertEqual(next_occurrence(interval, anchor, first - timedelta(microseconds=1)), first)
+
+    def test_catch_up_creates_every_missed_occurrence(self):
+        now = timezone.make_aware(datetime(2026, 3, 29, 12, 0))
+        intervals, anchors, pending = [], [], []
+        for _ in range(self.cases):
+            interval = self.random.choice(self.intervals)
+            anchor = self.random_moment(self.random_date(start=date(2023, 1, 1), days=3 * 365))
+            intervals.append(interval)
+            anchors.append(anchor)
+            pending.append(next_occurrence(interval, anchor, now - timedelta(days=self.random.randrange(1, 200))))
+
+        series, occurrences = due_occurrences(intervals, anchors, pending, now)
+        created = [[] for _ in intervals]
+        for index, occurrence in zip(series, occurrences):
+            created[index].append(occurrence)
+        for index, interval in enumerate(intervals):
+            expected, occurrence = [pending[index]], pending[index]
+            while (occurrence := next_occurrence(interval, anchors[index], occurrence)) <= now:
+                expected.append(occurrence)
+            with self.subTest(interval=interval, anchor=anchors[index], pending=pending[index]):
+                self.assertEqual(created[index], expected)
+
+
+class FakeClock:
+    """
+    Horloge monotone factice pour LocalBackend : le temps n'avance qu'avec
+    ``advance``.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class RateLimiterTests(SimpleTestCase):
+    """
+    Limiteurs de config/utils/ratelimit.py sur un LocalBackend à horloge
+    factice : pas de Redis, pas d'attente réelle.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        set_backend(LocalBackend(clock=self.clock))
+
+    def hit_concurrently(self, limiter, threads=16, hits=20):
+        barrier = threading.Barrier(threads)
+        allowed = []
+
+        def worker():
+            barrier.wait()
+            for _ in range(hits):
+                allowed.append(limiter.hit("shared").allowed)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(len(allowed), threads * hits)
+        return sum(allowed)
+
+    def test_no_over_admission_under_concurrency(self):
+        # L'horloge est figée : aucun jeton ne revient pendant la course
+        self.assertEqual(self.hit_concurrently(TokenBucket("test-bucket", "50/min")), 50)
+        self.assertEqual(self.hit_concurrently(SlidingWindow("test-window", "30/min")), 30)
+
+    def test_token_bucket_refills_up_to_capacity(self):
+        limiter = TokenBucket("test-bucket", "60/min", capacity=10)
+        self.assertTrue(all(limiter.hit().allowed for _ in range(10)))
+        denied = limiter.hit()
+        self.assertFalse(denied.allowed)
+        self.assertAlmostEqual(denied.retry_after, 1.0)
+
+        self.clock.advance(0.5)
+        self.assertAlmostEqual(limiter.hit().retry_after, 0.5)
+        self.clock.advance(0.5)
+        self.assertTrue(limiter.hit().allowed)
+        self.assertFalse(limiter.hit().allowed)
+
+        # Jamais plus de jetons que la capacité, même après une longue pause
+        self.clock.advance(3600)
+        self.assertEqual(sum(limiter.hit().allowed for _ in range(20)), 10)
+
+    def test_sliding_window_expires_old_hits(self):
+        limiter = SlidingWindow("test-window", "3/min")
+        for _ in range(3):
+            self.assertTrue(limiter.hit("user").allowed)
+            self.clock.advance(10)
+        denied = limiter.hit("user")
+        self.assertFalse(denied.allowed)
+        # Le premier appel sort de la fenêtre 60 s après avoir été compté
+        self.assertAlmostEqual(denied.retry_after, 30)
+        self.assertTrue(limiter.hit("other").allowed)
+
+        self.clock.advance(30)
+        self.assertTrue(limiter.hit("user").allowed)
+        self.assertAlmostEqual(limiter.hit("user").retry_after, 10)
+
+    def test_acquire_gives_up_without_sleeping_past_timeout(self):
+        limiter = TokenBucket("test-bucket", "1/min")
+        self.assertTrue(acquire(limiter, timeout=1))
+        with mock.patch("config.utils.ratelimit.time.sleep") as sleep_mock:
+            self.assertFalse(acquire(limiter, timeout=1))
+        sleep_mock.assert_not_called()
+
+    def test_retry_countdown_backs_off_and_respects_the_limiter(self):
+        for retries in range(10):
+            backoff = min(600, 5 * 2 ** retries)
+            with self.subTest(retries=retries):
+                self.assertTrue(backoff <= retry_countdown(retries) <= backoff * 1.25)
+        self.assertGreaterEqual(retry_countdown(0, retry_after=42), 42)
+
+    def test_redis_outage_fails_open(self):
+        backend = mock.Mock()
+        backend.token_bucket.side_effect = redis.ConnectionError("down")
+        set_backend(backend)
+        with self.assertLogs("config.utils.ratelimit", "WARNING"):
+            self.assertTrue(TokenBucket("test-bucket", "1/min").hit().allowed)
+
+
+class RecurringRateLimitTests(APITestMixin, TestCase):
+    """
+    Une occurrence récurrente limitée est replanifiée avec un délai
+    croissant, puis créée une fois la fenêtre passée : rien n'est perdu.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.clock = FakeClock()
+        set_backend(LocalBackend(clock=self.clock))
+        now = timezone.now()
+        self.template = Transaction.objects.create(
+            user=self.user, account=self.account, type=Transaction.Type.EXPENSE, amount=Decimal("9.99"),
+            description="Subscription", date=now - timedelta(days=40), category="bills", isRecurring=True,
+            recurringInterval=Transaction.RecurringIntervale.MONTHLY, nextRecurringDate=now - timedelta(days=10),
+            status=Transaction.Status.COMPLETED,
+        )
+
+    def run_task(self, retries):
+        process_recurring_transaction.push_request(retries=retries)
+        try:
+            return process_recurring_transaction.run(str(self.template.id))
+        finally:
+            process_recurring_transaction.pop_request()
+
+    def occurrences(self):
+        return Transaction.objects.filter(user=self.user, isRecurring=False).count()
+
+    def test_throttled_occurrence_is_retried_with_growing_countdown(self):
+        for _ in range(RECURRING_LIMITER.limit):
+            self.assertTrue(RECURRING_LIMITER.hit(self.user.pkid).allowed)
+
+        countdowns = []
+        with mock.patch.object(
+            process_recurring_transaction, "retry", side_effect=lambda countdown: Retry(when=countdown)
+        ):
+            for retries in range(3, 8):
+                with self.assertRaises(Retry) as caught:
+                    self.run_task(retries)
+                countdowns.append(caught.exception.when)
+        # Jamais avant la libération de la fenêtre, puis backoff exponentiel
+        self.assertGreaterEqual(countdowns[0], RECURRING_LIMITER.window)
+        self.assertTrue(all(earlier < later for earlier, later in zip(countdowns, countdowns[1:])), countdowns)
+        self.assertEqual(self.occurrences(), 0)
+
+        self.clock.advance(RECURRING_LIMITER.window)
+        self.run_task(8)
+        self.assertEqual(self.occurrences(), 1)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("90.01"))
+
+
+class ReceiptScanRateLimitTests(APITestMixin, TestCase):
+    """
+    Quota Gemini épuisé : le scan de reçu répond 429 avec Retry-After, sans
+    appeler Gemini, puis passe dès qu'un jeton est revenu.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.clock = FakeClock()
+        set_backend(LocalBackend(clock=self.clock))
+        self.url = reverse("scan-receipt")
+
+    def upload(self):
+        image = io.BytesIO()
+        Image.new("RGB", (4, 4), "white").save(image, format="PNG")
+        receipt = SimpleUploadedFile("receipt.png", image.getvalue(), content_type="image/png")
+        return self.client.post(self.url, {"file": receipt}, format="multipart")
+
+    @mock.patch("apps.transactions.views.GenerativeModel")
+    def test_exhausted_quota_answers_429_with_retry_after(self, model):
+        model.return_value.generate_content.return_value.text = json.dumps({
+            "amount": 12.5, "date": "2026-10-01T12:00:00Z", "description": "Lunch",
+            "merchantName": "Cafe", "category": "food",
+        })
+        for _ in range(GEMINI_LIMITER.capacity):
+            self.assertTrue(GEMINI_LIMITER.hit().allowed)
+
+        response = self.upload()
+        self.assertEqual(response.status_code, 429)
+        wait = math.ceil(1 / GEMINI_LIMITER.refill)
+        self.assertEqual(response["Retry-After"], str(wait))
+        model.assert_not_called()
+
+        self.clock.advance(wait)
+        response = self.upload()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["amount"], 12.5)
+        model.return_value.generate_content.assert_called_once()
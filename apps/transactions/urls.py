@@ -2,18 +2,32 @@ from django.urls import path
 
 from .views import (
     CreateTransactionAPIView,
+    CreateTransactionsBatchAPIView,
     DeleteTransactionAPIView,
+    ExportTransactionsAPIView,
+    GetTransactionJobAPIView,
+    ImportTransactionsAPIView,
     GetAllTransactionsAPIView,
     AIReceiptScanner,
     GetTransaction,
+    SearchTransactionsAPIView,
+    TransactionAnalyticsAPIView,
+    TransactionForecastAPIView,
     UpdateTransaction
 )
 
 urlpatterns = [
     path("", GetAllTransactionsAPIView.as_view(), name="get-all-transactions"),
     path("create-transaction/", CreateTransactionAPIView.as_view(), name="create-transaction"),
+    path("create-transactions/", CreateTransactionsBatchAPIView.as_view(), name="create-transactions"),
     path("delete-transactions/", DeleteTransactionAPIView.as_view(), name="delete-transactions"),
     path('scan-receipt/', AIReceiptScanner.as_view(), name='scan-receipt'),
+    path("search/", SearchTransactionsAPIView.as_view(), name="search-transactions"),
+    path("analytics/", TransactionAnalyticsAPIView.as_view(), name="transaction-analytics"),
+    path("forecast/", TransactionForecastAPIView.as_view(), name="transaction-forecast"),
+    path("export/", ExportTransactionsAPIView.as_view(), name="export-transactions"),
+    path("import/", ImportTransactionsAPIView.as_view(), name="import-transactions"),
+    path("jobs/<str:job_id>/", GetTransactionJobAPIView.as_view(), name="get-transaction-job"),
     path("<str:transaction_id>/", GetTransaction.as_view(), name="get-transaction" ),
     path("update/<str:transaction_id>/", UpdateTransaction.as_view(), name="update-transaction" ),
 ]
@@ -0,0 +1,114 @@
+from calendar import monthrange
+from collections import OrderedDict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import DateField, Sum
+from django.db.models.functions import Trunc
+
+from apps.transactions.models import TransactionDailyRollup, TransactionMonthlyRollup
+
+
+INTERVALS = ["day", "week", "month", "year"]
+
+
+def bucket_count(interval, start, end):
+    """
+    Nombre approximatif de périodes entre deux dates (borne les réponses).
+    """
+    days = (end - start).days + 1
+    return {
+        "day": days,
+        "week": days // 7 + 1,
+        "month": (end.year - start.year) * 12 + end.month - start.month + 1,
+        "year": end.year - start.year + 1,
+    }[interval]
+
+
+def whole_months(start, end):
+    """
+    Premier et dernier mois entièrement compris dans [start, end], ou None.
+    """
+    first = start if start.day == 1 else (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+    last = end.replace(day=1)
+    if end.day != monthrange(end.year, end.month)[1]:
+        last = (last - timedelta(days=1)).replace(day=1)
+    if first > last:
+        return None
+    return first, last
+
+
+def rollup_rows(user, interval, start, end, account=None):
+    queryset = TransactionMonthlyRollup.objects.filter(user=user, month__gte=start, month__lte=end)
+    if account is not None:
+        queryset = queryset.filter(account__id=account)
+    return (
+        queryset.annotate(period=Trunc("month", interval, output_field=DateField()))
+        .values("period", "type", "category")
+        .annotate(total=Sum("total"), count=Sum("count"))
+        .order_by()
+    )
+
+
+def daily_rows(user, interval, start, end, account=None):
+    queryset = TransactionDailyRollup.objects.filter(user=user, day__gte=start, day__lte=end)
+    if account is not None:
+        queryset = queryset.filter(account__id=account)
+    # Sans ORDER BY, Postgres agrège par hachage ; les périodes sont triées
+    # ensuite en Python
+    return (
+        queryset.annotate(period=Trunc("day", interval, output_field=DateField()))
+        .values("period", "type", "category")
+        .annotate(total=Sum("total"), count=Sum("count"))
+        .order_by()
+    )
+
+
+def spending_buckets(user, interval, start, end, account=None):
+    """
+    Totaux des revenus et dépenses par catégorie et par période.
+    Pour les intervalles mois / année, les mois entiers sont lus dans les
+    rollups mensuels et seuls les mois partiels aux bornes dans les rollups
+    journaliers ; les intervalles jour / semaine sont lus dans les rollups
+    journaliers. Les transactions archivées y sont comptées.
+    """
+    months = whole_months(start, end) if interval in ("month", "year") else None
+    if months is None:
+        rows = list(daily_rows(user, interval, start, end, account))
+    else:
+        first, last = months
+        rows = list(rollup_rows(user, interval, first, last, account))
+        if start < first:
+            rows += daily_rows(user, interval, start, first - timedelta(days=1), account)
+        after_last = (last + timedelta(days=32)).replace(day=1)
+        if after_last <= end:
+            rows += daily_rows(user, interval, after_last, end, account)
+
+    totals = {}
+    for row in rows:
+        key = (row["period"], row["type"], row["category"])
+        total, count = totals.get(key, (Decimal("0"), 0))
+        totals[key] = (total + row["total"], count + row["count"])
+
+    buckets = OrderedDict()
+    for (period, type, category), (total, count) in sorted(totals.items()):
+        if not count:
+            continue
+        bucket = buckets.setdefault(period, {
+            "period": period.isoformat(),
+            "income": Decimal("0"),
+            "expense": Decimal("0"),
+            "categories": [],
+        })
+        bucket[type] += total
+        bucket["categories"].append({
+            "category": category,
+            "type": type,
+            "total": f"{total:.2f}",
+            "count": count,
+        })
+
+    for bucket in buckets.values():
+        bucket["income"] = f"{bucket['income']:.2f}"
+        bucket["expense"] = f"{bucket['expense']:.2f}"
+    return list(buckets.values())
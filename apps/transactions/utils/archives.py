@@ -0,0 +1,347 @@
+import functools
+import gzip
+import heapq
+import json
+import logging
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction as db_transaction
+from django.db.models import DateField
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.accounts.models import Account
+from apps.transactions.models import Transaction, TransactionArchive
+from apps.transactions.utils.partitions import add_months, partition_bounds
+from config.utils.cache import bump_user_data_version
+
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = "archives/transactions"
+ARCHIVE_FORMAT = 1
+# Les mois plus anciens que cet horizon sortent de Postgres
+ARCHIVE_AFTER_MONTHS = getattr(settings, "TRANSACTION_ARCHIVE_AFTER_MONTHS", 24)
+
+# Colonnes du fichier, une liste de valeurs par colonne
+ARCHIVE_COLUMNS = [
+    "pkid",
+    "id",
+    "account_id",
+    "type",
+    "amount",
+    "description",
+    "date",
+    "category",
+    "receiptUrl",
+    "isRecurring",
+    "recurringInterval",
+    "nextRecurringDate",
+    "lastProcessed",
+    "status",
+    "created_at",
+    "updated_at",
+]
+DATETIME_COLUMNS = {"date", "nextRecurringDate", "lastProcessed", "created_at", "updated_at"}
+
+# Mêmes filtres que TransactionFilter, appliqués aux lignes archivées
+ROW_FILTERS = {
+    "start_date": lambda row, value: row["date"] >= value,
+    "end_date": lambda row, value: row["date"] <= value,
+    "type": lambda row, value: row["type"] == value,
+    "category": lambda row, value: row["category"] == value,
+    "account": lambda row, value: row["account__id"] == value,
+    "min_amount": lambda row, value: row["amount"] >= value,
+    "max_amount": lambda row, value: row["amount"] <= value,
+    "is_recurring": lambda row, value: row["isRecurring"] == value,
+}
+
+# Bornes du manifeste de chaque champ de tri des lignes
+MANIFEST_BOUNDS = {"date": ("min_date", "max_date"), "amount": ("min_amount", "max_amount")}
+
+
+# --- Format ------------------------------------------------------------------
+
+def encode_value(column, value):
+    if value is None:
+        return None
+    if column in DATETIME_COLUMNS:
+        return value.isoformat()
+    if column in ("id", "amount"):
+        return str(value)
+    return value
+
+
+def decode_column(column, values):
+    if column in DATETIME_COLUMNS:
+        return [parse_datetime(value) if value else None for value in values]
+    if column == "amount":
+        return [Decimal(value) for value in values]
+    if column == "id":
+        return [uuid.UUID(value) for value in values]
+    return values
+
+
+def encode_archive(rows):
+    """
+    JSON compressé en gzip, par colonnes : les valeurs d'une même colonne
+    se suivent et se compressent bien mieux que des lignes.
+    """
+    payload = {
+        "format": ARCHIVE_FORMAT,
+        "rows": len(rows),
+        "columns": {
+            column: [encode_value(column, row[column]) for row in rows]
+            for column in ARCHIVE_COLUMNS
+        },
+    }
+    return gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+
+def load_archive_columns(path):
+    with default_storage.open(path, "rb") as fileobj:
+        payload = json.loads(gzip.decompress(fileobj.read()))
+    return {column: decode_column(column, payload["columns"][column]) for column in ARCHIVE_COLUMNS}
+
+
+# Un fichier d'archive n'est jamais réécrit : son contenu peut rester en mémoire
+read_archive_columns = functools.lru_cache(maxsize=32)(load_archive_columns)
+
+
+def iter_archive_rows(archive, start=None, end=None, cached=True):
+    """
+    Lignes d'un fichier entre start et end (bornes incluses). Seule la
+    colonne date est parcourue pour les lignes hors période. Sans
+    ``cached``, le fichier est décodé sans passer par le cache de processus.
+    """
+    columns = (read_archive_columns if cached else load_archive_columns)(archive.path)
+    for index, date in enumerate(columns["date"]):
+        if (start is None or date >= start) and (end is None or date <= end):
+            yield {column: columns[column][index] for column in ARCHIVE_COLUMNS}
+
+
+# --- Archivage ---------------------------------------------------------------
+
+def summarize(rows):
+    totals = defaultdict(lambda: [Decimal("0"), 0])
+    for row in rows:
+        key = (row["account_id"], row["type"], row["category"])
+        totals[key][0] += row["amount"]
+        totals[key][1] += 1
+    return [
+        [account_id, type, category, str(total), count]
+        for (account_id, type, category), (total, count) in sorted(totals.items())
+    ]
+
+
+def archive_month(user_id, month):
+    """
+    Déplace les transactions terminées d'un utilisateur pour un mois dans un
+    fichier d'archive. Les transactions en attente ou échouées, qui peuvent
+    encore changer, et les modèles de transactions récurrentes restent en
+    base. Les rollups et les soldes ne changent pas : les transactions archivées
+    font toujours partie de l'historique.
+    """
+    start, end = partition_bounds(month)
+    queryset = Transaction.objects.filter(
+        user_id=user_id, date__gte=start, date__lt=end, isRecurring=False, status=Transaction.Status.COMPLETED
+    )
+    path = None
+    try:
+        with db_transaction.atomic():
+            rows = list(queryset.select_for_update().order_by("date", "pkid").values(*ARCHIVE_COLUMNS))
+            if not rows:
+                return None
+
+            content = encode_archive(rows)
+            path = default_storage.save(
+                f"{ARCHIVE_DIR}/{user_id}/{month:%Y-%m}-{uuid.uuid4().hex}.json.gz",
+                ContentFile(content),
+            )
+            archive = TransactionArchive.objects.create(
+                user_id=user_id,
+                month=month,
+                path=path,
+                size=len(content),
+                row_count=len(rows),
+                min_date=rows[0]["date"],
+                max_date=rows[-1]["date"],
+                min_amount=min(row["amount"] for row in rows),
+                max_amount=max(row["amount"] for row in rows),
+                min_pkid=min(row["pkid"] for row in rows),
+                max_pkid=max(row["pkid"] for row in rows),
+                account_ids=sorted({row["account_id"] for row in rows}),
+                summary=summarize(rows),
+            )
+            queryset.filter(pkid__in=[row["pkid"] for row in rows]).delete()
+            bump_user_data_version(user_id)
+    except Exception:
+        if path:
+            default_storage.delete(path)
+        raise
+    return archive
+
+
+def archive_old_transactions(user_id=None, months=ARCHIVE_AFTER_MONTHS):
+    """
+    Archive, mois par mois, les transactions terminées antérieures à
+    l'horizon (``months`` mois avant le mois courant). Retourne le nombre de
+    transactions archivées.
+    """
+    horizon, _ = partition_bounds(add_months(timezone.localdate().replace(day=1), -months))
+    candidates = Transaction.objects.filter(
+        date__lt=horizon, isRecurring=False, status=Transaction.Status.COMPLETED
+    )
+    if user_id is not None:
+        candidates = candidates.filter(user_id=user_id)
+    candidates = (
+        candidates.annotate(month=Trunc("date", "month", output_field=DateField()))
+        .order_by()
+        .values_list("user_id", "month")
+        .distinct()
+    )
+
+    archived = 0
+    for candidate_user_id, month in list(candidates):
+        archive = archive_month(candidate_user_id, month)
+        if archive is not None:
+            archived += archive.row_count
+    logger.info(f"{archived} transactions archived before {horizon:%Y-%m-%d}.")
+    return archived
+
+
+# --- Lecture -----------------------------------------------------------------
+
+class ArchiveReader:
+    """
+    Transactions archivées de ``user`` qui passent ``filters`` (``cleaned_data``
+    d'un TransactionFilter), au format de TransactionValuesSerializer. Les
+    fichiers sont choisis d'après les bornes du manifeste et décodés un par
+    un, au fur et à mesure que le consommateur lit les lignes. Les lignes
+    d'un compte supprimé depuis l'archivage sont ignorées.
+    """
+
+    def __init__(self, user, filters=None, cached=True):
+        filters = filters or {}
+        self.user = user
+        self.start = filters.get("start_date")
+        self.end = filters.get("end_date")
+        self.account = filters.get("account")
+        self.checks = [
+            (ROW_FILTERS[name], value)
+            for name, value in filters.items()
+            if name in ROW_FILTERS and value not in (None, "")
+        ]
+        self.cached = cached
+
+    def get_archives(self, leading=None, after=None, before=None):
+        """
+        Manifestes des fichiers qui recoupent la période et, pour un tri sur
+        un champ borné par le manifeste (``leading``), la plage entre les
+        lignes ``after`` et ``before``.
+        """
+        archives = TransactionArchive.objects.filter(user=self.user)
+        if self.start is not None:
+            archives = archives.filter(max_date__gte=self.start)
+        if self.end is not None:
+            archives = archives.filter(min_date__lte=self.end)
+        name = leading.lstrip("-") if leading else None
+        if name in MANIFEST_BOUNDS:
+            low, high = MANIFEST_BOUNDS[name]
+            descending = leading.startswith("-")
+            if after is not None:
+                archives = archives.filter(**{f"{low}__lte" if descending else f"{high}__gte": after[name]})
+            if before is not None:
+                archives = archives.filter(**{f"{high}__gte" if descending else f"{low}__lte": before[name]})
+        return list(archives)
+
+    def iter_rows(self, ordering=("date", "pkid"), key=None, after=None, before=None, limit=None):
+        """
+        Lignes triées selon ``ordering`` (``key`` : clé de tri des lignes),
+        strictement après la ligne ``after`` et jusqu'à la ligne ``before``
+        incluse. Les fichiers dont les plages ne se recoupent pas sont lus
+        l'un après l'autre : s'arrêter de lire évite de décoder les suivants.
+        Avec ``limit``, au plus ``limit`` lignes sont gardées par groupe.
+        """
+        key = key or (lambda row: (row["date"], row["pkid"]))
+        archives = self.get_archives(ordering[0], after, before)
+        if not archives:
+            return
+
+        accounts = dict(Account.objects.filter(user=self.user).values_list("pkid", "id"))
+        account_pkid = None
+        if self.account is not None:
+            account_pkid = next((pkid for pkid, id in accounts.items() if id == self.account), None)
+            if account_pkid is None:
+                return
+            archives = [archive for archive in archives if account_pkid in archive.account_ids]
+
+        after_key = key(after) if after is not None else None
+        before_key = key(before) if before is not None else None
+        for group in group_archives(archives, ordering[0]):
+            rows = (
+                row
+                for archive in group
+                for row in self.read_archive(archive, accounts, account_pkid)
+                if (after_key is None or key(row) > after_key) and (before_key is None or key(row) <= before_key)
+            )
+            yield from heapq.nsmallest(limit, rows, key=key) if limit else sorted(rows, key=key)
+
+    def read_archive(self, archive, accounts, account_pkid=None):
+        for row in iter_archive_rows(archive, self.start, self.end, cached=self.cached):
+            account_id = accounts.get(row["account_id"])
+            if account_id is None or (account_pkid is not None and row["account_id"] != account_pkid):
+                continue
+            row["account__id"] = account_id
+            row["user__email"] = self.user.email
+            if all(check(row, value) for check, value in self.checks):
+                yield row
+
+
+def group_archives(archives, leading):
+    """
+    Regroupe les fichiers dont les plages du champ ``leading`` se recoupent,
+    dans l'ordre de lecture : chaque groupe ne contient que des lignes
+    placées après celles du groupe précédent. Sans bornes pour ce champ,
+    tous les fichiers forment un seul groupe.
+    """
+    name = leading.lstrip("-")
+    if name not in MANIFEST_BOUNDS:
+        yield archives
+        return
+    low, high = MANIFEST_BOUNDS[name]
+    if leading.startswith("-"):
+        # Tri décroissant : lecture depuis la borne haute
+        low, high = high, low
+        archives = sorted(archives, key=lambda archive: getattr(archive, low), reverse=True)
+        starts_after = lambda archive, bound: getattr(archive, low) < bound
+        extend = min
+    else:
+        archives = sorted(archives, key=lambda archive: getattr(archive, low))
+        starts_after = lambda archive, bound: getattr(archive, low) > bound
+        extend = max
+
+    group, bound = [], None
+    for archive in archives:
+        if group and starts_after(archive, bound):
+            yield group
+            group = []
+        bound = getattr(archive, high) if not group else extend(bound, getattr(archive, high))
+        group.append(archive)
+    if group:
+        yield group
+
+
+def archived_rows(user, start=None, end=None, account=None, cached=True):
+    """
+    Transactions archivées de ``user`` entre start et end (bornes incluses),
+    triées par (date, pkid), lues fichier par fichier.
+    """
+    filters = {"start_date": start, "end_date": end, "account": account}
+    return ArchiveReader(user, filters, cached=cached).iter_rows()
@@ -0,0 +1,87 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection
+
+from apps.accounts.models import Account, BalanceEntry
+from apps.accounts.utils.ledger import get_current_balance
+from apps.transactions.models import Transaction
+from config.utils.cache import bump_user_data_version
+
+
+def signed_amount(type, amount):
+    """
+    Effet d'une transaction sur le solde du compte.
+    """
+    return -amount if type == Transaction.Type.EXPENSE else amount
+
+
+def sum_balance_deltas(items):
+    """
+    Regroupe des couples (account_pkid, variation) par compte.
+    """
+    deltas = defaultdict(Decimal)
+    for account_pkid, delta in items:
+        deltas[account_pkid] += delta
+    return deltas
+
+
+def apply_balance_deltas(deltas):
+    """
+    Applique une variation de solde par compte en une seule requête :
+    balance = balance + delta, calculé par la base. Aucune lecture préalable
+    du solde, donc pas de mise à jour perdue entre requêtes concurrentes.
+    Les comptes à journal (ledger_enabled) ne sont pas mis à jour : la
+    variation est ajoutée à BalanceEntry, sans contention sur la ligne du compte.
+    Retourne {account_pkid: nouveau solde}, None pour les comptes à journal.
+    """
+    deltas = {pkid: delta for pkid, delta in deltas.items() if delta}
+    if not deltas:
+        return {}
+
+    # Ordre stable des comptes pour limiter les interblocages entre lots
+    items = sorted(deltas.items())
+    values = ", ".join(["(%s::bigint, %s::numeric)"] * len(items))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH delta (pkid, amount) AS (VALUES {values}),
+            updated AS (
+                UPDATE {Account._meta.db_table} AS account
+                SET balance = account.balance + delta.amount, updated_at = now()
+                FROM delta
+                WHERE account.pkid = delta.pkid AND NOT account.ledger_enabled
+                RETURNING account.pkid, account.balance, account.user_id
+            ),
+            appended AS (
+                -- Tout compte existant non mis à jour ci-dessus est à journal,
+                -- y compris s'il vient de passer en mode journal.
+                INSERT INTO {BalanceEntry._meta.db_table} (account_id, amount, created_at)
+                SELECT delta.pkid, delta.amount, now()
+                FROM delta
+                JOIN {Account._meta.db_table} AS account ON account.pkid = delta.pkid
+                WHERE NOT EXISTS (SELECT 1 FROM updated WHERE updated.pkid = delta.pkid)
+                RETURNING account_id
+            )
+            SELECT pkid, balance, user_id FROM updated
+            UNION ALL
+            SELECT account.pkid, NULL, account.user_id
+            FROM appended
+            JOIN {Account._meta.db_table} AS account ON account.pkid = appended.account_id
+            """,
+            [value for item in items for value in item],
+        )
+        rows = cursor.fetchall()
+
+    bump_user_data_version(*(user_id for _, _, user_id in rows))
+    return {pkid: balance for pkid, balance, _ in rows}
+
+
+def apply_balance_delta(account_pkid, delta):
+    """
+    Variation du solde d'un seul compte ; retourne le nouveau solde.
+    """
+    balance = apply_balance_deltas({account_pkid: delta}).get(account_pkid) if delta else None
+    if balance is None:
+        return get_current_balance(account_pkid)
+    return balance
@@ -0,0 +1,253 @@
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from apps.accounts.models import Account
+from apps.transactions.models import Transaction
+from apps.transactions.utils.archives import archived_rows
+
+
+logger = logging.getLogger(__name__)
+
+CATEGORICAL_COLUMNS = ["category", "type", "account"]
+# Unités numpy des regroupements par période
+PERIOD_UNITS = {"day": "D", "month": "M", "year": "Y"}
+
+
+def encode_categorical(values):
+    """
+    Retourne (codes int32, libellés triés) : ``labels[codes]`` redonne
+    ``values``. Un dictionnaire évite de trier les n valeurs.
+    """
+    index = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int32, count=len(values))
+    labels = sorted(index)
+    remap = np.empty(len(labels), dtype=np.int32)
+    remap[[index[label] for label in labels]] = np.arange(len(labels), dtype=np.int32)
+    return remap[codes], labels
+
+
+def group_starts(sorted_keys):
+    """
+    Début de chaque groupe dans un tableau de clés triées (une colonne par clé).
+    """
+    sorted_keys = sorted_keys.reshape(len(sorted_keys), -1)
+    changes = np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)
+    return np.flatnonzero(np.r_[True, changes])
+
+
+class TransactionFrame:
+    """
+    Transactions d'un utilisateur en colonnes typées :
+
+    - ``cents`` : montant en centimes (int64, toujours positif) ;
+    - ``date`` : datetime64[us] en heure locale (TIME_ZONE), comme les mois
+      des rollups ;
+    - ``category``, ``type``, ``account`` : codes int32, libellés dans
+      ``labels[nom]``.
+
+    Les opérations sont vectorisées et exactes (sommes en int64).
+    """
+
+    def __init__(self, pkid, cents, date, codes, labels):
+        self.pkid = pkid
+        self.cents = cents
+        self.date = date
+        self.codes = codes
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.pkid)
+
+    @classmethod
+    def from_rows(cls, rows, accounts):
+        """
+        ``rows`` : tuples (pkid, centimes, date locale en microsecondes depuis
+        l'epoch, category, type, pkid du compte) ; ``accounts`` : pkid -> id.
+        """
+        pkid, cents, date, category, type, account = zip(*rows) if rows else ([],) * 6
+        codes, labels = {}, {}
+        for name, values in zip(CATEGORICAL_COLUMNS, (category, type, account)):
+            codes[name], labels[name] = encode_categorical(values)
+        labels["account"] = [accounts[account_pkid] for account_pkid in labels["account"]]
+        return cls(
+            pkid=np.asarray(pkid, dtype=np.int64),
+            cents=np.asarray(cents, dtype=np.int64),
+            date=np.asarray(date, dtype=np.int64).view("datetime64[us]"),
+            codes=codes,
+            labels=labels,
+        )
+
+    # --- Sélection -----------------------------------------------------------
+
+    def code_of(self, name, label):
+        try:
+            return self.labels[name].index(label)
+        except ValueError:
+            return -1
+
+    def mask(self, start=None, end=None, **labels):
+        """
+        Lignes entre start et end (dates locales, bornes incluses) dont les
+        colonnes catégorielles valent les libellés donnés.
+        """
+        selected = np.ones(len(self), dtype=bool)
+        if start is not None:
+            selected &= self.date >= np.datetime64(start, "us")
+        if end is not None:
+            selected &= self.date <= np.datetime64(end, "us")
+        for name, label in labels.items():
+            selected &= self.codes[name] == self.code_of(name, label)
+        return selected
+
+    def signed_cents(self):
+        expense = self.code_of("type", Transaction.Type.EXPENSE)
+        return np.where(self.codes["type"] == expense, -self.cents, self.cents)
+
+    def period_codes(self, period):
+        """
+        Début de période de chaque ligne, comme date_trunc côté SQL.
+        """
+        if period == "week":
+            # L'epoch numpy est un jeudi : on recule jusqu'au lundi
+            days = self.date.astype("datetime64[D]").astype(np.int64)
+            return (days - (days + 3) % 7).astype("datetime64[D]")
+        return self.date.astype(f"datetime64[{PERIOD_UNITS[period]}]")
+
+    def key_column(self, key):
+        if key in CATEGORICAL_COLUMNS:
+            return self.codes[key], lambda code: self.labels[key][code]
+        periods = self.period_codes(key)
+        unit = np.datetime_data(periods.dtype)[0]
+        return periods.astype(np.int64), lambda value: (
+            np.datetime64(int(value), unit).astype("datetime64[D]").astype(object)
+        )
+
+    # --- Opérations ----------------------------------------------------------
+
+    def group_by(self, *keys, mask=None, signed=False):
+        """
+        Somme et nombre de transactions par combinaison de ``keys``
+        (category, type, account, day, week, month, year).
+        """
+        if mask is None:
+            mask = np.ones(len(self), dtype=bool)
+        values = self.signed_cents() if signed else self.cents
+        values = values[mask]
+        columns = [self.key_column(key) for key in keys]
+        key_values = [column[mask] for column, _ in columns]
+        if not len(values):
+            return []
+
+        order = np.lexsort(key_values[::-1])
+        sorted_keys = np.stack([column[order].astype(np.int64) for column in key_values], axis=1)
+        starts = group_starts(sorted_keys)
+        totals = np.add.reduceat(values[order], starts)
+        counts = np.diff(np.r_[starts, len(order)])
+
+        results = []
+        for start, total, count in zip(starts, totals, counts):
+            row = {
+                key: decode(sorted_keys[start, index])
+                for index, (key, (_, decode)) in enumerate(zip(keys, columns))
+            }
+            row["total"] = Decimal(int(total)) / 100
+            row["count"] = int(count)
+            results.append(row)
+        return results
+
+    def daily_totals(self, start, end, mask=None, signed=True):
+        """
+        Total par jour de start à end (dates locales incluses), jours vides compris.
+        """
+        days = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1)
+        selected = self.mask(start=start, end=np.datetime64(end, "D") + 1 - np.timedelta64(1, "us"))
+        if mask is not None:
+            selected &= mask
+        values = (self.signed_cents() if signed else self.cents)[selected]
+        offsets = (self.date[selected].astype("datetime64[D]") - days[0]).astype(np.int64)
+        totals = np.zeros(len(days), dtype=np.int64)
+        np.add.at(totals, offsets, values)
+        return days, totals
+
+    def rolling(self, window, start, end, mask=None, signed=True):
+        """
+        Somme glissante sur ``window`` jours, pour chaque jour de start à
+        end. Retourne (jours, totaux du jour, sommes glissantes) en centimes.
+        """
+        first = np.datetime64(start, "D") - (window - 1)
+        days, totals = self.daily_totals(first, end, mask=mask, signed=signed)
+        cumulative = np.cumsum(totals)
+        rolling = cumulative[window - 1:] - np.r_[0, cumulative[:-window]]
+        return days[window - 1:], totals[window - 1:], rolling
+
+    def percentiles(self, q, by="category", mask=None):
+        """
+        Percentiles (interpolation linéaire, comme np.percentile) du montant
+        par valeur de ``by``, en une passe de tri. Retourne
+        {libellé: [Decimal, ...]} dans l'ordre de ``q``.
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        if mask is None:
+            mask = np.ones(len(self), dtype=bool)
+        codes = self.codes[by][mask]
+        cents = self.cents[mask]
+        if not len(cents):
+            return {}
+
+        order = np.lexsort((cents, codes))
+        codes, cents = codes[order], cents[order]
+        starts = group_starts(codes)
+        counts = np.diff(np.r_[starts, len(codes)])
+
+        positions = starts[:, None] + (counts[:, None] - 1) * q[None, :] / 100
+        lower = np.floor(positions).astype(np.intp)
+        upper = np.minimum(lower + 1, (starts + counts - 1)[:, None])
+        fraction = positions - lower
+        values = cents[lower] + (cents[upper] - cents[lower]) * fraction
+
+        return {
+            self.labels[by][code]: [Decimal(f"{value / 100:.2f}") for value in row]
+            for code, row in zip(codes[starts], values)
+        }
+
+
+def load_frame(user):
+    """
+    Une seule requête sur Transaction, qui renvoie déjà des entiers
+    (centimes, microsecondes en heure locale), plus les transactions
+    archivées.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT pkid, (amount * 100)::bigint,
+                   (extract(epoch FROM date AT TIME ZONE %s) * 1000000)::bigint,
+                   category, type, account_id
+            FROM {Transaction._meta.db_table}
+            WHERE user_id = %s
+            """,
+            [settings.TIME_ZONE, user.pkid],
+        )
+        rows = cursor.fetchall()
+
+    tz = timezone.get_current_timezone()
+    epoch = datetime(1970, 1, 1)
+    for row in archived_rows(user):
+        local_date = row["date"].astimezone(tz).replace(tzinfo=None)
+        rows.append((
+            row["pkid"],
+            int(row["amount"] * 100),
+            (local_date - epoch) // timedelta(microseconds=1),
+            row["category"],
+            row["type"],
+            row["account_id"],
+        ))
+    accounts = dict(Account.objects.filter(user=user).values_list("pkid", "id"))
+    return TransactionFrame.from_rows(rows, accounts)
+
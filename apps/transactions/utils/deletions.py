@@ -0,0 +1,105 @@
+import logging
+from uuid import UUID, uuid4
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction as db_transaction
+from django.utils import timezone
+
+from apps.transactions.models import Transaction, TransactionJob
+from apps.transactions.utils.balances import apply_balance_deltas, signed_amount, sum_balance_deltas
+from apps.transactions.utils.importers import chunked
+from apps.transactions.utils.rollups import apply_rollup_deltas, rollup_item
+from config.utils.cache import bump_user_data_version
+
+
+logger = logging.getLogger(__name__)
+
+DELETE_CHUNK_SIZE = 5000
+
+
+def parse_transaction_ids(values):
+    """
+    Retourne les UUID (sans doublons) ou lève ValueError.
+    """
+    return list(dict.fromkeys(UUID(str(value)) for value in values))
+
+
+def delete_transactions(user_id, transaction_ids):
+    """
+    Supprime les transactions de l'utilisateur en un seul
+    DELETE ... RETURNING, puis ajuste les soldes (une variation par compte)
+    et les rollups. Les IDs d'un autre utilisateur sont ignorés.
+    Retourne (nombre supprimé, {account_pkid: nouveau solde}).
+    """
+    with db_transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                DELETE FROM {Transaction._meta.db_table}
+                WHERE user_id = %s AND id = ANY(%s::uuid[])
+                RETURNING user_id, account_id, date, type, category, amount
+                """,
+                [user_id, [str(transaction_id) for transaction_id in transaction_ids]],
+            )
+            rows = cursor.fetchall()
+        if not rows:
+            return 0, {}
+
+        balances = apply_balance_deltas(sum_balance_deltas(
+            (account_id, -signed_amount(type, amount)) for _, account_id, _, type, _, amount in rows
+        ))
+        apply_rollup_deltas(rollup_item(*row, sign=-1) for row in rows)
+        bump_user_data_version(user_id)
+
+    # Comptes sans variation nette (ou à journal) : solde à relire
+    for account_id in {row[1] for row in rows}:
+        balances.setdefault(account_id, None)
+    return len(rows), balances
+
+
+def create_bulk_delete_job(user, transaction_ids):
+    """
+    Enregistre la liste d'IDs dans le stockage et crée le job associé.
+    """
+    content = "\n".join(str(transaction_id) for transaction_id in transaction_ids)
+    source = default_storage.save(f"deletions/{uuid4().hex}.txt", ContentFile(content.encode("ascii")))
+    return TransactionJob.objects.create(
+        user=user,
+        kind=TransactionJob.Kind.BULK_DELETE,
+        source=source,
+        total_rows=len(transaction_ids),
+    )
+
+
+def run_bulk_delete(job):
+    """
+    Supprime les IDs d'un job par blocs, chacun dans sa propre transaction
+    avec la progression du job. Relancer un job interrompu reprend après le
+    dernier bloc enregistré (``processed_rows``) : les compteurs ne sont pas
+    comptés deux fois. Retourne le nombre total de transactions supprimées.
+    """
+    if job.status == TransactionJob.Status.COMPLETED:
+        return job.processed_rows - job.failed_rows
+
+    job.status = TransactionJob.Status.RUNNING
+    job.started_at = job.started_at or timezone.now()
+    job.save(update_fields=["status", "started_at", "updated_at"])
+
+    with default_storage.open(job.source, "rb") as fileobj:
+        transaction_ids = fileobj.read().decode("ascii").split()
+
+    for chunk in chunked(transaction_ids[job.processed_rows:], DELETE_CHUNK_SIZE):
+        with db_transaction.atomic():
+            count, _ = delete_transactions(job.user_id, chunk)
+            job.processed_rows += len(chunk)
+            job.failed_rows += len(chunk) - count
+            job.save(update_fields=["processed_rows", "failed_rows", "updated_at"])
+
+    deleted = job.processed_rows - job.failed_rows
+    job.status = TransactionJob.Status.COMPLETED
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at", "updated_at"])
+    default_storage.delete(job.source)
+    logger.info(f"Bulk delete {job.id}: {deleted} transactions deleted.")
+    return deleted
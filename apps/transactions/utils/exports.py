@@ -0,0 +1,84 @@
+import csv
+import json
+import zlib
+
+from django.utils import timezone
+
+# Colonnes exportées, dans l'ordre du fichier (mêmes noms que l'API)
+EXPORT_FIELDS = [
+    ("id", "id"),
+    ("account", "account__id"),
+    ("type", "type"),
+    ("amount", "amount"),
+    ("description", "description"),
+    ("date", "date"),
+    ("category", "category"),
+    ("receiptUrl", "receiptUrl"),
+    ("isRecurring", "isRecurring"),
+    ("recurringInterval", "recurringInterval"),
+    ("nextRecurringDate", "nextRecurringDate"),
+    ("status", "status"),
+    ("created_at", "created_at"),
+]
+
+EXPORT_COLUMNS = [column for column, _ in EXPORT_FIELDS]
+EXPORT_LOOKUPS = [lookup for _, lookup in EXPORT_FIELDS]
+
+# Taille des blocs envoyés au client
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+class Echo:
+    """
+    Pseudo-buffer for csv.writer: write() returns the line instead of storing it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def format_value(value):
+    if value is None:
+        return None
+    if hasattr(value, "tzinfo"):
+        return timezone.localtime(value).isoformat()
+    if isinstance(value, bool):
+        return value
+    return str(value)
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(["" if value is None else value for value in map(format_value, row)])
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, map(format_value, row)))) + "\n"
+
+
+def buffered(chunks, size=STREAM_BUFFER_SIZE):
+    """
+    Regroupe les lignes en blocs d'environ ``size`` octets.
+    """
+    buffer, length = [], 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        buffer.append(data)
+        length += len(data)
+        if length >= size:
+            yield b"".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)  # en-tête gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
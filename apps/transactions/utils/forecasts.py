@@ -0,0 +1,91 @@
+from calendar import monthrange
+
+import numpy as np
+from django.utils import timezone
+
+from apps.accounts.models import Account
+from apps.accounts.utils.ledger import with_current_balance
+from apps.transactions.models import Transaction
+from apps.transactions.utils.partitions import add_months
+from apps.transactions.utils.recurrence import expand_occurrences
+
+
+MAX_FORECAST_MONTHS = 24
+
+
+def forecast_end(start, months):
+    month = add_months(start.replace(day=1), months)
+    return month.replace(day=min(start.day, monthrange(month.year, month.month)[1]))
+
+
+def forecast_balances(user, months, accounts=None):
+    """
+    Solde projeté de chaque compte, jour par jour, d'aujourd'hui à
+    ``months`` mois, à partir du solde courant et des transactions
+    récurrentes actives. Les occurrences en retard (prochaine date passée)
+    sont comptées aujourd'hui : la prochaine exécution les rattrapera.
+    """
+    today = timezone.localdate()
+    end = forecast_end(today, months)
+    if accounts is None:
+        accounts = Account.objects.filter(user=user)
+    accounts = list(with_current_balance(accounts).order_by("pkid"))
+    positions = {account.pkid: index for index, account in enumerate(accounts)}
+
+    templates = list(
+        Transaction.objects.filter(
+            user=user,
+            account_id__in=positions,
+            isRecurring=True,
+            status=Transaction.Status.COMPLETED,
+            recurringInterval__in=Transaction.RecurringIntervale.values,
+        )
+        .order_by()
+        .values_list("account_id", "type", "amount", "recurringInterval", "date", "nextRecurringDate")
+    )
+
+    days = np.arange(np.datetime64(today, "D"), np.datetime64(end, "D") + 1)
+    deltas = np.zeros((len(accounts), len(days)), dtype=np.int64)
+    income = np.zeros(len(accounts), dtype=np.int64)
+    expense = np.zeros(len(accounts), dtype=np.int64)
+
+    if templates:
+        account_ids, types, amounts, intervals, anchors, next_dates = zip(*templates)
+        anchor_dates = [timezone.localtime(anchor).date() for anchor in anchors]
+        first_dates = [
+            timezone.localtime(next_date).date() if next_date else today
+            for next_date in next_dates
+        ]
+        cents = np.rint(np.asarray(amounts, dtype=np.float64) * 100).astype(np.int64)
+        is_expense = np.asarray(types, dtype=object) == Transaction.Type.EXPENSE
+        rows = np.asarray([positions[account_id] for account_id in account_ids], dtype=np.intp)
+
+        # Calendrier ancré sur la date du modèle, comme pour sa génération
+        series, dates = expand_occurrences(intervals, anchor_dates, end, start=first_dates)
+        offsets = np.maximum((dates - days[0]).astype(np.int64), 0)
+        signed = np.where(is_expense, -cents, cents)[series]
+        np.add.at(deltas, (rows[series], offsets), signed)
+        np.add.at(income, rows[series], np.where(is_expense, 0, cents)[series])
+        np.add.at(expense, rows[series], np.where(is_expense, cents, 0)[series])
+
+    opening = np.asarray(
+        [round(account.current_balance * 100) for account in accounts], dtype=np.int64
+    )
+    balances = opening[:, None] + np.cumsum(deltas, axis=1)
+
+    return {
+        "start_date": today.isoformat(),
+        "end_date": end.isoformat(),
+        "dates": [day.isoformat() for day in days.astype(object)],
+        "accounts": [
+            {
+                "id": str(account.id),
+                "name": account.name,
+                "current_balance": float(account.current_balance),
+                "projected_income": float(income[index] / 100),
+                "projected_expense": float(expense[index] / 100),
+                "balances": (balances[index] / 100).tolist(),
+            }
+            for index, account in enumerate(accounts)
+        ],
+    }
@@ -0,0 +1,284 @@
+import codecs
+import csv
+import io
+import logging
+import re
+import uuid
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction as db_transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from apps.transactions.models import Transaction, TransactionJob
+from apps.transactions.utils.balances import apply_balance_deltas
+from apps.transactions.utils.rollups import day_sql, rollup_ctes
+from config.utils.cache import bump_user_data_version
+
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 50
+MAX_AMOUNT = Decimal("99999999.99")  # max_digits=10, decimal_places=2
+
+STAGING_TABLE = "transactions_import_staging"
+STAGING_COLUMNS = ["id", "type", "amount", "description", "date", "category"]
+
+OFX_DATE_RE = re.compile(r"^(\d{8})(\d{6})?")
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# --- Parsers -----------------------------------------------------------------
+
+def iter_csv_records(fileobj):
+    """
+    Lit un relevé CSV ligne par ligne. Colonnes attendues (insensibles à la
+    casse) : date, amount, description, category et, en option, type.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline=""))
+    for row in reader:
+        yield {
+            (key or "").strip().lower(): (value or "").strip()
+            for key, value in row.items()
+        }
+
+
+def iter_ofx_tokens(fileobj, read_size=64 * 1024):
+    """
+    Découpe un fichier OFX (SGML ou XML) en couples (balise, valeur) sans le
+    charger entièrement en mémoire.
+    """
+    decoder = codecs.getincrementaldecoder("latin-1")()
+    pending = ""
+    while True:
+        data = fileobj.read(read_size)
+        pending += decoder.decode(data, final=not data)
+        parts = pending.split("<")
+        # Le dernier morceau peut être incomplet, on le garde pour le tour suivant
+        pending = parts.pop() if data else ""
+        for part in parts:
+            tag, _, value = part.partition(">")
+            if tag:
+                yield tag.strip().upper(), value.strip()
+        if not data:
+            return
+
+
+def iter_ofx_records(fileobj):
+    record = None
+    for tag, value in iter_ofx_tokens(fileobj):
+        if tag == "STMTTRN":
+            record = {}
+        elif tag == "/STMTTRN" and record is not None:
+            yield {
+                "date": record.get("DTPOSTED", ""),
+                "amount": record.get("TRNAMT", ""),
+                "description": record.get("MEMO") or record.get("NAME", ""),
+                "category": "",
+            }
+            record = None
+        elif record is not None and not tag.startswith("/"):
+            record[tag] = value
+
+
+PARSERS = {
+    ".csv": iter_csv_records,
+    ".ofx": iter_ofx_records,
+    ".qfx": iter_ofx_records,
+}
+
+
+# --- Validation --------------------------------------------------------------
+
+def parse_import_date(value):
+    match = OFX_DATE_RE.match(value)
+    if match:
+        date_part, time_part = match.groups()
+        value = datetime.strptime(date_part + (time_part or "000000"), "%Y%m%d%H%M%S")
+    else:
+        value = parse_datetime(value) or parse_date(value)
+        if value is None:
+            raise ImportRowError("Invalid date.")
+        if not isinstance(value, datetime):
+            value = datetime.combine(value, time.min)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def validate_record(record):
+    """
+    Retourne la ligne prête pour COPY ou lève ImportRowError.
+    """
+    try:
+        amount = Decimal(record.get("amount", "").replace(",", "."))
+    except InvalidOperation:
+        raise ImportRowError("Invalid amount.")
+    if not amount.is_finite() or abs(amount) > MAX_AMOUNT:
+        raise ImportRowError("Invalid amount.")
+
+    type = record.get("type", "").lower()
+    if type not in Transaction.Type.values:
+        type = Transaction.Type.EXPENSE if amount < 0 else Transaction.Type.INCOME
+
+    date = parse_import_date(record.get("date", ""))
+    category = record.get("category") or f"other-{type}"
+
+    return [
+        uuid.uuid4(),
+        type,
+        abs(amount).quantize(Decimal("0.01")),
+        record.get("description", ""),
+        date.isoformat(),
+        category[:50],
+    ]
+
+
+def validate_batch(records, first_row_number):
+    rows, errors = [], []
+    for offset, record in enumerate(records):
+        try:
+            rows.append(validate_record(record))
+        except (ImportRowError, ValueError) as e:
+            errors.append({"row": first_row_number + offset, "error": str(e)})
+    return rows, errors
+
+
+# --- Chargement --------------------------------------------------------------
+
+def create_staging_table(cursor):
+    cursor.execute(
+        f"""
+        CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+            id uuid NOT NULL,
+            type varchar(10) NOT NULL,
+            amount numeric(10, 2) NOT NULL,
+            description text,
+            date timestamp with time zone NOT NULL,
+            category varchar(50) NOT NULL
+        )
+        """
+    )
+    cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+
+
+def copy_to_staging(cursor, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+
+
+def merge_staging(cursor, job):
+    """
+    Insère toutes les lignes de la table de staging dans Transaction en une
+    seule requête et renvoie (variation du solde, nombre de lignes).
+    """
+    cursor.execute(
+        f"""
+        WITH inserted AS (
+            INSERT INTO {Transaction._meta.db_table} (
+                id, user_id, account_id, type, amount, description, date, category,
+                "receiptUrl", "isRecurring", status, created_at, updated_at
+            )
+            SELECT
+                id, %(user_id)s, %(account_id)s, type, amount, description, date, category,
+                '', false, %(status)s, now(), now()
+            FROM {STAGING_TABLE}
+            RETURNING type, amount
+        )
+        SELECT
+            COALESCE(SUM(CASE WHEN type = %(expense)s THEN -amount ELSE amount END), 0),
+            COUNT(*)
+        FROM inserted
+        """,
+        {
+            "user_id": job.user_id,
+            "account_id": job.account_id,
+            "status": Transaction.Status.COMPLETED,
+            "expense": Transaction.Type.EXPENSE,
+        },
+    )
+    return cursor.fetchone()
+
+
+def merge_staging_rollups(cursor, job):
+    cursor.execute(
+        f"""
+        WITH changes AS (
+            SELECT %(user_id)s AS user_id, %(account_id)s AS account_id, {day_sql()} AS day,
+                   type, category, amount AS total, 1 AS count
+            FROM {STAGING_TABLE}
+        ),
+        {rollup_ctes()}
+        SELECT 1
+        """,
+        {"user_id": job.user_id, "account_id": job.account_id, "time_zone": settings.TIME_ZONE},
+    )
+
+
+def run_import(job):
+    """
+    Importe le fichier d'un TransactionJob : lecture et validation par blocs,
+    COPY dans une table temporaire, puis fusion et mise à jour du solde du
+    compte en une seule transaction.
+    """
+    extension = job.source[job.source.rfind("."):].lower()
+    parse = PARSERS[extension]
+
+    job.status = TransactionJob.Status.RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=["status", "started_at", "updated_at"])
+
+    errors = []
+    with connection.cursor() as cursor:
+        create_staging_table(cursor)
+
+        with default_storage.open(job.source, "rb") as fileobj:
+            row_number = 1
+            for records in chunked(parse(fileobj), IMPORT_CHUNK_SIZE):
+                rows, batch_errors = validate_batch(records, row_number)
+                row_number += len(records)
+                if rows:
+                    copy_to_staging(cursor, rows)
+                # Au-delà de MAX_REPORTED_ERRORS, les erreurs sont seulement comptées
+                errors.extend(batch_errors[:MAX_REPORTED_ERRORS - len(errors)])
+
+                # Progression visible pendant l'import (hors transaction)
+                job.processed_rows += len(records)
+                job.failed_rows += len(batch_errors)
+                job.save(update_fields=["processed_rows", "failed_rows", "updated_at"])
+
+        with db_transaction.atomic():
+            balance_change, imported = merge_staging(cursor, job)
+            merge_staging_rollups(cursor, job)
+            apply_balance_deltas({job.account_id: balance_change})
+        # COPY n'envoie pas post_save et un solde inchangé n'invalide rien
+        bump_user_data_version(job.user_id)
+        cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+
+    job.total_rows = imported
+    job.errors = errors
+    job.status = TransactionJob.Status.COMPLETED
+    job.finished_at = timezone.now()
+    job.save()
+    default_storage.delete(job.source)
+    logger.info(f"Import {job.id}: {imported} transactions imported, {job.failed_rows} rejected.")
+    return imported
@@ -0,0 +1,137 @@
+import logging
+from datetime import datetime, time
+from time import sleep
+
+from django.db import OperationalError, connection, transaction as db_transaction
+from django.utils import timezone
+
+from apps.transactions.models import Transaction
+
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_TABLE = Transaction._meta.db_table
+DEFAULT_PARTITION = f"{TRANSACTION_TABLE}_default"
+
+# Partitions mensuelles créées à l'avance par la tâche planifiée
+PARTITION_MONTHS_AHEAD = 3
+
+# Attente maximale des verrous de la création d'une partition ; au-delà,
+# nouvel essai après PARTITION_RETRY_DELAY secondes (doublées à chaque fois)
+PARTITION_LOCK_TIMEOUT = "5s"
+PARTITION_LOCK_RETRIES = 5
+PARTITION_RETRY_DELAY = 2
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def partition_name(month):
+    return f"{TRANSACTION_TABLE}_p{month:%Y_%m}"
+
+
+def partition_bounds(month):
+    """
+    Bornes [début, fin[ de la partition d'un mois, en TIME_ZONE : une
+    partition correspond exactement à un mois de la table de rollups.
+    """
+    start = timezone.make_aware(datetime.combine(month, time.min))
+    end = timezone.make_aware(datetime.combine(add_months(month, 1), time.min))
+    return start, end
+
+
+def is_partitioned(cursor):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+        [TRANSACTION_TABLE],
+    )
+    return cursor.fetchone() is not None
+
+
+def existing_partitions(cursor):
+    cursor.execute(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass(%s)
+        """,
+        [TRANSACTION_TABLE],
+    )
+    return {name for (name,) in cursor.fetchall()}
+
+
+def create_month_partition(cursor, month):
+    """
+    Crée la partition d'un mois. Les lignes de ce mois déjà tombées dans la
+    partition par défaut y sont déplacées avant l'ATTACH, qui échouerait
+    sinon. La partition par défaut est verrouillée (ACCESS EXCLUSIVE, le
+    verrou que l'ATTACH prend de toute façon pour la vérifier) du
+    déplacement jusqu'à l'ATTACH : aucune ligne du mois ne peut y arriver
+    entre les deux. Pendant ce temps, les lectures et écritures qui touchent
+    la partition par défaut, dont les requêtes sur la table mère qui ne
+    peuvent pas l'exclure, attendent. Elle est presque vide quand les
+    partitions sont créées à l'avance, le verrou est donc bref ; pour ne
+    pas bloquer la table derrière une longue requête, l'attente des verrous
+    est limitée à PARTITION_LOCK_TIMEOUT et la création retentée.
+    """
+    for attempt in range(PARTITION_LOCK_RETRIES):
+        try:
+            return attach_month_partition(cursor, month)
+        except OperationalError as e:
+            if getattr(e.__cause__, "pgcode", None) != LOCK_NOT_AVAILABLE or attempt == PARTITION_LOCK_RETRIES - 1:
+                raise
+            delay = PARTITION_RETRY_DELAY * 2 ** attempt
+            logger.warning(f"Partition {partition_name(month)}: tables busy, retrying in {delay}s.")
+            sleep(delay)
+
+
+def attach_month_partition(cursor, month):
+    name = partition_name(month)
+    start, end = partition_bounds(month)
+    with db_transaction.atomic():
+        cursor.execute(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'")
+        cursor.execute(f"LOCK TABLE {DEFAULT_PARTITION} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(
+            f"CREATE TABLE {name} (LIKE {TRANSACTION_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE date >= %s AND date < %s
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """,
+            [start, end],
+        )
+        moved = cursor.rowcount
+        cursor.execute(
+            f"ALTER TABLE {TRANSACTION_TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+    if moved:
+        logger.info(f"{moved} transactions moved from {DEFAULT_PARTITION} to {name}.")
+    return name
+
+
+def ensure_partitions(months_ahead=PARTITION_MONTHS_AHEAD):
+    """
+    Crée les partitions manquantes du mois courant aux ``months_ahead``
+    mois suivants. Retourne les noms des partitions créées.
+    """
+    created = []
+    with connection.cursor() as cursor:
+        if connection.vendor != "postgresql" or not is_partitioned(cursor):
+            return created
+        existing = existing_partitions(cursor)
+        current = timezone.localdate().replace(day=1)
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if partition_name(month) not in existing:
+                created.append(create_month_partition(cursor, month))
+    return created
@@ -0,0 +1,13 @@
+from django.conf import settings
+
+from config.utils.ratelimit import SlidingWindow, TokenBucket, UserRateLimitThrottle
+
+
+# Quota global de l'API Gemini, tous utilisateurs et processus confondus
+GEMINI_LIMITER = TokenBucket("gemini", getattr(settings, "GEMINI_RATE_LIMIT", "15/min"))
+# Par utilisateur, pour la tâche historique process_recurring_transaction
+RECURRING_LIMITER = SlidingWindow("recurring", getattr(settings, "RECURRING_RATE_LIMIT", "10/min"))
+
+
+class ReceiptScanThrottle(UserRateLimitThrottle):
+    scope = "receipt_scan"
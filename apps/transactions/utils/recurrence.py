@@ -0,0 +1,147 @@
+from calendar import monthrange
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from apps.transactions.models import Transaction
+from apps.transactions.utils.partitions import add_months
+
+
+Interval = Transaction.RecurringIntervale
+
+# Intervalles de pas fixe, en jours
+INTERVAL_DAYS = {Interval.DAILY: 1, Interval.WEEKLY: 7}
+# Intervalles calendaires, en mois
+INTERVAL_MONTHS = {Interval.MONTHLY: 1, Interval.YEARLY: 12}
+
+
+def ragged_arange(counts):
+    """
+    Rang de chaque occurrence dans sa série : [2, 3] -> [0, 1, 0, 1, 2].
+    """
+    starts = np.cumsum(counts) - counts
+    return np.arange(counts.sum()) - np.repeat(starts, counts)
+
+
+def month_length(months):
+    """
+    Nombre de jours de chaque mois (datetime64[M]).
+    """
+    return ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(np.int64)
+
+
+def expand_occurrences(intervals, first_dates, end, start=None):
+    """
+    Toutes les occurrences jusqu'à ``end`` (inclus) de séries décrites par
+    leur intervalle et leur première date, sans boucle par occurrence.
+    Avec ``start`` (une date, ou une par série), les occurrences antérieures
+    ne sont pas générées. Retourne (indice de la série, date datetime64[D])
+    pour chaque occurrence.
+
+    Mois et années restent ancrés sur le jour de la première date, ramené
+    au dernier jour des mois plus courts : le 31 donne le 30 avril puis le
+    31 mai, le 29 février donne le 28 les années non bissextiles.
+    """
+    intervals = np.asarray(intervals, dtype=object)
+    first_dates = np.asarray(first_dates, dtype="datetime64[D]")
+    end = np.datetime64(end, "D")
+    if start is None:
+        start = first_dates
+    starts = np.broadcast_to(np.asarray(start, dtype="datetime64[D]"), first_dates.shape)
+    indexes, dates = [np.zeros(0, dtype=np.intp)], [np.zeros(0, dtype="datetime64[D]")]
+
+    for interval, step in INTERVAL_DAYS.items():
+        selected = np.flatnonzero(intervals == interval)
+        first = first_dates[selected]
+        # Premier rang à partir de start (division arrondie au supérieur)
+        skipped = np.maximum(-((first - starts[selected]).astype(np.int64) // step), 0)
+        counts = np.maximum((end - first).astype(np.int64) // step + 1 - skipped, 0)
+        indexes.append(np.repeat(selected, counts))
+        dates.append(np.repeat(first + skipped * step, counts) + ragged_arange(counts) * step)
+
+    for interval, step in INTERVAL_MONTHS.items():
+        selected = np.flatnonzero(intervals == interval)
+        first = first_dates[selected]
+        first_month = first.astype("datetime64[M]")
+        anchor_day = (first - first_month.astype("datetime64[D]")).astype(np.int64)
+        # Le mois de start peut contenir une occurrence antérieure à start :
+        # elle est écartée avec celles d'après end
+        skipped = np.maximum(
+            (starts[selected].astype("datetime64[M]") - first_month).astype(np.int64) // step, 0
+        )
+        counts = np.maximum(
+            (end.astype("datetime64[M]") - first_month).astype(np.int64) // step + 1 - skipped, 0
+        )
+        months = np.repeat(first_month + skipped * step, counts) + ragged_arange(counts) * step
+        days = np.minimum(np.repeat(anchor_day, counts), month_length(months) - 1)
+        occurrences = months.astype("datetime64[D]") + days
+        keep = (occurrences <= end) & (occurrences >= np.repeat(starts[selected], counts))
+        indexes.append(np.repeat(selected, counts)[keep])
+        dates.append(occurrences[keep])
+
+    return np.concatenate(indexes), np.concatenate(dates)
+
+
+def shift(value, interval, count):
+    """
+    ``value`` (date ou datetime naïf) décalé de ``count`` intervalles, avec
+    la même règle de fin de mois que expand_occurrences.
+    """
+    if interval in INTERVAL_DAYS:
+        return value + timedelta(days=INTERVAL_DAYS[interval] * count)
+    month = add_months(value, INTERVAL_MONTHS[interval] * count)
+    return month.replace(day=min(value.day, monthrange(month.year, month.month)[1]))
+
+
+def next_occurrence(interval, anchor, after):
+    """
+    Première date du calendrier d'une série ancrée sur ``anchor`` (datetime
+    aware, rang 0) strictement postérieure à ``after``. Le calcul se fait
+    en heure locale : l'heure de ``anchor`` est conservée d'un changement
+    d'heure à l'autre. None si l'intervalle est inconnu.
+    """
+    interval = (interval or "").lower()
+    if interval not in INTERVAL_DAYS and interval not in INTERVAL_MONTHS:
+        return None
+
+    local_anchor = timezone.localtime(anchor).replace(tzinfo=None)
+    local_after = timezone.localtime(after).replace(tzinfo=None)
+    if interval in INTERVAL_DAYS:
+        count = (local_after - local_anchor) // timedelta(days=INTERVAL_DAYS[interval])
+    else:
+        months = (local_after.year - local_anchor.year) * 12 + local_after.month - local_anchor.month
+        count = months // INTERVAL_MONTHS[interval]
+    # Estimation au plus juste, corrigée d'un ou deux rangs au besoin
+    count = max(count, 0)
+    while timezone.make_aware(shift(local_anchor, interval, count)) <= after:
+        count += 1
+    return timezone.make_aware(shift(local_anchor, interval, count))
+
+
+def due_occurrences(intervals, anchors, pending, now):
+    """
+    Occurrences à créer pour des séries en retard, en un appel vectorisé :
+    la date en attente de chaque série (``pending``, sa nextRecurringDate),
+    puis toutes les dates de son calendrier ancré sur ``anchors`` comprises
+    entre ``pending`` (exclu) et ``now`` (inclus). Retourne
+    (indices des séries, liste de datetimes aware), une entrée par occurrence.
+    """
+    tz = timezone.get_current_timezone()
+    local_anchors = [timezone.localtime(anchor, tz).replace(tzinfo=None) for anchor in anchors]
+    local_pending = np.asarray(
+        [timezone.localtime(value, tz).replace(tzinfo=None) for value in pending], dtype="datetime64[us]"
+    )
+    local_now = np.datetime64(timezone.localtime(now, tz).replace(tzinfo=None), "us")
+    anchor_days = np.asarray([anchor.date() for anchor in local_anchors], dtype="datetime64[D]")
+    times = np.asarray(local_anchors, dtype="datetime64[us]") - anchor_days
+
+    series, days = expand_occurrences(
+        intervals, anchor_days, local_now.astype("datetime64[D]"), start=local_pending.astype("datetime64[D]")
+    )
+    moments = days + times[series]
+    keep = (moments > local_pending[series]) & (moments <= local_now)
+    series, moments = series[keep], moments[keep]
+
+    occurrences = list(pending) + [timezone.make_aware(moment, tz) for moment in moments.astype(object)]
+    return np.concatenate([np.arange(len(local_anchors)), series]), occurrences
@@ -0,0 +1,105 @@
+import logging
+
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from apps.transactions.models import RECURRING_DUE_AT, RECURRING_QUEUE, Transaction
+from apps.transactions.utils.balances import apply_balance_deltas, signed_amount, sum_balance_deltas
+from apps.transactions.utils.recurrence import due_occurrences
+from apps.transactions.utils.rollups import apply_rollup_deltas, transaction_rollup_item
+from apps.transactions.utils.utilities_functions import calculate_next_recurring_date
+from config.utils.cache import bump_user_data_version
+
+
+logger = logging.getLogger(__name__)
+
+RECURRING_CHUNK_SIZE = 1000
+# Lignes par INSERT : un bloc en retard peut produire bien plus d'occurrences que de modèles
+OCCURRENCE_BATCH_SIZE = 5000
+# Tâches lancées en parallèle par trigger_recurring_transactions
+RECURRING_WORKERS = 4
+
+
+def due_templates(now):
+    """
+    Modèles échus : prochaine date passée, ou jamais traité et sans
+    prochaine date. Une seule borne sur RECURRING_DUE_AT, servie par
+    l'index partiel transaction_recurring_due_idx : le coût ne dépend que
+    du nombre de modèles échus, pas de l'historique.
+    """
+    return Transaction.objects.filter(RECURRING_QUEUE).alias(due_at=RECURRING_DUE_AT).filter(due_at__lte=now)
+
+
+def build_occurrence(template, date):
+    return Transaction(
+        user_id=template.user_id,
+        account_id=template.account_id,
+        type=template.type,
+        amount=template.amount,
+        category=template.category,
+        description=f"{template.description} (recurring).",
+        date=date,
+        isRecurring=False,
+        status=Transaction.Status.PENDING,
+    )
+
+
+def process_due_chunk(chunk_size=RECURRING_CHUNK_SIZE):
+    """
+    Traite un bloc de modèles récurrents dus, les plus anciens d'abord, en
+    une transaction :
+    verrouillage avec SKIP LOCKED (deux workers ne prennent jamais les
+    mêmes modèles et ne s'attendent pas), un INSERT pour les occurrences,
+    une variation de solde par compte, un UPDATE pour les modèles.
+
+    Chaque modèle reçoit toutes ses occurrences manquées depuis sa
+    nextRecurringDate (après une panne des workers par exemple), à leur
+    date prévue. Un modèle jamais traité et sans prochaine date reçoit une
+    occurrence à maintenant.
+    Retourne le nombre de modèles traités, 0 quand il n'en reste plus.
+    """
+    now = timezone.now()
+    with db_transaction.atomic():
+        templates = list(
+            due_templates(now)
+            .select_for_update(skip_locked=True, no_key=True)
+            .order_by("due_at")[:chunk_size]
+        )
+        if not templates:
+            return 0
+
+        series, dates = due_occurrences(
+            [template.recurringInterval for template in templates],
+            [template.date for template in templates],
+            [template.nextRecurringDate or now for template in templates],
+            now,
+        )
+        occurrences = Transaction.objects.bulk_create(
+            [build_occurrence(templates[index], date) for index, date in zip(series, dates)],
+            batch_size=OCCURRENCE_BATCH_SIZE,
+        )
+        apply_rollup_deltas([transaction_rollup_item(occurrence) for occurrence in occurrences])
+        apply_balance_deltas(sum_balance_deltas(
+            (occurrence.account_id, signed_amount(occurrence.type, occurrence.amount))
+            for occurrence in occurrences
+        ))
+
+        for template in templates:
+            template.lastProcessed = now
+            template.nextRecurringDate = calculate_next_recurring_date(template)
+            template.updated_at = now
+        Transaction.objects.bulk_update(templates, ["lastProcessed", "nextRecurringDate", "updated_at"])
+        bump_user_data_version(*{template.user_id for template in templates})
+
+    logger.info(f"{len(templates)} recurring transactions processed, {len(occurrences)} occurrences created.")
+    return len(templates)
+
+
+def process_due_templates(chunk_size=RECURRING_CHUNK_SIZE):
+    """
+    Traite des blocs jusqu'à ce qu'il n'y ait plus de modèle dû.
+    """
+    processed = 0
+    while count := process_due_chunk(chunk_size):
+        processed += count
+    return processed
@@ -0,0 +1,296 @@
+import json
+import logging
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction as db_transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from google.generativeai import GenerativeModel
+
+from apps.transactions.models import MonthlyReportChunk, MonthlyReportRun, Transaction, TransactionMonthlyRollup
+from apps.transactions.utils.partitions import add_months
+from apps.transactions.utils.ratelimits import GEMINI_LIMITER
+from config.utils.emails import send_monthly_report_email
+from config.utils.ratelimit import acquire
+
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+REPORT_CHUNK_SIZE = 500
+# Attente maximale d'un jeton Gemini avant de replanifier la tranche
+GEMINI_WAIT = 60
+# Sans nouvelle de son worker pendant ce délai, une tranche en cours peut
+# être reprise par un autre (worker arrêté, message relivré)
+CHUNK_LEASE = timedelta(minutes=10)
+
+Status = MonthlyReportRun.Status
+
+
+class ReportQuotaExceeded(Exception):
+    """
+    Le quota Gemini est épuisé pour plus de GEMINI_WAIT secondes.
+    """
+
+
+class ChunkBusy(Exception):
+    """
+    La tranche est traitée par un autre worker ; ``retry_after`` : secondes
+    avant l'expiration de son bail.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+def previous_month(today=None):
+    today = today or timezone.localdate()
+    return add_months(today.replace(day=1), -1)
+
+
+# --- Statistiques ------------------------------------------------------------
+
+def empty_stats():
+    return {"total_income": 0, "total_expenses": 0, "by_category": {}}
+
+
+def users_monthly_stats(start_pkid, end_pkid, month):
+    """
+    Statistiques du mois des utilisateurs dont le pkid est entre start_pkid
+    et end_pkid (inclus), en une requête groupée par (utilisateur, type,
+    catégorie) sur les rollups. Retourne {user_pkid: stats}, des stats
+    vides pour les utilisateurs sans transaction.
+    """
+    rows = (
+        TransactionMonthlyRollup.objects.filter(user_id__gte=start_pkid, user_id__lte=end_pkid, month=month)
+        .values("user_id", "type", "category")
+        .annotate(total=Sum("total"))
+        .order_by()
+    )
+
+    stats = defaultdict(empty_stats)
+    for row in rows:
+        user_stats = stats[row["user_id"]]
+        if row["type"] == Transaction.Type.INCOME:
+            user_stats["total_income"] += row["total"]
+        else:
+            user_stats["total_expenses"] += row["total"]
+            user_stats["by_category"][row["category"]] = row["total"]
+    return stats
+
+
+def generate_financial_insights(stats, month):
+    """
+    Génère des insights financières avec Gemini
+    """
+    model = GenerativeModel("gemini-1.5-flash")
+    prompt = f"""
+        Analyze this financial data and provide 3 concise, actionable insights.
+        Focus on spending patterns and practical advice.
+        Keep it friendly and conversational.
+
+        Financial Data for {month}:
+        - Total Income: ${stats["total_income"]}
+        - Total Expenses: ${stats["total_expenses"]}
+        - Net Income: ${stats["total_income"] - stats["total_expenses"]}
+        - Expense Categories: {", ".join([f"{k}: ${v}" for k, v in stats["by_category"].items()])}
+
+        Format the response as a JSON array of strings, like this:
+        ["insight 1", "insight 2", "insight 2"]
+    """
+    try:
+        response = model.generate_content(prompt)
+        text = response.text.replace("```json","").replace("```","").strip()
+        return json.loads(text)
+    except Exception as e:
+        logger.error(f"Error generating insights: {e}")
+        return [
+            "Your highest expense category this month might need attention.",
+            "Consider setting up a budget for better financial management.",
+            "Track your recurring expenses to identify potential savings.",
+        ]
+
+
+# --- Exécution par tranches --------------------------------------------------
+
+def start_run(month, chunk_size=REPORT_CHUNK_SIZE):
+    """
+    Exécution du mois, créée et découpée en tranches au premier appel. Les
+    utilisateurs sont lus par plages de clés (pkid > dernier vu), sans
+    charger la table. Une exécution inachevée repasse en cours : ses
+    tranches restantes seront relancées.
+    """
+    now = timezone.now()
+    with db_transaction.atomic():
+        run, created = MonthlyReportRun.objects.select_for_update().get_or_create(
+            month=month, defaults={"chunk_size": chunk_size}
+        )
+        if not created:
+            if run.status != Status.COMPLETED:
+                run.status = Status.RUNNING
+                run.save(update_fields=["status", "updated_at"])
+            return run
+
+        chunks, last_pkid = [], 0
+        while True:
+            pkids = list(
+                User.objects.filter(pkid__gt=last_pkid).order_by("pkid").values_list("pkid", flat=True)[:chunk_size]
+            )
+            if not pkids:
+                break
+            chunks.append(MonthlyReportChunk(run=run, start_pkid=pkids[0], end_pkid=pkids[-1], user_count=len(pkids)))
+            last_pkid = pkids[-1]
+        MonthlyReportChunk.objects.bulk_create(chunks)
+
+        run.total_users = sum(chunk.user_count for chunk in chunks)
+        run.total_chunks = len(chunks)
+        run.status = Status.RUNNING
+        run.started_at = now
+        run.save()
+    logger.info(f"Monthly reports {month:%Y-%m}: {run.total_users} users in {run.total_chunks} chunks.")
+    return run
+
+
+def pending_chunks(run):
+    return run.chunks.exclude(status=Status.COMPLETED).order_by("start_pkid")
+
+
+def claim_chunk(chunk_pkid):
+    """
+    Réserve la tranche pour ce worker : la ligne est verrouillée (SKIP
+    LOCKED) puis passe en cours avec un nouveau jeton, sauf si elle est
+    terminée ou détenue par un worker dont le bail court encore.
+    Retourne le jeton, None si la tranche est terminée.
+    Lève ChunkBusy si un autre worker la détient.
+    """
+    now = timezone.now()
+    with db_transaction.atomic():
+        chunk = MonthlyReportChunk.objects.select_for_update(skip_locked=True).filter(pkid=chunk_pkid).first()
+        if chunk is None:
+            # Ligne verrouillée par une réservation concurrente
+            raise ChunkBusy(CHUNK_LEASE.total_seconds())
+        if chunk.status == Status.COMPLETED:
+            return None
+        if chunk.status == Status.RUNNING and chunk.heartbeat_at and chunk.heartbeat_at > now - CHUNK_LEASE:
+            raise ChunkBusy((chunk.heartbeat_at + CHUNK_LEASE - now).total_seconds())
+
+        chunk.status = Status.RUNNING
+        chunk.claim_token = uuid.uuid4()
+        chunk.heartbeat_at = now
+        chunk.started_at = chunk.started_at or now
+        chunk.save(update_fields=["status", "claim_token", "heartbeat_at", "started_at"])
+    return chunk.claim_token
+
+
+def process_chunk(chunk_pkid):
+    """
+    Envoie le rapport des utilisateurs de la tranche qui ne l'ont pas encore
+    reçu, après avoir réservé la tranche (claim_chunk). Le curseur de la
+    tranche et les compteurs de l'exécution avancent dans une même
+    transaction après chaque utilisateur ; l'envoi d'un e-mail ne pouvant
+    pas en faire partie, la livraison est au moins une fois : un worker
+    arrêté entre l'envoi et cette transaction renverra ce rapport à la
+    reprise. L'échec d'un utilisateur est compté sans arrêter la tranche.
+    Lève ReportQuotaExceeded si le quota Gemini reste épuisé, ChunkBusy si
+    un autre worker traite la tranche.
+    """
+    token = claim_chunk(chunk_pkid)
+    chunk = MonthlyReportChunk.objects.select_related("run").get(pkid=chunk_pkid)
+    if token is None:
+        return chunk
+    run = chunk.run
+    cursor = chunk.start_pkid - 1 if chunk.last_user_pkid is None else chunk.last_user_pkid
+    claimed = MonthlyReportChunk.objects.filter(pkid=chunk.pkid, claim_token=token)
+
+    users = User.objects.filter(pkid__gt=cursor, pkid__lte=chunk.end_pkid).order_by("pkid")
+    stats = users_monthly_stats(cursor + 1, chunk.end_pkid, run.month)
+    month_name = run.month.strftime("%B")
+
+    for user in users:
+        if not acquire(GEMINI_LIMITER, timeout=GEMINI_WAIT):
+            # La tranche est rendue pour que la tâche replanifiée la reprenne
+            claimed.update(status=Status.PENDING, claim_token=None)
+            raise ReportQuotaExceeded()
+        failed = 0
+        try:
+            user_stats = stats[user.pkid]
+            insights = generate_financial_insights(user_stats, month_name)
+            send_monthly_report_email(user, user_stats, month_name, insights)
+        except Exception as e:
+            logger.error(f"Monthly report of {user.email} failed: {e}")
+            failed = 1
+
+        with db_transaction.atomic():
+            updated = claimed.update(
+                last_user_pkid=user.pkid,
+                processed_users=F("processed_users") + 1 - failed,
+                failed_users=F("failed_users") + failed,
+                heartbeat_at=timezone.now(),
+            )
+            if not updated:
+                # Bail expiré : la tranche a été reprise par un autre worker
+                logger.warning(f"Monthly report chunk {chunk.pkid} was claimed by another worker, stopping.")
+                chunk.refresh_from_db()
+                return chunk
+            MonthlyReportRun.objects.filter(pkid=run.pkid).update(
+                processed_users=F("processed_users") + 1 - failed,
+                failed_users=F("failed_users") + failed,
+                updated_at=timezone.now(),
+            )
+
+    with db_transaction.atomic():
+        if claimed.update(status=Status.COMPLETED, claim_token=None, finished_at=timezone.now()):
+            MonthlyReportRun.objects.filter(pkid=run.pkid).update(
+                completed_chunks=F("completed_chunks") + 1, updated_at=timezone.now()
+            )
+
+    run.refresh_from_db()
+    logger.info(
+        f"Monthly reports {run.month:%Y-%m}: {run.processed_users + run.failed_users}/{run.total_users} users, "
+        f"{run.completed_chunks}/{run.total_chunks} chunks."
+    )
+    chunk.refresh_from_db()
+    return chunk
+
+
+def fail_chunk(chunk_pkid):
+    chunk = MonthlyReportChunk.objects.get(pkid=chunk_pkid)
+    MonthlyReportChunk.objects.filter(pkid=chunk_pkid).update(status=Status.FAILED)
+    MonthlyReportRun.objects.filter(pkid=chunk.run_id).update(status=Status.FAILED, updated_at=timezone.now())
+
+
+def finish_run(run_pkid):
+    """
+    Clôt l'exécution une fois toutes ses tranches terminées et journalise sa
+    durée totale.
+    """
+    run = MonthlyReportRun.objects.get(pkid=run_pkid)
+    if pending_chunks(run).exists():
+        logger.warning(f"Monthly reports {run.month:%Y-%m}: chunks left, run not finished.")
+        return run
+    if run.status != Status.COMPLETED:
+        run.status = Status.COMPLETED
+        run.finished_at = timezone.now()
+        run.save(update_fields=["status", "finished_at", "updated_at"])
+    logger.info(
+        f"Monthly reports {run.month:%Y-%m} done: {run.processed_users}/{run.total_users} users sent, "
+        f"{run.failed_users} failed, in {run.duration}."
+    )
+    return run
+
+
+def run_summary(run):
+    return {
+        "run": str(run.id),
+        "month": run.month.isoformat(),
+        "status": run.status,
+        "total_users": run.total_users,
+        "processed_users": run.processed_users,
+        "failed_users": run.failed_users,
+        "chunks": f"{run.completed_chunks}/{run.total_chunks}",
+        "duration": run.duration.total_seconds() if run.duration else None,
+    }
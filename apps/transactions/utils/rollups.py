@@ -0,0 +1,195 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.accounts.models import Account
+from apps.transactions.models import Transaction, TransactionArchive, TransactionDailyRollup, TransactionMonthlyRollup
+from apps.transactions.utils.archives import iter_archive_rows
+
+
+ROLLUP_TABLE = TransactionMonthlyRollup._meta.db_table
+ROLLUP_COLUMNS = "user_id, account_id, month, type, category, total, count"
+DAILY_ROLLUP_TABLE = TransactionDailyRollup._meta.db_table
+DAILY_ROLLUP_COLUMNS = "user_id, account_id, day, type, category, total, count"
+
+# Les lignes d'un même INSERT ne doivent pas partager une clé (d'où les
+# regroupements en amont) ; une clé existante est incrémentée.
+ROLLUP_ON_CONFLICT = """
+    ON CONFLICT (user_id, account_id, month, type, category) DO UPDATE
+    SET total = rollup.total + EXCLUDED.total, count = rollup.count + EXCLUDED.count
+"""
+DAILY_ROLLUP_ON_CONFLICT = """
+    ON CONFLICT (user_id, account_id, day, type, category) DO UPDATE
+    SET total = rollup.total + EXCLUDED.total, count = rollup.count + EXCLUDED.count
+"""
+
+
+def month_start(value):
+    """
+    Premier jour du mois de ``value`` dans le fuseau TIME_ZONE, comme
+    date_trunc('month', date AT TIME ZONE ...) côté SQL.
+    """
+    return timezone.localtime(value).date().replace(day=1)
+
+
+def month_sql(column="date"):
+    return f"date_trunc('month', {column} AT TIME ZONE %(time_zone)s)::date"
+
+
+def day_sql(column="date"):
+    return f"({column} AT TIME ZONE %(time_zone)s)::date"
+
+
+def rollup_ctes(source="changes"):
+    """
+    CTE qui appliquent les variations de ``source`` (colonnes user_id,
+    account_id, day, type, category, total, count ; day est la date locale)
+    aux rollups mensuels et journaliers, dans la même requête que l'écriture.
+    """
+    return f"""
+    monthly_rollups AS (
+        INSERT INTO {ROLLUP_TABLE} AS rollup ({ROLLUP_COLUMNS})
+        SELECT user_id, account_id, date_trunc('month', day)::date, type, category, SUM(total), SUM(count)
+        FROM {source}
+        GROUP BY 1, 2, 3, 4, 5
+        HAVING SUM(total) <> 0 OR SUM(count) <> 0
+        {ROLLUP_ON_CONFLICT}
+    ),
+    daily_rollups AS (
+        INSERT INTO {DAILY_ROLLUP_TABLE} AS rollup ({DAILY_ROLLUP_COLUMNS})
+        SELECT user_id, account_id, day, type, category, SUM(total), SUM(count)
+        FROM {source}
+        GROUP BY 1, 2, 3, 4, 5
+        HAVING SUM(total) <> 0 OR SUM(count) <> 0
+        {DAILY_ROLLUP_ON_CONFLICT}
+    )"""
+
+
+def rollup_item(user_id, account_id, date, type, category, amount, sign=1):
+    """
+    Variation des rollups d'une transaction : sign=1 à l'ajout, sign=-1 au
+    retrait. Le jour est la date locale de la transaction.
+    """
+    return (user_id, account_id, timezone.localtime(date).date(), type, category, sign * amount, sign)
+
+
+def transaction_rollup_item(transaction, sign=1):
+    return rollup_item(
+        transaction.user_id,
+        transaction.account_id,
+        transaction.date,
+        transaction.type,
+        transaction.category,
+        transaction.amount,
+        sign,
+    )
+
+
+def apply_rollup_deltas(items):
+    """
+    Regroupe les variations par clé et les applique aux rollups mensuels et
+    journaliers en une seule requête (INSERT ... ON CONFLICT DO UPDATE),
+    dans la transaction de l'appelant.
+    """
+    grouped = defaultdict(lambda: [Decimal("0"), 0])
+    for *key, amount, count in items:
+        grouped[tuple(key)][0] += amount
+        grouped[tuple(key)][1] += count
+    # Clés triées : ordre de verrouillage stable entre écritures concurrentes
+    rows = [(*key, total, count) for key, (total, count) in sorted(grouped.items()) if total or count]
+    if not rows:
+        return 0
+
+    values = ", ".join(["(%s, %s, %s::date, %s, %s, %s::numeric, %s)"] * len(rows))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH changes (user_id, account_id, day, type, category, total, count) AS (VALUES {values}),
+            {rollup_ctes()}
+            SELECT 1
+            """,
+            [value for row in rows for value in row],
+        )
+    return len(rows)
+
+
+def rebuild_rollups(user_id=None, account_id=None):
+    """
+    Recalcule les rollups mensuels et journaliers (tous, ou ceux d'un
+    utilisateur / d'un compte) à partir de Transaction et des fichiers
+    d'archive. Le verrou EXCLUSIVE attend les écritures en cours et bloque
+    les suivantes jusqu'à la fin du recalcul.
+    """
+    conditions, params = [], {"time_zone": settings.TIME_ZONE}
+    if user_id is not None:
+        conditions.append("user_id = %(user_id)s")
+        params["user_id"] = user_id
+    if account_id is not None:
+        conditions.append("account_id = %(account_id)s")
+        params["account_id"] = account_id
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        rebuilt = 0
+        for table, columns, period_sql in [
+            (ROLLUP_TABLE, ROLLUP_COLUMNS, month_sql()),
+            (DAILY_ROLLUP_TABLE, DAILY_ROLLUP_COLUMNS, day_sql()),
+        ]:
+            cursor.execute(f"LOCK TABLE {table} IN EXCLUSIVE MODE")
+            cursor.execute(f"DELETE FROM {table} {where}", params)
+            cursor.execute(
+                f"""
+                INSERT INTO {table} ({columns})
+                SELECT user_id, account_id, {period_sql}, type, category, SUM(amount), COUNT(*)
+                FROM {Transaction._meta.db_table}
+                {where}
+                GROUP BY 1, 2, 3, 4, 5
+                """,
+                params,
+            )
+            rebuilt += cursor.rowcount
+        # Un fichier (un mois d'un utilisateur) par requête
+        for items in archive_rollup_items(user_id, account_id):
+            rebuilt += apply_rollup_deltas(items)
+        return rebuilt
+
+
+def archive_rollup_items(user_id=None, account_id=None):
+    """
+    Variations de rollup des transactions archivées, une liste par fichier
+    d'archive, lues fichier par fichier. Les comptes supprimés depuis
+    l'archivage sont ignorés.
+    """
+    archives = TransactionArchive.objects.all()
+    if user_id is not None:
+        archives = archives.filter(user_id=user_id)
+    if account_id is not None:
+        archives = archives.filter(account_ids__contains=[account_id])
+    archives = list(archives.order_by("user_id", "month"))
+    if not archives:
+        return
+
+    accounts = set(Account.objects.filter(
+        pkid__in={item_account_id for archive in archives for item_account_id in archive.account_ids}
+    ).values_list("pkid", flat=True))
+    for archive in archives:
+        yield [
+            rollup_item(
+                archive.user_id, row["account_id"], row["date"], row["type"], row["category"], row["amount"]
+            )
+            for row in iter_archive_rows(archive, cached=False)
+            if row["account_id"] in accounts and account_id in (None, row["account_id"])
+        ]
+
+
+def get_month_total(month, type, **filters):
+    """
+    Total d'un mois pour un type de transaction (filtres : user, account...).
+    """
+    return TransactionMonthlyRollup.objects.filter(
+        month=month, type=type, **filters
+    ).aggregate(total=Sum("total"))["total"] or Decimal("0")
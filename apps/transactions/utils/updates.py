@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+
+from apps.accounts.models import Account
+from apps.transactions.models import Transaction
+from apps.transactions.utils.balances import apply_balance_deltas, sum_balance_deltas
+from apps.transactions.utils.rollups import day_sql, rollup_ctes
+from config.utils.cache import bump_user_data_version
+
+
+TRANSACTION_TABLE = Transaction._meta.db_table
+
+
+def signed_sql(type_column, amount_column):
+    return f"CASE WHEN {type_column} = %(expense)s THEN -{amount_column} ELSE {amount_column} END"
+
+
+def update_transaction(user_id, transaction_id, changes, account_id=None):
+    """
+    Met à jour une transaction de l'utilisateur en deux requêtes, quelle que
+    soit la taille de ``changes`` :
+
+    1. un UPDATE des seules colonnes fournies, qui verrouille la ligne, lit
+       les anciennes valeurs, calcule en SQL l'effet ancien / nouveau sur le
+       solde et met à jour les rollups ;
+    2. la variation de solde, sur un ou deux comptes (changement de compte).
+
+    ``account_id`` (UUID) déplace la transaction vers un autre compte de
+    l'utilisateur. Retourne False si la transaction (ou le compte cible)
+    n'existe pas pour cet utilisateur.
+    """
+    params = {
+        "user_id": user_id,
+        "transaction_id": str(transaction_id),
+        "expense": Transaction.Type.EXPENSE,
+        "time_zone": settings.TIME_ZONE,
+    }
+    assignments = ["updated_at = now()"]
+    for name, value in changes.items():
+        field = Transaction._meta.get_field(name)
+        params[f"set_{name}"] = field.get_db_prep_save(value, connection)
+        assignments.append(f'"{field.column}" = %(set_{name})s')
+
+    target_join = ""
+    if account_id is not None:
+        # Compte cible restreint à l'utilisateur : sinon aucune ligne n'est mise à jour
+        params["account_id"] = str(account_id)
+        target_join = f", (SELECT pkid FROM {Account._meta.db_table} WHERE id = %(account_id)s AND user_id = %(user_id)s) AS target"
+        assignments.append("account_id = target.pkid")
+
+    with db_transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH old AS (
+                    SELECT pkid, account_id, date, type, category, amount
+                    FROM {TRANSACTION_TABLE}
+                    WHERE user_id = %(user_id)s AND id = %(transaction_id)s
+                    FOR UPDATE
+                ),
+                updated AS (
+                    UPDATE {TRANSACTION_TABLE} AS t
+                    SET {", ".join(assignments)}
+                    FROM old{target_join}
+                    WHERE t.pkid = old.pkid
+                    RETURNING
+                        t.user_id,
+                        old.account_id AS old_account_id,
+                        old.date AS old_date,
+                        old.type AS old_type,
+                        old.category AS old_category,
+                        old.amount AS old_amount,
+                        t.account_id, t.date, t.type, t.category, t.amount
+                ),
+                changes AS (
+                    SELECT user_id, old_account_id AS account_id, {day_sql("old_date")} AS day,
+                           old_type AS type, old_category AS category, -old_amount AS total, -1 AS count
+                    FROM updated
+                    UNION ALL
+                    SELECT user_id, account_id, {day_sql()}, type, category, amount, 1
+                    FROM updated
+                ),
+                {rollup_ctes()}
+                SELECT
+                    old_account_id, {signed_sql("old_type", "old_amount")},
+                    account_id, {signed_sql("type", "amount")}
+                FROM updated
+                """,
+                params,
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return False
+
+        old_account_id, old_signed, new_account_id, new_signed = row
+        apply_balance_deltas(sum_balance_deltas([
+            (old_account_id, -old_signed),
+            (new_account_id, new_signed),
+        ]))
+        # Sans variation de solde, apply_balance_deltas n'invalide rien
+        bump_user_data_version(user_id)
+    return True
@@ -1,29 +1,23 @@
-from datetime import timedelta, datetime
+from datetime import datetime
 from django.utils import timezone
 from apps.transactions.models import Transaction
+from apps.transactions.utils.recurrence import next_occurrence
 
 
 def calculate_next_recurring_date(transaction: Transaction) -> None | datetime:
     """
-    Calcule la prochaine date de récurrence en fonction de l'intervalle.
+    Calcule la prochaine date de récurrence en fonction de l'intervalle :
+    la première date du calendrier de la transaction (ancré sur sa date,
+    mois et années calendaires) après son dernier traitement.
     """
     if not transaction.recurringInterval:
         return None
 
-    interval = transaction.recurringInterval
-    last_processed_date = transaction.lastProcessed
-
-    if interval.lower() == 'daily':
-        return last_processed_date + timezone.timedelta(days=1)
-    elif interval.lower() == 'weekly':
-
-        return last_processed_date + timezone.timedelta(weeks=1)
-    elif interval.lower() == 'monthly':
-        return last_processed_date + timezone.timedelta(days=30)  # Approximation
-    elif interval.lower() == 'yearly':
-        return last_processed_date + timezone.timedelta(days=365)  # Approximation
-    else:
-        return None
+    return next_occurrence(
+        transaction.recurringInterval,
+        transaction.date,
+        transaction.lastProcessed or timezone.now(),
+    )
     
 
 def is_transaction_due(transaction):
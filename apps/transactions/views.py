@@ -1,30 +1,67 @@
 import base64
+import heapq
 import logging
 import json
 import io
+import math
 
-from datetime import timedelta
-from decimal import Decimal
-from uuid import UUID
+from uuid import UUID, uuid4
 
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity, TrigramWordSimilarity
 from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.db import transaction as db_transaction
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast, Greatest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 # from rest_framework.throttling import UserRateThrottle
-from rest_framework import permissions, status
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import filters, generics, permissions, serializers, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied
 from django.core.exceptions import ValidationError
 from google.generativeai import GenerativeModel
 from google.api_core.exceptions import GoogleAPIError
 
 from PIL import Image
 
-from apps.transactions.serializers import CreateTransactionSerializer, TransactionSerializer
+from apps.transactions.serializers import (
+    AnalyticsQuerySerializer,
+    CreateTransactionSerializer,
+    ForecastQuerySerializer,
+    TransactionJobSerializer,
+    TransactionSerializer,
+    TransactionValuesSerializer,
+    UpdateTransactionSerializer,
+)
+from apps.transactions.utils.analytics import spending_buckets
+from apps.transactions.utils.archives import ArchiveReader
+from apps.transactions.utils.balances import (
+    apply_balance_delta,
+    apply_balance_deltas,
+    signed_amount,
+    sum_balance_deltas,
+)
+from apps.transactions.utils.deletions import create_bulk_delete_job, delete_transactions, parse_transaction_ids
+from apps.transactions.utils.exports import EXPORT_LOOKUPS, buffered, gzip_stream, iter_csv, iter_ndjson
+from apps.transactions.utils.forecasts import forecast_balances
+from apps.transactions.utils.importers import PARSERS
+from apps.transactions.utils.ratelimits import GEMINI_LIMITER, ReceiptScanThrottle
+from apps.transactions.utils.recurrence import next_occurrence
+from apps.transactions.utils.rollups import apply_rollup_deltas, transaction_rollup_item
+from apps.transactions.utils.updates import update_transaction
 from apps.accounts.models import Account
+from apps.accounts.utils.ledger import with_current_balance
+from config.utils.cache import UserCachedResponseMixin, bump_user_data_version
+from config.utils.ratelimit import UserRateLimitThrottle
 from config.utils.renderers import GenericJSONRenderer
-from .models import Transaction
+from .filters import TransactionFilter
+from .models import Transaction, TransactionJob
+from .pagination import KeysetPagination, SearchPagination
+from .tasks import bulk_delete_transactions, import_transactions
 
 
 # Create your views here.
@@ -32,18 +69,217 @@ from .models import Transaction
 logger = logging.getLogger(__name__)
 
 
-class GetAllTransactionsAPIView(APIView):
+class ArchiveReadThroughMixin:
+    """
+    Lecture des transactions archivées (hors base) qui passent les filtres
+    de la requête, pour les fusionner avec celles de la base.
+    """
+
+    def get_archive_reader(self, request, cached=True):
+        filterset = self.filterset_class(request.query_params, queryset=Transaction.objects.none(), request=request)
+        if not filterset.is_valid():
+            return None
+        return ArchiveReader(request.user, filterset.form.cleaned_data, cached=cached)
+
+
+class GetAllTransactionsAPIView(ArchiveReadThroughMixin, UserCachedResponseMixin, generics.ListAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    cache_scope = "transactions"
+    serializer_class = TransactionValuesSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_class = TransactionFilter
+    # Seuls les tris couverts par un index sont autorisés
+    ordering_fields = ["date", "amount"]
+
+    def get_queryset(self):
+        # L'ordre (date, pkid) correspond à l'index transaction_user_date_idx
+        return TransactionValuesSerializer.prepare(
+            Transaction.objects.filter(user=self.request.user).order_by("-date", "-pkid")
+        )
+
+    def list(self, request, *args, **kwargs):
+        archives = self.get_archive_reader(request)
+        if archives is None:
+            return super().list(request, *args, **kwargs)
+
+        # Seuls les fichiers d'archive qui recoupent la page sont lus
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginator.paginate_queryset(queryset, request, view=self, extra_rows=archives.iter_rows)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        self.paginator.ordering = self.paginator.get_ordering(queryset)
+        rows = self.paginator.merge_rows(
+            list(queryset), archives.iter_rows(self.paginator.ordering, self.paginator.sort_key)
+        )
+        return Response(self.get_serializer(rows, many=True).data)
+
+
+class SearchTransactionsAPIView(generics.ListAPIView):
+    """
+    Recherche plein texte (tsvector) et approximative (trigrammes) sur la
+    description et la catégorie, triée par pertinence.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = TransactionValuesSerializer
+    pagination_class = SearchPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = TransactionFilter
+
+    def get_queryset(self):
+        term = self.request.query_params.get("q", "").strip()
+        if not term:
+            raise serializers.ValidationError({"q": "A search term is required."})
+
+        query = SearchQuery(term, config="english", search_type="websearch")
+        return TransactionValuesSerializer.prepare(
+            Transaction.objects.filter(user=self.request.user)
+            .filter(
+                Q(search_vector=query)
+                | Q(description__trigram_word_similar=term)
+                | Q(category__trigram_similar=term)
+            )
+            .annotate(
+                # real -> double precision pour que le curseur compare des valeurs exactes
+                rank=Cast(
+                    SearchRank(F("search_vector"), query)
+                    + Greatest(
+                        TrigramWordSimilarity(term, "description"),
+                        TrigramSimilarity("category", term),
+                    ),
+                    output_field=FloatField(),
+                )
+            )
+            .order_by("-rank", "-pkid")
+        )
+
+
+class TransactionAnalyticsAPIView(UserCachedResponseMixin, APIView):
+    """
+    Revenus et dépenses par catégorie, regroupés par jour, semaine, mois ou
+    année sur une période. Mis en cache par utilisateur et par période.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    cache_scope = "analytics"
+
+    def get(self, request):
+        return self.cached_get(request, self.get_analytics)
+
+    def get_analytics(self, request):
+        serializer = AnalyticsQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+
+        return Response(
+            {
+                "interval": params["interval"],
+                "start_date": params["start_date"].isoformat(),
+                "end_date": params["end_date"].isoformat(),
+                "results": spending_buckets(
+                    request.user,
+                    params["interval"],
+                    params["start_date"],
+                    params["end_date"],
+                    account=params.get("account"),
+                ),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class TransactionForecastAPIView(UserCachedResponseMixin, APIView):
+    """
+    Solde projeté par compte et par jour, sur 1 à 24 mois, à partir des
+    transactions récurrentes. Mis en cache jusqu'à la prochaine écriture de
+    l'utilisateur (ou le lendemain).
+    """
     permission_classes = [permissions.IsAuthenticated]
-    
+    cache_scope = "forecast"
+
+    def get_cache_key(self, request):
+        # La projection part d'aujourd'hui
+        return f"{super().get_cache_key(request)}:{timezone.localdate():%Y-%m-%d}"
+
     def get(self, request):
-        user = request.user
-        transactions = Transaction.objects.filter(user=user)
+        return self.cached_get(request, self.get_forecast)
+
+    def get_forecast(self, request):
+        serializer = ForecastQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+
+        accounts = Account.objects.filter(user=request.user)
+        if "account" in params:
+            accounts = accounts.filter(id=params["account"])
+            if not accounts.exists():
+                return Response({"detail": "Account not found"}, status=status.HTTP_404_NOT_FOUND)
+
         return Response(
-            TransactionSerializer(transactions, many=True).data,
+            {"months": params["months"], **forecast_balances(request.user, params["months"], accounts)},
             status=status.HTTP_200_OK,
         )
 
 
+class ExportTransactionsAPIView(ArchiveReadThroughMixin, generics.GenericAPIView):
+    """
+    Exporte les transactions (tout l'historique ou un compte, avec les mêmes
+    filtres que la liste) en CSV ou NDJSON, éventuellement compressé en gzip.
+    Les lignes sont lues par un curseur côté serveur et envoyées au fil de
+    l'eau : la mémoire reste constante quel que soit le nombre de lignes.
+    Les transactions archivées de la période sont fusionnées par date.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = TransactionFilter
+    chunk_size = 2000
+    export_formats = {
+        "csv": (iter_csv, "text/csv"),
+        "ndjson": (iter_ndjson, "application/x-ndjson"),
+    }
+
+    def get_queryset(self):
+        return Transaction.objects.filter(user=self.request.user)
+
+    def get(self, request):
+        # "format" est réservé par DRF pour la négociation du renderer
+        output = request.query_params.get("output", "csv")
+        if output not in self.export_formats:
+            return Response(
+                {"detail": f"Unsupported export format, use one of: {', '.join(self.export_formats)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        write_rows, content_type = self.export_formats[output]
+
+        rows = (
+            self.filter_queryset(self.get_queryset())
+            .order_by("date", "pkid")
+            .values_list(*EXPORT_LOOKUPS)
+            .iterator(chunk_size=self.chunk_size)
+        )
+        # Fichiers d'archive décodés un à un pendant l'envoi, hors cache
+        archives = self.get_archive_reader(request, cached=False)
+        if archives is not None:
+            date_index = EXPORT_LOOKUPS.index("date")
+            rows = heapq.merge(
+                (tuple(row[lookup] for lookup in EXPORT_LOOKUPS) for row in archives.iter_rows()),
+                rows,
+                key=lambda row: row[date_index],
+            )
+        stream = buffered(write_rows(rows))
+        filename = f"transactions.{output}"
+
+        if request.query_params.get("compress") == "gzip":
+            stream = gzip_stream(stream)
+            content_type = "application/gzip"
+            filename += ".gz"
+
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
 class CreateTransactionAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     renderer_classes = [GenericJSONRenderer]
@@ -80,36 +316,15 @@ class CreateTransactionAPIView(APIView):
                 "detail": "if is recurring is set to true then you have to provide a recurring interval (daily,weekly monthly,yearly) !"
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # calculer le nouveau solde du compte
-        balance_change = 0
-        if data["type"] == "expense":
-            balance_change -= data["amount"]
-        else:
-            balance_change += data["amount"]
-        new_balance = account.balance + balance_change
-
         try:
             with db_transaction.atomic():
                 # Créer la transaction
-                Transaction.objects.create(
-                    user=request.user,
-                    account=account,
-                    type=data["type"],
-                    amount=data["amount"],
-                    description=data["description"],
-                    receiptUrl=data["receiptUrl"],
-                    date=data["date"],
-                    category=data["category"],
-                    isRecurring=data["isRecurring"],
-                    recurringInterval=data["recurringInterval"],
-                    nextRecurringDate=self.calculate_next_recurring_date(
-                        data) if data.get("isRecurring") else None,
-                    status="completed"
-                )
+                transaction = self.build_transaction(account, data)
+                transaction.save()
+                apply_rollup_deltas([transaction_rollup_item(transaction)])
 
-                # Mettre à jour le solde du compte
-                account.balance = new_balance
-                account.save()
+                # Mettre à jour le solde du compte (UPDATE atomique, sans relecture)
+                apply_balance_delta(account.pkid, signed_amount(data["type"], data["amount"]))
 
             return Response(
                 {
@@ -124,30 +339,184 @@ class CreateTransactionAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    def build_transaction(self, account, data):
+        return Transaction(
+            user=self.request.user,
+            account=account,
+            type=data["type"],
+            amount=data["amount"],
+            description=data.get("description"),
+            receiptUrl=data["receiptUrl"],
+            date=data["date"],
+            category=data["category"],
+            isRecurring=data["isRecurring"],
+            recurringInterval=data["recurringInterval"],
+            nextRecurringDate=self.calculate_next_recurring_date(
+                data) if data.get("isRecurring") else None,
+            status="completed"
+        )
+
     def calculate_next_recurring_date(self, data):
         """
-        Calcule la prochaine date de récurrence en fonction de l'intervalle.
+        Calcule la prochaine date de récurrence en fonction de l'intervalle
+        (mois et années calendaires, fin de mois et 29 février compris).
         """
         if not data.get('isRecurring') or not data.get('recurringInterval'):
             return None
 
-        interval = data['recurringInterval']
-        date = data['date']
-
-        if (interval).lower() == 'daily':
-            return date + timedelta(days=1)
-        elif (interval).lower() == 'weekly':
-            return date + timedelta(weeks=1)
-        elif (interval).lower() == 'monthly':
-            return date + timedelta(days=30)  # Approximation
-        elif (interval).lower() == 'yearly':
-            return date + timedelta(days=365)  # Approximation
-        else:
+        return next_occurrence(data['recurringInterval'], data['date'], data['date'])
+
+
+class CreateTransactionsBatchAPIView(CreateTransactionAPIView):
+    """
+    Crée un lot de transactions (sur un ou plusieurs comptes de l'utilisateur)
+    avec un seul INSERT et une seule mise à jour de solde par compte.
+    """
+    object_label = "transactions"
+    max_batch_size = 500
+
+    def post(self, request, *args, **kwargs):
+        if not isinstance(request.data, list) or not request.data:
+            return Response(
+                {"detail": "A non-empty list of transactions is expected."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(request.data) > self.max_batch_size:
+            return Response(
+                {"detail": f"A batch cannot contain more than {self.max_batch_size} transactions."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = CreateTransactionSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            logger.error(serializer.errors)
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        items = serializer.validated_data
+
+        # Un seul SELECT pour tous les comptes du lot
+        account_ids = {item["account_id"] for item in items}
+        accounts = {account.id: account for account in Account.objects.filter(id__in=account_ids)}
+        if len(accounts) != len(account_ids):
+            return Response({"detail": "Account not found"}, status=status.HTTP_404_NOT_FOUND)
+        if any(account.user_id != request.user.pkid for account in accounts.values()):
+            raise PermissionDenied("You do not have permissions.")
+
+        for index, data in enumerate(items):
+            if data["isRecurring"] and not data.get("recurringInterval"):
+                return Response({
+                    "detail": f"Transaction {index}: if is recurring is set to true then you have to provide a recurring interval (daily,weekly monthly,yearly) !"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        transactions = [self.build_transaction(accounts[data["account_id"]], data) for data in items]
+        deltas = sum_balance_deltas(
+            (transaction.account.pkid, signed_amount(transaction.type, transaction.amount))
+            for transaction in transactions
+        )
+
+        try:
+            with db_transaction.atomic():
+                Transaction.objects.bulk_create(transactions)
+                apply_balance_deltas(deltas)
+                apply_rollup_deltas(transaction_rollup_item(transaction) for transaction in transactions)
+            # bulk_create n'envoie pas post_save et un lot de variation nulle
+            # n'invalide rien dans apply_balance_deltas
+            bump_user_data_version(request.user.pkid)
+
+            return Response(
+                {
+                    "success": True,
+                    "detail": f"{len(transactions)} transactions successfully created.",
+                },
+                status=status.HTTP_201_CREATED
+            )
+        except Exception as e:
+            logger.error(str(e))
+            return Response(
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class ImportTransactionsAPIView(APIView):
+    """
+    Importe un relevé bancaire (CSV ou OFX) dans un compte. Le fichier est
+    traité en arrière-plan ; la progression est disponible via le job renvoyé.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [GenericJSONRenderer]
+    object_label = "job"
+    max_file_size = 50 * 1024 * 1024  # 50 Mo
+
+    def get_account_object(self, account_id):
+        try:
+            UUID(str(account_id))
+            return Account.objects.get(id=account_id)
+        except (ValueError, ValidationError) as e:
+            logger.error(str(e))
+            return None
+        except Account.DoesNotExist:
             return None
 
+    def post(self, request, *args, **kwargs):
+        if "file" not in request.FILES:
+            return Response({
+                "detail": "No files were provided!"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        file = request.FILES["file"]
+        extension = file.name[file.name.rfind("."):].lower() if "." in file.name else ""
+        if extension not in PARSERS:
+            return Response(
+                {"detail": "The file must be a bank statement from type (CSV, OFX, QFX)."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if file.size > self.max_file_size:
+            return Response(
+                {"detail": "The file must not exceed 50Mo."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        account = self.get_account_object(request.data.get("account_id"))
+        if account is None:
+            return Response({"detail": "Account not found"}, status=status.HTTP_404_NOT_FOUND)
+        if account.user != self.request.user:
+            raise PermissionDenied("You do not have permissions.")
+
+        source = default_storage.save(f"imports/{uuid4().hex}{extension}", file)
+        job = TransactionJob.objects.create(
+            user=request.user,
+            account=account,
+            kind=TransactionJob.Kind.IMPORT,
+            source=source,
+        )
+        import_transactions.delay(str(job.id))
+
+        return Response(TransactionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
-class GetTransaction(APIView):
+
+class GetTransactionJobAPIView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [GenericJSONRenderer]
+    object_label = "job"
+    serializer_class = TransactionJobSerializer
+    lookup_field = "id"
+    lookup_url_kwarg = "job_id"
+
+    def get_queryset(self):
+        return TransactionJob.objects.filter(user=self.request.user).select_related("account")
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except ValidationError:
+            raise NotFound("Job not found")
+
+
+class GetTransaction(UserCachedResponseMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    cache_scope = "transaction"
 
     def get_object(self, user, transaction_id):
         """
@@ -164,6 +533,9 @@ class GetTransaction(APIView):
             return None
 
     def get(self, request, transaction_id):
+        return self.cached_get(request, self.get_transaction, transaction_id)
+
+    def get_transaction(self, request, transaction_id):
         transaction = self.get_object(request.user, transaction_id)
         if transaction is None:
             return Response(
@@ -177,71 +549,61 @@ class GetTransaction(APIView):
 
 
 class UpdateTransaction(APIView):
+    """
+    PUT ou PATCH d'une transaction : un UPDATE des seules colonnes envoyées
+    puis une variation de solde, sans lire la transaction ni le compte avant.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_object(self, user, transaction_id):
-        """
-        Récupère une transaction par son utilisateur et son ID ou retourne None si elle n'existe pas.
-        """
-       
-        try:
-            transaction = Transaction.objects.get(user=user, id=transaction_id)
-            return transaction
-        except (ValueError, ValidationError) as e:
-            logger.error(str(e))
-            return None
-        except Transaction.DoesNotExist:
-            return None
-
     def put(self, request, transaction_id):
-        transaction = self.get_object(request.user, transaction_id)
-        if transaction is None:
+        return self.update(request, transaction_id, partial=False)
+
+    def patch(self, request, transaction_id):
+        return self.update(request, transaction_id, partial=True)
+
+    def update(self, request, transaction_id, partial):
+        try:
+            UUID(str(transaction_id))
+        except ValueError:
             return Response(
                 {"detail": "Transaction not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
-        serializer = TransactionSerializer(
-            transaction, data=request.data)
-        if serializer.is_valid():
-            data = serializer.validated_data
-            # Calculer les changements
-            old_balance = 0
-            new_balance = 0
-
-            if transaction.type == "expense":
-                old_balance -= transaction.amount
-            else:
-                old_balance += transaction.amount
-
-            if data["type"] == "expense":
-                new_balance -= data["amount"]
-            else:
-                new_balance += data["amount"]
-
-            net_balance_change = new_balance - old_balance
 
-            try:
-                with db_transaction.atomic():
-                    updated_transaction = serializer.save()
-                    # Mettre à jour le solde du compte
-                    account = updated_transaction.account
-                    account.balance += net_balance_change
-                    account.save()
-                return Response({
-                    "detail": "Transaction successfully updated."
-                }, status=status.HTTP_200_OK)
-            except Exception as e:
-                logger.error(
-                    f"Error while trying to update the transaction: {str(e)}")
-                return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        serializer = UpdateTransactionSerializer(data=request.data, partial=partial)
+        if not serializer.is_valid():
+            return Response({
+                "error": serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        changes = dict(serializer.validated_data)
+        account_id = changes.pop("account_id", None)
+        try:
+            updated = update_transaction(request.user.pkid, transaction_id, changes, account_id=account_id)
+        except Exception as e:
+            logger.error(
+                f"Error while trying to update the transaction: {str(e)}")
+            return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if not updated:
+            return Response(
+                {"detail": "Transaction not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
         return Response({
-            "error": serializer.errors
-        }, status=status.HTTP_400_BAD_REQUEST)
+            "detail": "Transaction successfully updated."
+        }, status=status.HTTP_200_OK)
 
 
 class DeleteTransactionAPIView(APIView):
+    """
+    Supprime des transactions de l'utilisateur, sur un ou plusieurs comptes.
+    Au-delà de ``max_sync_ids`` IDs, la suppression est faite en arrière-plan
+    et la réponse renvoie le job à suivre.
+    """
     permission_classes = [permissions.IsAuthenticated]
     renderer_classes = [GenericJSONRenderer]
+    max_sync_ids = 1000
 
     def delete(self, request):
         transaction_ids = request.data.get("transaction_ids", [])
@@ -254,52 +616,63 @@ class DeleteTransactionAPIView(APIView):
                 },
                 status=status.HTTP_400_BAD_REQUEST,
             )
-
         try:
-            with db_transaction.atomic():
-                transaction_to_delete = Transaction.objects.filter(
-                    id__in=transaction_ids)
-                if not transaction_to_delete.exists():
-                    return Response(
-                        {
-                            "success": False,
-                            "error": "No transactions found with the IDs provided."
-                        },
-                        status=status.HTTP_404_NOT_FOUND,
-                    )
-
-                account = transaction_to_delete.first().account
-
-                total_amount_to_remove = Decimal('0.0')
-                for trans in transaction_to_delete:
-                    if trans.type == "income":
-                        total_amount_to_remove -= trans.amount
-                    else:
-                        total_amount_to_remove += trans.amount
-
-                transaction_to_delete.delete()
+            transaction_ids = parse_transaction_ids(transaction_ids)
+        except (TypeError, ValueError):
+            return Response(
+                {
+                    "success": False,
+                    "error": "Invalid transaction ID provided."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-                account.balance += total_amount_to_remove
-                account.save()
+        if len(transaction_ids) > self.max_sync_ids:
+            job = create_bulk_delete_job(request.user, transaction_ids)
+            bulk_delete_transactions.delay(str(job.id))
+            return Response(
+                {
+                    "success": True,
+                    "message": f"Deletion of {len(transaction_ids)} transactions scheduled.",
+                    "job": TransactionJobSerializer(job).data,
+                },
+                status=status.HTTP_202_ACCEPTED,
+            )
 
-                return Response(
-                    {
-                        "success": True,
-                        "message": f"{len(transaction_ids)} successfully deleted transactions.",
-                        # Convertir en float pour la sérialisation JSON
-                        "new_balance": float(account.balance),
-                    },
-                    status=status.HTTP_200_OK,
-                )
+        try:
+            deleted, balances = delete_transactions(request.user.pkid, transaction_ids)
         except Exception as e:
             logger.error(str(e))
             return Response(
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+        if not deleted:
+            return Response(
+                {
+                    "success": False,
+                    "error": "No transactions found with the IDs provided."
+                },
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        # Nouveau solde de chaque compte touché (convertis en float pour la sérialisation JSON)
+        accounts = with_current_balance(Account.objects.filter(pkid__in=balances)).only("id", "balance", "ledger_enabled")
+        new_balances = {str(account.id): float(account.current_balance) for account in accounts}
+        return Response(
+            {
+                "success": True,
+                "message": f"{deleted} successfully deleted transactions.",
+                "new_balance": next(iter(new_balances.values())) if len(new_balances) == 1 else None,
+                "balances": new_balances,
+            },
+            status=status.HTTP_200_OK,
+        )
+
 
 class AIReceiptScanner(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [UserRateLimitThrottle, ReceiptScanThrottle]
     # renderer_classes = [GenericJSONRenderer]
 
     def post(self, request, *args, **kwargs):
@@ -340,6 +713,16 @@ class AIReceiptScanner(APIView):
         if cached_result:
             return Response(cached_result, status=status.HTTP_200_OK)
 
+        # Quota Gemini partagé par tous les utilisateurs et les workers
+        quota = GEMINI_LIMITER.hit()
+        if not quota.allowed:
+            retry_after = math.ceil(quota.retry_after)
+            return Response(
+                {"detail": f"Receipt scanning is busy, please retry in {retry_after} seconds."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(retry_after)},
+            )
+
         try:
             # convertir l'image en base64
             image = Image.open(file)
@@ -28,6 +28,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 THIRD_PARTY_APPS = [
@@ -147,6 +148,11 @@ STATIC_URL = '/static/'
 
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Uploaded files (bank statements waiting to be imported)
+MEDIA_URL = '/media/'
+
+MEDIA_ROOT = BASE_DIR / 'mediafiles'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -188,6 +194,18 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'generate_monthly_reports',
         # 'schedule': crontab(minute=0, hour=0),  # Premier jour de chaque mois 
     },
+    'compact-balance-ledgers': {
+        'task': 'compact_balance_ledgers',
+        # 'schedule': crontab(minute='*/5'),  # Toutes les 5 minutes
+    },
+    'create-transaction-partitions': {
+        'task': 'create_transaction_partitions',
+        # 'schedule': crontab(minute=0, hour=1, day_of_month=1),  # Premier jour de chaque mois
+    },
+    'archive-transactions': {
+        'task': 'archive_transactions',
+        # 'schedule': crontab(minute=0, hour=3, day_of_month=2),  # Deuxième jour de chaque mois
+    },
 }
 # Cloudinary
 CLOUDINARY_CLOUD_NAME = getenv("CLOUDINARY_CLOUD_NAME")
@@ -215,12 +233,13 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ),
     "DEFAULT_THROTTLE_CLASSES": (
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "config.utils.ratelimit.AnonRateLimitThrottle",
+        "config.utils.ratelimit.UserRateLimitThrottle",
     ),  # limit the number of request that can be made to the api
     "DEFAULT_THROTTLE_RATES": {
         "anon": "200/day",
         "user": "500/day",
+        "receipt_scan": "10/min",
     }
 }
 
@@ -279,9 +298,33 @@ DEFAULT_FROM_EMAIL = getenv("DEFAULT_FROM_EMAIL")
 AUTH_USER_MODEL = "users.UserAccount"
 
 # Caches
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# Le cache partagé (Redis) est nécessaire pour que l'invalidation par version
+# soit visible de tous les workers ; LocMemCache reste le défaut en local.
+CACHE_URL = getenv("CACHE_URL")
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
     }
-}
\ No newline at end of file
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+        }
+    }
+
+# Limiteurs de débit partagés entre processus (config/utils/ratelimit.py)
+RATELIMIT_REDIS_URL = getenv("RATELIMIT_REDIS_URL", CACHE_URL)
+# Quota de l'API Gemini, partagé par le scanner de reçus et les rapports mensuels
+GEMINI_RATE_LIMIT = getenv("GEMINI_RATE_LIMIT", "15/min")
+# Transactions récurrentes traitées une à une, par utilisateur
+RECURRING_RATE_LIMIT = getenv("RECURRING_RATE_LIMIT", "10/min")
+
+# Durée de vie des réponses mises en cache par utilisateur (config/utils/cache.py)
+RESPONSE_CACHE_TIMEOUT = 60 * 10
+# Les transactions plus anciennes que ce nombre de mois sont archivées hors
+# de Postgres (apps/transactions/utils/archives.py)
+TRANSACTION_ARCHIVE_AFTER_MONTHS = int(getenv("TRANSACTION_ARCHIVE_AFTER_MONTHS", 24))
@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_TIMEOUT = getattr(settings, "RESPONSE_CACHE_TIMEOUT", 60 * 10)
+
+# Single-flight : un seul processus recalcule une clé manquante, les autres attendent
+RECOMPUTE_LOCK_TIMEOUT = 10
+RECOMPUTE_WAIT_INTERVAL = 0.05
+RECOMPUTE_WAIT_ATTEMPTS = 40
+# États du verrou : calcul en cours, ou terminé sans valeur à mettre en cache
+RECOMPUTE_PENDING = "pending"
+RECOMPUTE_DONE = "done"
+RECOMPUTE_DONE_TIMEOUT = 1
+
+
+def _version_key(user_id):
+    return f"user_data_version:{user_id}"
+
+
+def get_user_data_version(user_id) -> int:
+    """
+    Version des données d'un utilisateur. Chaque réponse en cache l'inclut
+    dans sa clé : l'incrémenter les périme toutes d'un coup, sans parcourir
+    les clés.
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # On part de l'horloge et non de 1 : si le compteur est évincé, la
+        # nouvelle valeur ne peut pas retomber sur des réponses déjà en cache
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def _incr_version(user_id):
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.add(_version_key(user_id), time.time_ns(), timeout=None)
+
+
+def bump_user_data_version(*user_ids) -> None:
+    """
+    Invalide toutes les réponses en cache des utilisateurs donnés.
+    L'incrément attend le commit de la transaction en cours : une lecture
+    concurrente ne peut pas mettre en cache, sous la nouvelle version, des
+    données d'avant le commit.
+    """
+    for user_id in set(user_ids):
+        transaction.on_commit(lambda user_id=user_id: _incr_version(user_id))
+
+
+def _record(scope, outcome):
+    key = f"cache_metrics:{scope}:{outcome}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def get_cache_metrics(scope) -> dict:
+    return {
+        outcome: cache.get(f"cache_metrics:{scope}:{outcome}", 0)
+        for outcome in ("hits", "misses", "not_modified")
+    }
+
+
+def get_or_compute(key, compute, timeout=RESPONSE_CACHE_TIMEOUT, scope="default"):
+    """
+    Valeur en cache pour ``key``, calculée si elle manque. Un seul appelant
+    à la fois recalcule une clé manquante, les autres attendent brièvement
+    son résultat. ``compute`` peut renvoyer ``None`` pour ne rien mettre en
+    cache.
+    """
+    value = cache.get(key)
+    if value is not None:
+        _record(scope, "hits")
+        return value
+
+    _record(scope, "misses")
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, RECOMPUTE_PENDING, timeout=RECOMPUTE_LOCK_TIMEOUT):
+        try:
+            value = compute()
+            if value is not None:
+                cache.set(key, value, timeout=timeout)
+        finally:
+            if value is None:
+                # Rien ne sera mis en cache (erreur, réponse non 200) : ceux
+                # qui attendent calculent eux-mêmes sans finir leur attente
+                cache.set(lock_key, RECOMPUTE_DONE, timeout=RECOMPUTE_DONE_TIMEOUT)
+            else:
+                cache.delete(lock_key)
+        return value
+
+    for _ in range(RECOMPUTE_WAIT_ATTEMPTS):
+        time.sleep(RECOMPUTE_WAIT_INTERVAL)
+        values = cache.get_many([key, lock_key])
+        if key in values:
+            return values[key]
+        if values.get(lock_key) != RECOMPUTE_PENDING:
+            # Calcul terminé sans valeur, ou verrou expiré
+            return compute()
+
+    logger.warning(f"Cache recompute of {key} timed out, computing without lock.")
+    return compute()
+
+
+class UserCachedResponseMixin:
+    """
+    Met en cache les données des réponses GET réussies, par utilisateur, sous
+    une clé faite de la version de ses données et du chemin complet.
+
+    La même clé donne un ETag fort : un ``If-None-Match`` qui correspond
+    reçoit un 304 après une seule lecture du cache, sans toucher à la base.
+    """
+
+    cache_scope = None
+    cache_timeout = RESPONSE_CACHE_TIMEOUT
+
+    def get_cache_key(self, request):
+        version = get_user_data_version(request.user.pkid)
+        path = hashlib.md5(request.get_full_path().encode("utf-8")).hexdigest()
+        return f"user_response:{request.user.pkid}:{version}:{self.cache_scope}:{path}"
+
+    def get_etag(self, request, cache_key):
+        # Le corps dépend aussi du format négocié
+        accept = request.META.get("HTTP_ACCEPT", "")
+        return quote_etag(hashlib.md5(f"{cache_key}:{accept}".encode("utf-8")).hexdigest())
+
+    def get(self, request, *args, **kwargs):
+        return self.cached_get(request, super().get, *args, **kwargs)
+
+    def cached_get(self, request, handler, *args, **kwargs):
+        """
+        Sert ``handler`` à travers le cache. Les vues qui définissent leur
+        propre ``get`` l'appellent explicitement.
+        """
+        cache_key = self.get_cache_key(request)
+        etag = self.get_etag(request, cache_key)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            _record(self.cache_scope, "not_modified")
+            return not_modified
+
+        response = None
+
+        def compute():
+            nonlocal response
+            response = handler(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                return response.data
+            return None
+
+        data = get_or_compute(cache_key, compute, self.cache_timeout, self.cache_scope)
+        if response is None:
+            response = Response(data, status=status.HTTP_200_OK)
+        if response.status_code == status.HTTP_200_OK:
+            response["ETag"] = etag
+            # Le navigateur garde la réponse mais revalide à chaque fois
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
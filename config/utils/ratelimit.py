@@ -0,0 +1,328 @@
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from typing import NamedTuple
+
+import redis
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+logger = logging.getLogger(__name__)
+
+# Redis partagé par tous les workers ; sans URL, les limites sont par processus
+RATELIMIT_REDIS_URL = getattr(settings, "RATELIMIT_REDIS_URL", None)
+KEY_PREFIX = "ratelimit"
+
+# Backoff des tâches Celery limitées, en secondes
+RETRY_BACKOFF_BASE = 5
+RETRY_BACKOFF_MAX = 10 * 60
+
+DURATIONS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """
+    Lit un débit écrit comme les débits de throttle DRF : "10/min" -> (10, 60).
+    """
+    count, period = rate.split("/")
+    return int(count), DURATIONS[period[0]]
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    remaining: float
+    # Secondes avant qu'un appel puisse passer, 0 s'il est autorisé
+    retry_after: float
+
+
+# --- Backends ----------------------------------------------------------------
+
+# Les deux scripts lisent l'horloge du serveur Redis : des workers aux
+# horloges décalées partagent la même chronologie. Les flottants reviennent
+# à Python sous forme de chaînes, Redis tronque les nombres Lua en entiers.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - updated, 0) * refill)
+
+local allowed, retry_after = 0, 0
+if tokens >= requested then
+    tokens = tokens - requested
+    allowed = 1
+else
+    retry_after = (requested - tokens) / refill
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated", tostring(now))
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity / refill * 1000) + 1000)
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2]) * 1000000
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) * 1000000 + tonumber(clock[2])
+
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", now - window)
+local count = redis.call("ZCARD", KEYS[1])
+if count < limit then
+    redis.call("ZADD", KEYS[1], now, ARGV[3])
+    redis.call("PEXPIRE", KEYS[1], math.ceil(window / 1000))
+    return {1, tostring(limit - count - 1), "0"}
+end
+local oldest = redis.call("ZRANGE", KEYS[1], 0, 0, "WITHSCORES")
+return {0, "0", tostring((tonumber(oldest[2]) + window - now) / 1000000)}
+"""
+
+
+def _result(reply):
+    allowed, remaining, retry_after = reply
+    return RateLimitResult(bool(int(allowed)), float(remaining), float(retry_after))
+
+
+class RedisBackend:
+    """
+    État des limiteurs dans Redis : chaque appel est un seul script Lua,
+    atomique, donc deux workers ne peuvent pas prendre la même dernière place.
+    """
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+        self.token_bucket_script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+        self.sliding_window_script = self.client.register_script(SLIDING_WINDOW_SCRIPT)
+
+    def token_bucket(self, key, capacity, refill, tokens=1):
+        return _result(self.token_bucket_script(keys=[key], args=[capacity, refill, tokens]))
+
+    def sliding_window(self, key, limit, window):
+        return _result(self.sliding_window_script(keys=[key], args=[limit, window, uuid.uuid4().hex]))
+
+
+class LocalBackend:
+    """
+    Même sémantique en mémoire, pour le développement local et les tests.
+    Les limites sont par processus : elles ne tiennent pas entre workers.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.windows = {}
+
+    def token_bucket(self, key, capacity, refill, tokens=1):
+        with self.lock:
+            now = self.clock()
+            available, updated = self.buckets.get(key, (capacity, now))
+            available = min(capacity, available + max(now - updated, 0) * refill)
+            if available >= tokens:
+                self.buckets[key] = (available - tokens, now)
+                return RateLimitResult(True, available - tokens, 0.0)
+            self.buckets[key] = (available, now)
+            return RateLimitResult(False, available, (tokens - available) / refill)
+
+    def sliding_window(self, key, limit, window):
+        with self.lock:
+            now = self.clock()
+            hits = self.windows.setdefault(key, deque())
+            while hits and hits[0] <= now - window:
+                hits.popleft()
+            if len(hits) < limit:
+                hits.append(now)
+                return RateLimitResult(True, float(limit - len(hits)), 0.0)
+            return RateLimitResult(False, 0.0, hits[0] + window - now)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if RATELIMIT_REDIS_URL:
+                _backend = RedisBackend(RATELIMIT_REDIS_URL)
+            else:
+                logger.warning("RATELIMIT_REDIS_URL is not set, rate limits are per process.")
+                _backend = LocalBackend()
+        return _backend
+
+
+def set_backend(backend):
+    """
+    Remplace le backend, par exemple par un LocalBackend à horloge factice
+    dans les tests.
+    """
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+# --- Limiteurs ---------------------------------------------------------------
+
+class RateLimiter:
+    """
+    Limiteur de base : ``hit(key)`` consomme une place de la limite de
+    ``key`` et indique si l'appel peut passer. Si Redis est injoignable,
+    l'appel est autorisé (fail open) avec un avertissement : une panne du
+    limiteur ne doit arrêter ni l'API ni les workers.
+    """
+
+    def __init__(self, name, rate):
+        self.name = name
+        self.rate = rate
+
+    def make_key(self, key):
+        return f"{KEY_PREFIX}:{self.name}:{key}"
+
+    def hit(self, key=""):
+        try:
+            return self.consume(get_backend(), self.make_key(key))
+        except redis.RedisError as e:
+            logger.warning(f"Rate limiter {self.name} unavailable, allowing the call: {e}")
+            return RateLimitResult(True, 0.0, 0.0)
+
+    def consume(self, backend, key):
+        raise NotImplementedError
+
+
+class TokenBucket(RateLimiter):
+    """
+    ``rate`` jetons par période, rendus en continu, avec des rafales
+    jusqu'à ``capacity`` (par défaut le nombre de ``rate``). Pour les quotas
+    d'API externes.
+    """
+
+    def __init__(self, name, rate, capacity=None):
+        super().__init__(name, rate)
+        count, period = parse_rate(rate)
+        self.refill = count / period
+        self.capacity = capacity or count
+
+    def consume(self, backend, key):
+        return backend.token_bucket(key, self.capacity, self.refill)
+
+
+class SlidingWindow(RateLimiter):
+    """
+    Au plus ``count`` appels sur toute période glissante (pas de rafale à
+    la frontière de fenêtres fixes). Pour les limites par utilisateur.
+    """
+
+    def __init__(self, name, rate):
+        super().__init__(name, rate)
+        self.limit, self.window = parse_rate(rate)
+
+    def consume(self, backend, key):
+        return backend.sliding_window(key, self.limit, self.window)
+
+
+def acquire(limiter, key="", timeout=30):
+    """
+    Attend, en dormant dans le processus courant, que ``limiter`` accorde
+    une place. Retourne False sans en prendre si l'attente dépasserait
+    ``timeout`` secondes. Pour les boucles qui préfèrent une courte pause à
+    une replanification.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        result = limiter.hit(key)
+        if result.allowed:
+            return True
+        if time.monotonic() + result.retry_after > deadline:
+            return False
+        time.sleep(result.retry_after)
+
+
+# --- Celery ------------------------------------------------------------------
+
+def retry_countdown(retries, retry_after=0):
+    """
+    Backoff exponentiel avec jitter, jamais plus court que l'attente du
+    limiteur.
+    """
+    backoff = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** retries)
+    return max(retry_after, backoff) * random.uniform(1, 1.25)
+
+
+def limit_task(task, limiter, key=""):
+    """
+    Prend une place de ``limiter`` pour une tâche liée (``bind=True``), ou
+    la replanifie avec backoff : le message est renvoyé avec les mêmes
+    arguments, aucun travail n'est perdu. Déclarer la tâche avec
+    ``max_retries=None`` pour que l'attente ne soit jamais abandonnée.
+    """
+    result = limiter.hit(key)
+    if not result.allowed:
+        countdown = retry_countdown(task.request.retries, result.retry_after)
+        logger.info(f"Task {task.name} rate limited by {limiter.name}, retrying in {countdown:.0f}s.")
+        raise task.retry(countdown=countdown)
+
+
+# --- DRF ---------------------------------------------------------------------
+
+class RateLimitThrottle(BaseThrottle):
+    """
+    Throttle DRF sur une fenêtre glissante partagée : un seul appel
+    atomique par requête. ``scope`` choisit le débit dans
+    DEFAULT_THROTTLE_RATES, comme pour les throttles de DRF. ``get_key``
+    retourne None pour ne pas limiter la requête.
+    """
+
+    scope = None
+
+    def __init__(self):
+        try:
+            rate = api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        except KeyError:
+            raise ImproperlyConfigured(f"No default throttle rate set for '{self.scope}' scope")
+        self.limiter = SlidingWindow(f"throttle:{self.scope}", rate)
+        self.result = None
+
+    def get_key(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        key = self.get_key(request, view)
+        if key is None:
+            return True
+        self.result = self.limiter.hit(key)
+        return self.result.allowed
+
+    def wait(self):
+        if self.result is None:
+            return None
+        return math.ceil(self.result.retry_after)
+
+
+class UserRateLimitThrottle(RateLimitThrottle):
+    scope = "user"
+
+    def get_key(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return None
+        return request.user.pkid
+
+
+class AnonRateLimitThrottle(RateLimitThrottle):
+    scope = "anon"
+
+    def get_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.get_ident(request)